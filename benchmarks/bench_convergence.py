@@ -0,0 +1,99 @@
+"""
+Benchmark of equilibration detection on synthetic timeseries.
+
+Each series is an AR(1) process with an initial transient, so it has
+a known statistical inefficiency and needs an equilibration index.
+For series of increasing length, this times the cheap FFT estimate
+used to gate detection, the full ``red`` detection run sequentially,
+and the concurrent ``EquilibrationAnalyzer``, cold and memoized.
+"""
+
+import json
+import time
+
+import click
+import numpy as np
+
+
+def generate_series(
+    n_samples: int, correlation: float = 0.9, seed: int = 0
+) -> np.ndarray:
+    """Generate an AR(1) series that decays from an offset start."""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=n_samples)
+    series = np.empty(n_samples)
+    series[0] = 0.0
+    for i in range(1, n_samples):
+        series[i] = correlation * series[i - 1] + noise[i]
+    transient = 10 * np.exp(-np.arange(n_samples) / (0.05 * n_samples))
+    return series + transient
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(lengths: list[int] = (500, 2000, 8000), seed: int = 0) -> dict:
+    """Run the benchmark, returning timings in seconds for each length."""
+    from eveq.equilibration.convergence import (
+        EquilibrationAnalyzer,
+        EquilibrationGate,
+        detect_equilibration,
+    )
+
+    results = []
+    for n_samples in lengths:
+        observables = {
+            "potential_energy": generate_series(n_samples, seed=seed),
+            "density": generate_series(n_samples, seed=seed + 1),
+        }
+
+        gate = EquilibrationGate(list(observables), n_required_samples=100)
+        gate.extend(np.column_stack(list(observables.values())))
+        cheap_estimate = _time(gate.recompute)
+
+        sequential = _time(
+            lambda: [
+                detect_equilibration(data, name)
+                for name, data in observables.items()
+            ]
+        )
+
+        analyzer = EquilibrationAnalyzer()
+        concurrent = _time(lambda: analyzer.analyze(observables))
+        memoized = _time(lambda: analyzer.analyze(observables))
+        analyzer.shutdown()
+
+        results.append(
+            {
+                "n_samples": n_samples,
+                "cheap_estimate_s": cheap_estimate,
+                "sequential_s": sequential,
+                "concurrent_s": concurrent,
+                "memoized_s": memoized,
+            }
+        )
+    return {"series": results}
+
+
+@click.command()
+@click.option(
+    "--length",
+    "-l",
+    "lengths",
+    type=int,
+    multiple=True,
+    default=(500, 2000, 8000),
+    help="Length of the series to analyze. Can be given multiple times.",
+)
+@click.option(
+    "--seed", type=int, default=0, help="Random seed for generating series."
+)
+def main(lengths: tuple[int, ...] = (500, 2000, 8000), seed: int = 0):
+    click.echo(json.dumps(run(lengths=list(lengths), seed=seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
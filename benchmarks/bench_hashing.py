@@ -0,0 +1,154 @@
+"""
+Micro-benchmark of PropertyBox hashing.
+
+This times the hash of many synthetic boxes through the full JSON
+serialization (the original implementation), and through the
+cached fast path with a cold and a warm digest cache. It also checks
+that both give identical storage keys.
+"""
+
+import itertools
+import json
+import random
+import time
+
+import click
+
+SMILES = [
+    "O",
+    "CO",
+    "CCO",
+    "CCCO",
+    "CC(C)O",
+    "CCN",
+    "CCCN",
+    "CNC",
+    "CN(C)C",
+    "NCCN",
+    "CC(=O)C",
+    "CCOC(C)=O",
+    "c1ccccc1",
+    "Cc1ccccc1",
+    "ClCCl",
+]
+
+
+def generate_boxes(n_boxes: int, seed: int = 0) -> list:
+    """Generate synthetic liquid boxes of small molecules and binary mixtures.
+
+    Boxes repeat, as they do in real datasets where many properties
+    are measured at the same substance and state.
+    """
+    from openff.evaluator.datasets import PropertyPhase
+    from openff.evaluator.substances import Component, MoleFraction, Substance
+    from openff.evaluator.thermodynamics import ThermodynamicState
+    from openff.units import unit
+
+    from eveq.box.box import PropertyBox
+
+    rng = random.Random(seed)
+    pairs = list(itertools.combinations(SMILES, 2))
+    temperatures = [278.15 + 5 * i for i in range(12)]
+    fractions = [0.1 * i for i in range(1, 10)]
+
+    boxes = []
+    for _ in range(n_boxes):
+        substance = Substance()
+        if rng.random() < 0.3:
+            substance.add_component(
+                Component(rng.choice(SMILES)), MoleFraction(1.0)
+            )
+        else:
+            smiles_1, smiles_2 = rng.choice(pairs)
+            fraction = rng.choice(fractions)
+            substance.add_component(Component(smiles_1), MoleFraction(fraction))
+            substance.add_component(
+                Component(smiles_2), MoleFraction(1.0 - fraction)
+            )
+        state = ThermodynamicState(
+            temperature=rng.choice(temperatures) * unit.kelvin,
+            pressure=101.325 * unit.kilopascal,
+        )
+        boxes.append(PropertyBox(substance, 1000, state, PropertyPhase.Liquid))
+    return boxes
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(n_boxes: int = 20000, seed: int = 0) -> dict:
+    """Run the benchmark, returning timings in seconds."""
+    from eveq.box import box as box_module
+    from eveq.box.box import ConsistentHashableData
+
+    boxes = generate_boxes(n_boxes, seed=seed)
+
+    def hashable(box):
+        return ConsistentHashableData(
+            box.substance,
+            box.n_molecules,
+            box.n_molecules,
+            box.thermodynamic_state,
+            box.phase,
+        )
+
+    # the original implementation serialized on every call
+    slow_keys = []
+    full_serialization = _time(
+        lambda: slow_keys.extend(
+            "u_" + str(hash(hashable(box)._compute_digest())) for box in boxes
+        )
+    )
+
+    box_module._DIGEST_CACHE.clear()
+    cold_boxes = generate_boxes(n_boxes, seed=seed)
+    fast_keys = []
+    cold_cache = _time(
+        lambda: fast_keys.extend(box._get_storage_key() for box in cold_boxes)
+    )
+
+    warm_boxes = generate_boxes(n_boxes, seed=seed)
+    warm_cache = _time(lambda: [hash(box) for box in warm_boxes])
+
+    # e.g. set(), then _get_storage_key, on boxes that were already hashed
+    repeated = _time(
+        lambda: (
+            set(warm_boxes),
+            [box._get_storage_key() for box in warm_boxes],
+        )
+    )
+
+    if slow_keys != fast_keys:
+        raise AssertionError("The fast path produced different storage keys")
+
+    return {
+        "n_boxes": n_boxes,
+        "n_unique_boxes": len(set(fast_keys)),
+        "full_serialization_s": full_serialization,
+        "cold_cache_s": cold_cache,
+        "warm_cache_s": warm_cache,
+        "repeated_s": repeated,
+    }
+
+
+@click.command()
+@click.option(
+    "--n-boxes",
+    "-n",
+    "n_boxes",
+    type=int,
+    default=20000,
+    help="Number of boxes to hash.",
+)
+@click.option(
+    "--seed", type=int, default=0, help="Random seed for generating boxes."
+)
+def main(n_boxes: int = 20000, seed: int = 0):
+    click.echo(json.dumps(run(n_boxes=n_boxes, seed=seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark of planning the boxes needed by a dataset.
+
+This times building boxes one property at a time with
+``PropertyBox.from_physical_property``, against ``plan_boxes`` on the
+dataset and on its ``to_pandas()`` data frame. It also checks that
+all of them plan the same boxes.
+"""
+
+import itertools
+import json
+import random
+import time
+
+import click
+
+from bench_hashing import SMILES
+
+
+def generate_dataset(n_properties: int, seed: int = 0):
+    """Generate a synthetic dataset of densities and enthalpies of mixing.
+
+    As in real datasets, many properties share a substance and state.
+    """
+    from openff.evaluator.datasets import PhysicalPropertyDataSet, PropertyPhase
+    from openff.evaluator.properties import Density, EnthalpyOfMixing
+    from openff.evaluator.substances import Component, MoleFraction, Substance
+    from openff.evaluator.thermodynamics import ThermodynamicState
+    from openff.units import unit
+
+    rng = random.Random(seed)
+    pairs = list(itertools.combinations(SMILES, 2))
+    temperatures = [278.15 + 5 * i for i in range(12)]
+    fractions = [0.1 * i for i in range(1, 10)]
+
+    properties = []
+    for _ in range(n_properties):
+        smiles_1, smiles_2 = rng.choice(pairs)
+        fraction = rng.choice(fractions)
+        substance = Substance()
+        substance.add_component(Component(smiles_1), MoleFraction(fraction))
+        substance.add_component(
+            Component(smiles_2), MoleFraction(1.0 - fraction)
+        )
+        state = ThermodynamicState(
+            temperature=rng.choice(temperatures) * unit.kelvin,
+            pressure=101.325 * unit.kilopascal,
+        )
+        if rng.random() < 0.5:
+            physical_property = Density(
+                thermodynamic_state=state,
+                phase=PropertyPhase.Liquid,
+                substance=substance,
+                value=1.0 * unit.gram / unit.milliliter,
+                uncertainty=0.01 * unit.gram / unit.milliliter,
+            )
+        else:
+            physical_property = EnthalpyOfMixing(
+                thermodynamic_state=state,
+                phase=PropertyPhase.Liquid,
+                substance=substance,
+                value=1.0 * unit.kilojoule / unit.mole,
+                uncertainty=0.01 * unit.kilojoule / unit.mole,
+            )
+        properties.append(physical_property)
+
+    dataset = PhysicalPropertyDataSet()
+    dataset.add_properties(*properties)
+    return dataset
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(n_properties: int = 2000, seed: int = 0) -> dict:
+    """Run the benchmark, returning timings in seconds."""
+    from eveq.box.box import PropertyBox
+    from eveq.box.planning import plan_boxes
+
+    dataset = generate_dataset(n_properties, seed=seed)
+    data_frame = dataset.to_pandas()
+
+    naive_keys = set()
+    per_property = _time(
+        lambda: naive_keys.update(
+            box._get_storage_key()
+            for physical_property in dataset.properties
+            for box in PropertyBox.from_physical_property(physical_property)
+        )
+    )
+
+    planned = {}
+    from_dataset = _time(lambda: planned.update(dataset=plan_boxes(dataset)[0]))
+    from_data_frame = _time(
+        lambda: planned.update(data_frame=plan_boxes(data_frame)[0])
+    )
+
+    if (
+        set(planned["dataset"]) != naive_keys
+        or set(planned["data_frame"]) != naive_keys
+    ):
+        raise AssertionError("plan_boxes planned different boxes")
+
+    return {
+        "n_properties": n_properties,
+        "n_unique_boxes": len(naive_keys),
+        "per_property_s": per_property,
+        "plan_boxes_dataset_s": from_dataset,
+        "plan_boxes_data_frame_s": from_data_frame,
+    }
+
+
+@click.command()
+@click.option(
+    "--n-properties",
+    "-n",
+    "n_properties",
+    type=int,
+    default=2000,
+    help="Number of properties to plan.",
+)
+@click.option(
+    "--seed", type=int, default=0, help="Random seed for generating properties."
+)
+def main(n_properties: int = 2000, seed: int = 0):
+    click.echo(json.dumps(run(n_properties=n_properties, seed=seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
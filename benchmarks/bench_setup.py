@@ -0,0 +1,160 @@
+"""
+Benchmark of setting up and simulating a box.
+
+This times each stage of ``EquilibrationSystem`` on small boxes of small
+molecules: packing with ``to_topology``, parameterizing with
+``create_interchange`` (with cold and warm caches), minimization,
+and a short segment on the CPU platform (or Reference, if CPU is not
+available). It runs on a machine without a GPU.
+"""
+
+import json
+import tempfile
+import time
+
+import click
+
+SUBSTANCES = [
+    {"CCO": 1.0},
+    {"CCN": 0.5, "O": 0.5},
+    {"CN(C)C": 0.3, "CCO": 0.7},
+]
+
+
+def _get_platform():
+    import openmm
+
+    try:
+        return openmm.Platform.getPlatformByName("CPU")
+    except Exception:
+        return openmm.Platform.getPlatformByName("Reference")
+
+
+def _create_box(fractions: dict[str, float], n_molecules: int):
+    from openff.evaluator.datasets import PropertyPhase
+    from openff.evaluator.substances import Component, MoleFraction, Substance
+    from openff.evaluator.thermodynamics import ThermodynamicState
+    from openff.units import unit
+
+    from eveq.box.box import PropertyBox
+
+    substance = Substance()
+    for smiles, fraction in fractions.items():
+        substance.add_component(Component(smiles), MoleFraction(fraction))
+    state = ThermodynamicState(
+        temperature=298.15 * unit.kelvin,
+        pressure=101.325 * unit.kilopascal,
+    )
+    return PropertyBox(substance, n_molecules, state, PropertyPhase.Liquid)
+
+
+def run(
+    n_molecules: int = 100,
+    n_steps: int = 1000,
+    forcefield: str = "openff-2.1.0.offxml",
+) -> dict:
+    """Run the benchmark, returning timings in seconds, summed over boxes."""
+    from openff.toolkit import ForceField
+
+    from eveq.box.templates import MoleculeTemplateCache
+    from eveq.equilibration.charges import PartialChargeCache
+    from eveq.equilibration.system import EquilibrationSystem
+
+    forcefield = ForceField(forcefield)
+    platform = _get_platform()
+    template_cache = MoleculeTemplateCache()
+    charge_cache = PartialChargeCache()
+
+    timings = {
+        "pack_s": 0.0,
+        "parameterize_cold_s": 0.0,
+        "parameterize_warm_s": 0.0,
+        "minimize_s": 0.0,
+        "segment_s": 0.0,
+    }
+    with tempfile.TemporaryDirectory() as working_directory:
+        for fractions in SUBSTANCES:
+            system = EquilibrationSystem(
+                box=_create_box(fractions, n_molecules),
+                forcefield=forcefield,
+                working_directory=working_directory,
+                template_cache=template_cache,
+                charge_cache=charge_cache,
+                platform=platform,
+            )
+
+            start = time.perf_counter()
+            topology = system.box.to_topology(template_cache=template_cache)
+            timings["pack_s"] += time.perf_counter() - start
+
+            # the first parameterization charges any molecules not seen
+            # in earlier boxes, the second reuses the cached interchange
+            start = time.perf_counter()
+            system.parameterize(topology)
+            timings["parameterize_cold_s"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            system.parameterize(topology)
+            timings["parameterize_warm_s"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            system.minimize()
+            timings["minimize_s"] += time.perf_counter() - start
+
+            # includes creating the context, as it is once per box
+            start = time.perf_counter()
+            system.equilibrate_step(n_steps)
+            timings["segment_s"] += time.perf_counter() - start
+            system.close()
+
+    return {
+        "n_boxes": len(SUBSTANCES),
+        "n_molecules": n_molecules,
+        "n_steps": n_steps,
+        "platform": platform.getName(),
+        **timings,
+    }
+
+
+@click.command()
+@click.option(
+    "--n-molecules",
+    "-n",
+    "n_molecules",
+    type=int,
+    default=100,
+    help="Number of molecules in each box.",
+)
+@click.option(
+    "--n-steps",
+    "-s",
+    "n_steps",
+    type=int,
+    default=1000,
+    help="Number of steps to simulate each box for.",
+)
+@click.option(
+    "--forcefield",
+    "-ff",
+    "forcefield",
+    type=str,
+    default="openff-2.1.0.offxml",
+    help="The force field.",
+)
+def main(
+    n_molecules: int = 100,
+    n_steps: int = 1000,
+    forcefield: str = "openff-2.1.0.offxml",
+):
+    click.echo(
+        json.dumps(
+            run(
+                n_molecules=n_molecules, n_steps=n_steps, forcefield=forcefield
+            ),
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark of a LocalStoredEquilibrationData with many objects.
+
+This generates N stored equilibration objects, each with a small
+coordinate file, and times ingesting them with ``store_objects``,
+opening the storage with and without the index (and rebuilding
+the index from scratch), and looking objects up.
+"""
+
+import json
+import pathlib
+import tempfile
+import time
+
+import click
+
+from bench_hashing import generate_boxes
+
+
+def generate_stored_data(n_objects: int, seed: int = 0) -> list:
+    """Generate equilibration data for up to ``n_objects`` unique boxes."""
+    from openff.evaluator.storage.data import StoredEquilibrationData
+
+    boxes = {}
+    for box in generate_boxes(4 * n_objects, seed=seed):
+        boxes.setdefault(box._get_storage_key(), box)
+        if len(boxes) == n_objects:
+            break
+
+    return [
+        StoredEquilibrationData(
+            substance=box.substance,
+            thermodynamic_state=box.thermodynamic_state,
+            property_phase=box.phase,
+            source_calculation_id="benchmark",
+            force_field_id="ff_benchmark",
+            coordinate_file_name="output.pdb",
+            statistical_inefficiency=1.0 + i % 7,
+            number_of_molecules=box.n_molecules,
+            max_number_of_molecules=box.n_molecules,
+            calculation_layer="EquilibrationLayer",
+        )
+        for i, box in enumerate(boxes.values())
+    ]
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(
+    n_objects: int = 1000,
+    n_lookups: int = 100,
+    n_workers: int | None = None,
+    seed: int = 0,
+) -> dict:
+    """Run the benchmark, returning timings in seconds."""
+    from openff.evaluator.storage.data import StoredEquilibrationData
+
+    from eveq.storage.storage import LocalStoredEquilibrationData
+
+    stored_data = generate_stored_data(n_objects, seed=seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        ancillary_directory = directory / "ancillary"
+        ancillary_directory.mkdir()
+        (ancillary_directory / "output.pdb").write_text(
+            "REMARK benchmark\nEND\n"
+        )
+        root = directory / "stored_data"
+
+        storage_keys = []
+        ingest = _time(
+            lambda: storage_keys.extend(
+                LocalStoredEquilibrationData(
+                    root, use_index=True
+                ).store_objects(
+                    [(data, str(ancillary_directory)) for data in stored_data],
+                    n_workers=n_workers,
+                )
+            )
+        )
+
+        open_without_index = _time(lambda: LocalStoredEquilibrationData(root))
+        open_with_index = _time(
+            lambda: LocalStoredEquilibrationData(root, use_index=True)
+        )
+        (root / LocalStoredEquilibrationData.index_file_name).unlink()
+        rebuild_index = _time(
+            lambda: LocalStoredEquilibrationData(root, use_index=True)
+        )
+
+        storage = LocalStoredEquilibrationData(
+            root, use_index=True, max_cached_objects=n_lookups
+        )
+        contains = _time(
+            lambda: [storage.contains_storage_key(key) for key in storage_keys]
+        )
+        lookup_keys = storage_keys[:n_lookups]
+        retrieve_cold = _time(
+            lambda: [
+                storage.retrieve_object(key, StoredEquilibrationData)
+                for key in lookup_keys
+            ]
+        )
+        retrieve_warm = _time(
+            lambda: [
+                storage.retrieve_object(key, StoredEquilibrationData)
+                for key in lookup_keys
+            ]
+        )
+
+    return {
+        "n_objects": len(stored_data),
+        "n_lookups": len(lookup_keys),
+        "ingest_s": ingest,
+        "open_without_index_s": open_without_index,
+        "open_with_index_s": open_with_index,
+        "rebuild_index_s": rebuild_index,
+        "contains_all_s": contains,
+        "retrieve_cold_s": retrieve_cold,
+        "retrieve_warm_s": retrieve_warm,
+    }
+
+
+@click.command()
+@click.option(
+    "--n-objects",
+    "-n",
+    "n_objects",
+    type=int,
+    default=1000,
+    help="Number of objects to store.",
+)
+@click.option(
+    "--n-lookups",
+    "-l",
+    "n_lookups",
+    type=int,
+    default=100,
+    help="Number of objects to retrieve.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to ingest.",
+)
+@click.option(
+    "--seed", type=int, default=0, help="Random seed for generating objects."
+)
+def main(
+    n_objects: int = 1000,
+    n_lookups: int = 100,
+    n_workers: int | None = None,
+    seed: int = 0,
+):
+    click.echo(
+        json.dumps(
+            run(
+                n_objects=n_objects,
+                n_lookups=n_lookups,
+                n_workers=n_workers,
+                seed=seed,
+            ),
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Run the benchmark suite and save the results as JSON.
+
+Results are tagged with the git commit, Python version and machine,
+so that runs on different commits can be compared with ``--compare``.
+Benchmarks are small by default, so the suite runs on a CPU-only machine.
+"""
+
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import traceback
+
+import click
+
+import bench_convergence
+import bench_hashing
+import bench_planning
+import bench_setup
+import bench_storage
+
+BENCHMARKS = {
+    "hashing": lambda: bench_hashing.run(n_boxes=5000),
+    "planning": lambda: bench_planning.run(n_properties=1000),
+    "setup": lambda: bench_setup.run(n_molecules=100, n_steps=1000),
+    "convergence": lambda: bench_convergence.run(lengths=[500, 2000, 8000]),
+    "storage": lambda: bench_storage.run(n_objects=1000),
+}
+
+
+def _get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results, prefix: str = "") -> dict[str, float]:
+    """Flatten nested results into timings keyed by path,
+    e.g. ``convergence.series.0.sequential_s``.
+    """
+    if isinstance(results, dict):
+        items = results.items()
+    elif isinstance(results, list):
+        items = enumerate(results)
+    else:
+        return {}
+    flat = {}
+    for key, value in items:
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if str(key).endswith("_s") and isinstance(value, (int, float)):
+            flat[path] = value
+        else:
+            flat.update(_flatten(value, path))
+    return flat
+
+
+def compare(baseline: dict, results: dict) -> dict[str, float]:
+    """Return the ratio of each timing to the baseline; above 1 is slower."""
+    baseline_timings = _flatten(baseline["benchmarks"])
+    return {
+        path: value / baseline_timings[path]
+        for path, value in _flatten(results["benchmarks"]).items()
+        if baseline_timings.get(path)
+    }
+
+
+@click.command()
+@click.option(
+    "--benchmark",
+    "-b",
+    "benchmarks",
+    type=click.Choice(list(BENCHMARKS)),
+    multiple=True,
+    help=(
+        "Benchmark to run. Can be given multiple times. "
+        "By default all are run."
+    ),
+)
+@click.option(
+    "--output",
+    "-o",
+    "output_file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Path to save the results to. By default they are printed.",
+)
+@click.option(
+    "--compare",
+    "-c",
+    "baseline_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Path to earlier results to compare timings against.",
+)
+def main(
+    benchmarks: tuple[str, ...] = (),
+    output_file: str | None = None,
+    baseline_file: str | None = None,
+):
+    results = {
+        "commit": _get_git_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version,
+        "machine": platform.platform(),
+        "benchmarks": {},
+        "errors": {},
+    }
+    for name in benchmarks or BENCHMARKS:
+        click.echo(f"Running {name}", err=True)
+        try:
+            results["benchmarks"][name] = BENCHMARKS[name]()
+        except Exception:
+            # e.g. a missing optional dependency; the rest still run
+            results["errors"][name] = traceback.format_exc()
+            click.echo(f"{name} failed:\n{results['errors'][name]}", err=True)
+
+    if baseline_file is not None:
+        with open(baseline_file, "r") as file:
+            results["ratios_to_baseline"] = compare(json.load(file), results)
+
+    output = json.dumps(results, indent=2)
+    if output_file is None:
+        click.echo(output)
+    else:
+        with open(output_file, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
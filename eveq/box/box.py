@@ -13,8 +13,78 @@ from openff.interchange.components._packmol import UNIT_CUBE, pack_box
 from openff.toolkit import Molecule, ForceField, Topology
 from openff.units import unit
 
+from eveq.box.templates import _DEFAULT_TEMPLATE_CACHE
+
+
+# Digests are expensive to compute, so they are cached by a cheap
+# canonical key of the hashed data. This is shared across instances.
+_DIGEST_CACHE: dict[tuple, int] = {}
+_MAX_CACHED_DIGESTS = 2 ** 17
+
+
+def _get_value_key(value) -> tuple:
+    # the type is included as e.g. 1 and 1.0 serialize differently
+    return (type(value).__name__, value)
+
+
+def _get_quantity_key(quantity) -> tuple | None:
+    if quantity is None:
+        return None
+    return (*_get_value_key(quantity.magnitude), str(quantity.units))
+
+
+def _get_amount_key(amount) -> tuple:
+    return (type(amount).__name__, *_get_value_key(amount.value))
+
+
+def _get_substance_key(substance: Substance) -> tuple:
+    # mirror the serialized substance, in the order it is hashed:
+    # components in order, then amounts by identifier (json.dumps
+    # sorts dict keys), with the amounts of each in their own order.
+    # Sorting anything else would map differently hashed substances
+    # to the same key.
+    amounts = substance.amounts
+    return (
+        tuple(
+            (component.smiles, str(component.role))
+            for component in substance.components
+        ),
+        tuple(
+            (
+                identifier,
+                tuple(
+                    _get_amount_key(amount) for amount in amounts[identifier]
+                ),
+            )
+            for identifier in sorted(amounts)
+        ),
+    )
+
+
+def _to_substance_n_molecules(
+    substance: Substance,
+    n_molecules: int,
+    substance_cache: dict | None = None,
+) -> Substance:
+    if substance_cache is None:
+        return substance.to_substance_n_molecules(n_molecules)
+    key = (_get_substance_key(substance), n_molecules)
+    if key not in substance_cache:
+        substance_cache[key] = substance.to_substance_n_molecules(n_molecules)
+    return substance_cache[key]
+
 
 class ConsistentHashableData:
+    """
+    Data describing an equilibration box, with a hash that is
+    consistent across processes and Python sessions.
+
+    The hash is the SHA-256 digest of the JSON serialization of the data.
+    It is computed once per instance, and cached across instances by
+    a canonical tuple of SMILES, amounts, state and phase, so repeated
+    boxes never pay for the serialization again. The cache only
+    changes how often the digest is computed, not its value.
+    """
     def __init__(
         self,
         substance: Substance,
@@ -28,9 +98,21 @@ class ConsistentHashableData:
         self.max_molecules = max_molecules
         self.thermodynamic_state = thermodynamic_state
         self.property_phase = property_phase
-    
+        self._hash = None
 
-    def __hash__(self):
+    def _get_canonical_key(self) -> tuple:
+        state = self.thermodynamic_state
+        phase = self.property_phase
+        return (
+            _get_substance_key(self.substance),
+            _get_value_key(self.n_molecules),
+            _get_value_key(self.max_molecules),
+            None if state is None else _get_quantity_key(state.temperature),
+            None if state is None else _get_quantity_key(state.pressure),
+            None if phase is None else (type(phase).__name__, int(phase)),
+        )
+
+    def _compute_digest(self) -> int:
         obj = {
             "substance": self.substance,
             "n_molecules": self.n_molecules,
@@ -42,6 +124,28 @@ class ConsistentHashableData:
 
         return int(hashlib.sha256(serialized.encode("utf-8")).hexdigest(), 16)
 
+    def __hash__(self):
+        if self._hash is not None:
+            return self._hash
+
+        try:
+            key = self._get_canonical_key()
+            digest = _DIGEST_CACHE.get(key)
+        except (AttributeError, TypeError):
+            # not data we know how to key (or hash); take the slow path
+            key = digest = None
+
+        if digest is None:
+            digest = self._compute_digest()
+            if key is not None:
+                if len(_DIGEST_CACHE) >= _MAX_CACHED_DIGESTS:
+                    _DIGEST_CACHE.clear()
+                _DIGEST_CACHE[key] = digest
+
+        # reduce to a Python hash once, rather than on every call
+        self._hash = hash(digest)
+        return self._hash
+
 
 class PropertyBox(TypedBaseModel):
     """
@@ -54,11 +158,19 @@ class PropertyBox(TypedBaseModel):
         thermodynamic_state=None,
         property_phase=None,
     ):
+        self._hash = None
         self.substance = substance
         self.n_molecules = n_molecules
         self.thermodynamic_state = thermodynamic_state
         self.phase = property_phase
 
+    def __setattr__(self, name, value):
+        # boxes are treated as immutable, but reset
+        # the cached hash if an attribute is reassigned
+        if name != "_hash":
+            self.__dict__["_hash"] = None
+        super().__setattr__(name, value)
+
     def __setstate__(self, state):
         self.substance = state["substance"]
         self.n_molecules = state["n_molecules"]
@@ -83,16 +195,25 @@ class PropertyBox(TypedBaseModel):
         )
 
 
-    def to_topology(self) -> Topology:
-        """ Convert the PropertyBox to an OpenFF Topology."""
+    def to_topology(self, template_cache=None) -> Topology:
+        """ Convert the PropertyBox to an OpenFF Topology.
+
+        Parameters
+        ----------
+        template_cache : MoleculeTemplateCache, optional
+            The cache of molecules with conformers to pack the box from.
+            By default, a cache shared by the whole process is used.
+        """
+        if template_cache is None:
+            template_cache = _DEFAULT_TEMPLATE_CACHE
+
         n_molecules = self.substance.get_molecules_per_component(
             self.n_molecules
         )
         molecules = []
         counts = []
         for component in self.substance.components:
-            mol = Molecule.from_smiles(component.smiles)
-            mol.generate_conformers(n_conformers=1)
+            mol = template_cache.get_molecule(component.smiles)
             molecules.append(mol)
             counts.append(n_molecules[component.identifier])
 
@@ -112,9 +233,28 @@ class PropertyBox(TypedBaseModel):
         cls,
         physical_property: PhysicalProperty,
         n_molecules: int = 1000,
+        substance_cache: dict | None = None,
     ) -> list["PropertyBox"]:
-        substance = physical_property.substance.to_substance_n_molecules(
-            n_molecules,
+        """Create the boxes needed to estimate a physical property.
+
+        Parameters
+        ----------
+        physical_property : PhysicalProperty
+            The property to create boxes for.
+        n_molecules : int, optional
+            The number of molecules in each box, by default 1000.
+        substance_cache : dict, optional
+            A dictionary to cache substances with molecule counts in.
+            Pass the same dictionary to many calls to avoid converting
+            the same substance repeatedly.
+
+        Returns
+        -------
+        list[PropertyBox]
+            The boxes for the property.
+        """
+        substance = _to_substance_n_molecules(
+            physical_property.substance, n_molecules, substance_cache
         )
         substances = [substance]
 
@@ -124,8 +264,8 @@ class PropertyBox(TypedBaseModel):
             for component in physical_property.substance.components:
                 component_substance = Substance.from_components(component)
                 substances.append(
-                    component_substance.to_substance_n_molecules(
-                        n_molecules,
+                    _to_substance_n_molecules(
+                        component_substance, n_molecules, substance_cache
                     )
                 )
     
@@ -157,15 +297,17 @@ class PropertyBox(TypedBaseModel):
         ]
 
     def __hash__(self) -> int:
-        return hash(
-            ConsistentHashableData(
-                self.substance,
-                self.n_molecules,
-                self.n_molecules,
-                self.thermodynamic_state,
-                self.phase,
+        if self.__dict__.get("_hash") is None:
+            self._hash = hash(
+                ConsistentHashableData(
+                    self.substance,
+                    self.n_molecules,
+                    self.n_molecules,
+                    self.thermodynamic_state,
+                    self.phase,
+                )
             )
-        )
+        return self._hash
     
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, PropertyBox):
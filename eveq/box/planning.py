@@ -0,0 +1,194 @@
+"""
+Planning the boxes needed to estimate a whole dataset at once.
+"""
+
+import pandas as pd
+
+import openff.evaluator.properties
+from openff.evaluator.datasets import PhysicalPropertyDataSet
+from openff.evaluator.properties import EnthalpyOfVaporization
+from openff.evaluator.properties.properties import EstimableExcessProperty
+
+from eveq.box.box import PropertyBox, _get_quantity_key, _get_substance_key
+
+
+def _get_property_category(property_class) -> str:
+    """Group property types by the boxes they need,
+    following ``PropertyBox.from_physical_property``.
+    """
+    if property_class is None:
+        return "pure"
+    if issubclass(property_class, EnthalpyOfVaporization):
+        return "vaporization"
+    if issubclass(property_class, EstimableExcessProperty):
+        return "excess"
+    return "pure"
+
+
+def _group_properties(physical_properties) -> tuple[list, dict[str, int]]:
+    """Group properties that need the same boxes.
+
+    Returns
+    -------
+    representatives : list[PhysicalProperty]
+        One property per group.
+    property_groups : dict[str, int]
+        The group index of each property, by property id.
+    """
+    representatives = []
+    property_groups = {}
+    group_indices = {}
+    for physical_property in physical_properties:
+        state = physical_property.thermodynamic_state
+        phase = physical_property.phase
+        key = (
+            _get_property_category(type(physical_property)),
+            _get_substance_key(physical_property.substance),
+            _get_quantity_key(state.temperature),
+            _get_quantity_key(state.pressure),
+            None if phase is None else int(phase),
+        )
+        if key not in group_indices:
+            group_indices[key] = len(representatives)
+            representatives.append(physical_property)
+        property_groups[physical_property.id] = group_indices[key]
+    return representatives, property_groups
+
+
+def _group_data_frame(data_frame: pd.DataFrame) -> tuple[list, dict[str, int]]:
+    """Group the rows of a ``PhysicalPropertyDataSet.to_pandas`` data frame
+    that need the same boxes. Only one row per group is converted
+    into a property.
+
+    Returns
+    -------
+    representatives : list[PhysicalProperty]
+        One property per group.
+    property_groups : dict[str, int]
+        The group index of each property, by property id.
+    """
+    value_columns = [
+        column for column in data_frame.columns if " Value (" in column
+    ]
+    property_types = (
+        data_frame[value_columns]
+        .notna()
+        .idxmax(axis=1)
+        .str.split(" Value (", regex=False)
+        .str[0]
+    )
+    categories = {
+        property_type: _get_property_category(
+            getattr(openff.evaluator.properties, property_type, None)
+        )
+        for property_type in property_types.unique()
+    }
+
+    substance_columns = [
+        column
+        for column in data_frame.columns
+        if column.startswith(
+            ("Component ", "Role ", "Mole Fraction ", "Exact Amount ")
+        )
+    ]
+    group_columns = [
+        "Temperature (K)",
+        "Pressure (kPa)",
+        "Phase",
+        *substance_columns,
+    ]
+    groups = data_frame[group_columns].assign(
+        _category=property_types.map(categories)
+    )
+
+    group_indices = groups.groupby(
+        list(groups.columns), dropna=False, sort=False
+    ).ngroup()
+    first_rows = ~group_indices.duplicated()
+
+    # ngroup numbers groups in order of first appearance, as sort=False
+    property_groups = dict(
+        zip(data_frame["Id"].astype(str), group_indices.astype(int))
+    )
+
+    # map each converted property back to its group by id, as the
+    # properties of a data set are not guaranteed to keep the row order
+    representative_frame = data_frame[first_rows.values]
+    group_representatives = {}
+    for physical_property in PhysicalPropertyDataSet.from_pandas(
+        representative_frame
+    ).properties:
+        group_representatives[property_groups[str(physical_property.id)]] = (
+            physical_property
+        )
+
+    n_groups = int(first_rows.sum())
+    missing_groups = set(range(n_groups)) - set(group_representatives)
+    if missing_groups:
+        raise ValueError(
+            f"{len(missing_groups)} groups of properties could not be "
+            "converted from the data frame. "
+            'Property ids in the "Id" column must be unique.'
+        )
+    representatives = [
+        group_representatives[group_index] for group_index in range(n_groups)
+    ]
+    return representatives, property_groups
+
+
+def plan_boxes(
+    dataset: PhysicalPropertyDataSet | pd.DataFrame,
+    n_molecules: int = 1000,
+) -> tuple[dict[str, PropertyBox], dict[str, list[str]]]:
+    """
+    Plan the unique boxes needed to estimate every property in a dataset.
+
+    Properties that need the same boxes (the same kind of property,
+    substance, state and phase) are grouped before any boxes are built,
+    and substances are only converted to molecule counts once.
+    The boxes are identical to those from
+    ``PropertyBox.from_physical_property``.
+
+    Parameters
+    ----------
+    dataset : PhysicalPropertyDataSet or pandas.DataFrame
+        The dataset, or its ``to_pandas()`` representation. A data frame is
+        grouped in bulk, and only one row per group is converted to a
+        property. Note that a data frame stores pressures in kPa, so
+        properties given in other units get different boxes than
+        the original dataset would.
+    n_molecules : int, optional
+        The number of molecules in each box, by default 1000.
+
+    Returns
+    -------
+    boxes : dict[str, PropertyBox]
+        The unique boxes, by storage key.
+    property_box_keys : dict[str, list[str]]
+        The storage keys of the boxes needed by each property, by property id.
+    """
+    if isinstance(dataset, pd.DataFrame):
+        representatives, property_groups = _group_data_frame(dataset)
+    else:
+        representatives, property_groups = _group_properties(dataset.properties)
+
+    substance_cache = {}
+    boxes = {}
+    group_box_keys = []
+    for physical_property in representatives:
+        box_keys = []
+        for box in PropertyBox.from_physical_property(
+            physical_property,
+            n_molecules=n_molecules,
+            substance_cache=substance_cache,
+        ):
+            storage_key = box._get_storage_key()
+            boxes.setdefault(storage_key, box)
+            box_keys.append(storage_key)
+        group_box_keys.append(box_keys)
+
+    property_box_keys = {
+        property_id: group_box_keys[group_index]
+        for property_id, group_index in property_groups.items()
+    }
+    return boxes, property_box_keys
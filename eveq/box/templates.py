@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import pathlib
+
+from openff.toolkit import Molecule
+
+from eveq.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class MoleculeTemplateCache:
+    """
+    A cache of molecules with a generated conformer, for packing boxes.
+
+    Templates are keyed by canonical SMILES. They are kept in memory for
+    the life of the process and, if a directory is given, saved to disk
+    so that they can be reused by other processes. Files are written
+    atomically, so many processes (e.g. SLURM array tasks) can safely
+    share one directory; at worst, two processes generate the same
+    template at once and one overwrites the other.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path, optional
+        The directory to save templates in. If not given,
+        templates are only cached in memory.
+    """
+
+    def __init__(self, directory: str | pathlib.Path | None = None):
+        self.directory = None
+        if directory is not None:
+            self.directory = pathlib.Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._templates: dict[str, Molecule] = {}
+
+    def _get_template_path(self, canonical_smiles: str) -> pathlib.Path:
+        digest = hashlib.sha256(canonical_smiles.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def _load_template(self, canonical_smiles: str) -> Molecule | None:
+        if self.directory is None:
+            return None
+        template_path = self._get_template_path(canonical_smiles)
+        if not template_path.exists():
+            return None
+        try:
+            template = Molecule.from_json(template_path.read_text())
+        except Exception as error:
+            logger.warning(
+                f"Could not load template {template_path}, "
+                f"regenerating: {error}"
+            )
+            return None
+        if (
+            template.to_smiles() != canonical_smiles
+            or not template.n_conformers
+        ):
+            logger.warning(
+                f"Template {template_path} does not match "
+                f"{canonical_smiles}, regenerating"
+            )
+            return None
+        return template
+
+    def get_molecule(self, smiles: str) -> Molecule:
+        """Return a copy of the template molecule for a SMILES,
+        generating a conformer if it is not already cached.
+        """
+        molecule = Molecule.from_smiles(smiles)
+        canonical_smiles = molecule.to_smiles()
+
+        template = self._templates.get(canonical_smiles)
+        if template is None:
+            template = self._load_template(canonical_smiles)
+        if template is None:
+            molecule.generate_conformers(n_conformers=1)
+            template = molecule
+            if self.directory is not None:
+                atomic_write(
+                    self._get_template_path(canonical_smiles),
+                    template.to_json(),
+                )
+        self._templates[canonical_smiles] = template
+
+        # copy, so that callers can't modify the template
+        return Molecule(template)
+
+
+# templates are always reused within a process
+_DEFAULT_TEMPLATE_CACHE = MoleculeTemplateCache()
@@ -0,0 +1,23 @@
+"""
+The ``eveq`` command-line interface.
+"""
+
+import click
+
+from eveq.cli.report import report
+from eveq.cli.schedule import schedule
+from eveq.cli.status import status
+from eveq.cli.storage import storage
+from eveq.cli.timings import timings
+
+
+@click.group()
+def cli():
+    """Tools for storing and running Evaluator equilibrations."""
+
+
+cli.add_command(report)
+cli.add_command(schedule)
+cli.add_command(status)
+cli.add_command(storage)
+cli.add_command(timings)
@@ -0,0 +1,160 @@
+"""
+Options shared by the scripts that equilibrate boxes.
+"""
+
+import click
+
+_EQUILIBRATION_OPTIONS = [
+    click.option(
+        "--box-directory",
+        "-bd",
+        "box_directory",
+        type=click.Path(exists=True, dir_okay=True, readable=True),
+        default="working_directory/boxes",
+        help="Path to the directory containing box files.",
+    ),
+    click.option(
+        "--working-directory",
+        "-wd",
+        "working_directory",
+        type=click.Path(file_okay=False, writable=True),
+        default="working_directory/equilibration",
+        help="Path to the working directory for equilibration.",
+    ),
+    click.option(
+        "--forcefield",
+        "-ff",
+        "forcefield",
+        type=str,
+        default="openff-2.1.0.offxml",
+        help="Path to the force field file.",
+    ),
+    click.option(
+        "--max-iterations",
+        "-maxiter",
+        "max_iterations",
+        type=int,
+        default=2000,
+        help="Maximum simulated time for equilibration, in 200 ps iterations.",
+    ),
+    click.option(
+        "--min-steps-per-segment",
+        "-mins",
+        "min_steps_per_segment",
+        type=int,
+        default=10000,
+        help="Minimum number of 2 fs steps between convergence checks.",
+    ),
+    click.option(
+        "--max-steps-per-segment",
+        "-maxs",
+        "max_steps_per_segment",
+        type=int,
+        default=100000,
+        help="Maximum number of 2 fs steps between convergence checks.",
+    ),
+    click.option(
+        "--checkpoint-interval",
+        "-ci",
+        "checkpoint_interval",
+        type=int,
+        default=1,
+        help="Simulated time between checkpoints, in 200 ps iterations.",
+    ),
+    click.option(
+        "--plot-policy",
+        "-pp",
+        "plot_policy",
+        type=str,
+        default="final",
+        help=(
+            "When to save diagnostic plots: 'never', 'final', or 'every-N' "
+            "iterations. Plots can be regenerated afterwards with "
+            "`eveq report`."
+        ),
+    ),
+    click.option(
+        "--template-cache-directory",
+        "-tcd",
+        "template_cache_directory",
+        type=click.Path(file_okay=False, writable=True),
+        default="working_directory/templates",
+        help="Path to a directory of molecule templates shared between boxes.",
+    ),
+    click.option(
+        "--charge-cache-directory",
+        "-ccd",
+        "charge_cache_directory",
+        type=click.Path(file_okay=False, writable=True),
+        default="working_directory/charges",
+        help="Path to a directory of partial charges shared between boxes.",
+    ),
+    click.option(
+        "--profile",
+        "-prof",
+        "profile",
+        type=click.Choice(["cprofile", "pyinstrument"]),
+        default=None,
+        help=(
+            "Profile each stage of equilibration, saving profiles to the "
+            "box's profiles directory. Stage timings are always saved to "
+            "timings.jsonl."
+        ),
+    ),
+]
+
+
+def equilibration_options(function):
+    """Add the options for equilibrating boxes to a command."""
+    for option in reversed(_EQUILIBRATION_OPTIONS):
+        function = option(function)
+    return function
+
+
+def wall_time_option(default: float | None):
+    """The option for the hours a worker may run for."""
+    return click.option(
+        "--wall-time",
+        "-wt",
+        "wall_time",
+        type=float,
+        default=default,
+        help=(
+            "Hours to run for. No new boxes are claimed and no new segments "
+            "are started that are not expected to finish in time, so leave "
+            "a margin below the job's time limit."
+        ),
+    )
+
+
+def get_system_options(
+    forcefield: str,
+    max_iterations: int,
+    min_steps_per_segment: int,
+    max_steps_per_segment: int,
+    checkpoint_interval: int,
+    plot_policy: str,
+    template_cache_directory: str,
+    charge_cache_directory: str,
+    profile: str | None,
+) -> dict:
+    """
+    Load the force field and caches given by :func:`equilibration_options`,
+    returning the arguments to create each ``EquilibrationSystem`` with.
+    """
+    from openff.toolkit import ForceField
+
+    from eveq.box.templates import MoleculeTemplateCache
+    from eveq.equilibration.charges import PartialChargeCache
+
+    return {
+        "forcefield": ForceField(forcefield),
+        "max_iterations": max_iterations,
+        "min_steps_per_segment": min_steps_per_segment,
+        "max_steps_per_segment": max_steps_per_segment,
+        "checkpoint_interval": checkpoint_interval,
+        "plot_policy": plot_policy,
+        "template_cache": MoleculeTemplateCache(template_cache_directory),
+        "charge_cache": PartialChargeCache(charge_cache_directory),
+        "profile": profile,
+    }
@@ -0,0 +1,83 @@
+import concurrent.futures
+import pathlib
+
+import click
+
+
+def _plot_box(box_directory: str, statistics_file_name: str) -> str:
+    from eveq.equilibration.convergence import plot_equilibration
+
+    plot_equilibration(
+        pathlib.Path(box_directory) / statistics_file_name, box_directory
+    )
+    return box_directory
+
+
+@click.command()
+@click.argument(
+    "working_directory",
+    type=click.Path(exists=True, file_okay=False, writable=True),
+)
+@click.option(
+    "--box-key",
+    "-k",
+    "box_keys",
+    type=str,
+    multiple=True,
+    help=(
+        "Storage key of a box to plot. Can be given multiple times. "
+        "By default all boxes are plotted."
+    ),
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of processes used to render plots.",
+)
+def report(
+    working_directory: str,
+    box_keys: tuple[str, ...] = (),
+    n_workers: int | None = None,
+):
+    """
+    Regenerate the diagnostic equilibration plots of boxes
+    from their saved statistics.
+
+    WORKING_DIRECTORY is the equilibration working directory, with one
+    directory per box. Plots are saved next to each box's statistics.
+    """
+    statistics_file_name = "openmm_statistics.csv"
+
+    working_directory = pathlib.Path(working_directory)
+    if box_keys:
+        box_directories = [working_directory / box_key for box_key in box_keys]
+    else:
+        box_directories = sorted(
+            statistics_file.parent
+            for statistics_file in working_directory.glob(
+                f"*/{statistics_file_name}"
+            )
+        )
+    box_directories = [
+        box_directory
+        for box_directory in box_directories
+        if (box_directory / statistics_file_name).exists()
+    ]
+    click.echo(f"Plotting {len(box_directories)} boxes")
+
+    # rendering is CPU-bound, so plots are made in separate processes
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=n_workers
+    ) as executor:
+        futures = [
+            executor.submit(_plot_box, str(box_directory), statistics_file_name)
+            for box_directory in box_directories
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                click.echo(f"Plotted {future.result()}")
+            except Exception as error:
+                click.echo(f"Failed to plot a box: {error}", err=True)
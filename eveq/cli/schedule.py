@@ -0,0 +1,181 @@
+import pathlib
+
+import click
+
+
+@click.command()
+@click.argument(
+    "box_directory",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.argument(
+    "working_directory",
+    type=click.Path(file_okay=False, writable=True),
+)
+@click.option(
+    "--output-directory",
+    "-o",
+    "output_directory",
+    type=click.Path(file_okay=False, writable=True),
+    default="schedule",
+    help="Directory to write the manifest and box states to.",
+)
+@click.option(
+    "--state",
+    "-s",
+    "states",
+    type=click.Choice(["pending", "failed", "exceeded"]),
+    multiple=True,
+    default=("pending",),
+    show_default=True,
+    help=(
+        "States of boxes to schedule. Can be given multiple times. "
+        "Failed boxes have their claims released so they can run again."
+    ),
+)
+@click.option(
+    "--wall-time",
+    "-wt",
+    "wall_time",
+    type=float,
+    default=19.5,
+    help="Hours available to each array task.",
+)
+@click.option(
+    "--max-iterations",
+    "-maxiter",
+    "max_iterations",
+    type=int,
+    default=2000,
+    help="Maximum simulated time for equilibration, in 200 ps iterations.",
+)
+@click.option(
+    "--max-tasks",
+    "-n",
+    "max_tasks",
+    type=int,
+    default=None,
+    help="Maximum number of array tasks. The highest priority tasks are kept.",
+)
+@click.option(
+    "--priorities",
+    "-p",
+    "priorities_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help=(
+        "CSV of box priorities, with storage_key and n_properties "
+        "columns, as written by set-up-equilibration.py."
+    ),
+)
+@click.option(
+    "--ns-per-day",
+    "default_ns_per_day",
+    type=float,
+    default=50.0,
+    help="Speed to assume for boxes if none have run yet.",
+)
+@click.option(
+    "--preparation-hours",
+    "preparation_hours",
+    type=float,
+    default=0.25,
+    help="Hours to assume for packing, parameterizing and minimizing a box.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to read box states.",
+)
+def schedule(
+    box_directory: str,
+    working_directory: str,
+    output_directory: str = "schedule",
+    states: tuple[str, ...] = ("pending",),
+    wall_time: float = 19.5,
+    max_iterations: int = 2000,
+    max_tasks: int | None = None,
+    priorities_file: str | None = None,
+    default_ns_per_day: float = 50.0,
+    preparation_hours: float = 0.25,
+    n_workers: int | None = None,
+):
+    """
+    Schedule the boxes that still need equilibrating as a SLURM array.
+
+    BOX_DIRECTORY holds the box files and WORKING_DIRECTORY is the
+    equilibration working directory. Each box is classified as pending,
+    running, converged, failed or exceeded (out of simulated time), and
+    boxes in the chosen states are packed into array tasks that fit in
+    the wall time, using their expected cost.
+
+    The manifest has one line per array task, listing the storage keys
+    of its boxes, so tasks do not depend on the order of box files.
+    Box states and costs are also written to boxes.csv.
+    """
+    import pandas as pd
+
+    from eveq.equilibration.queue import BoxQueue
+    from eveq.equilibration.scheduling import (
+        BOX_STATES,
+        estimate_hours,
+        pack_boxes,
+        scan_boxes,
+    )
+
+    boxes = scan_boxes(
+        box_directory, working_directory, max_iterations, n_workers
+    )
+    boxes["hours"] = estimate_hours(
+        boxes, max_iterations, default_ns_per_day, preparation_hours
+    )
+
+    counts = boxes["state"].value_counts()
+    for state in BOX_STATES:
+        click.echo(f"{state}: {counts.get(state, 0)}")
+
+    priorities = None
+    if priorities_file is not None:
+        priority_frame = pd.read_csv(priorities_file)
+        priorities = dict(
+            zip(priority_frame["storage_key"], priority_frame["n_properties"])
+        )
+
+    scheduled = boxes[boxes["state"].isin(states)]
+    jobs = pack_boxes(
+        dict(zip(scheduled["box_key"], scheduled["hours"])),
+        wall_time,
+        priorities,
+    )
+    if max_tasks is not None:
+        jobs = jobs[:max_tasks]
+
+    queue = BoxQueue(box_directory, working_directory)
+    task_indices = {}
+    for index, job in enumerate(jobs):
+        for box_key in job:
+            task_indices[box_key] = index
+            if "failed" in states:
+                # let the box be claimed again
+                queue.release(pathlib.Path(box_directory) / f"{box_key}.json")
+    boxes["task"] = boxes["box_key"].map(task_indices).astype("Int64")
+
+    output_directory = pathlib.Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_directory / "manifest.txt"
+    manifest_file.write_text("".join(" ".join(job) + "\n" for job in jobs))
+    boxes.to_csv(output_directory / "boxes.csv", index=False)
+
+    n_boxes = sum(len(job) for job in jobs)
+    click.echo(
+        f"Scheduled {n_boxes} boxes in {len(jobs)} tasks "
+        f"({boxes['hours'][boxes['task'].notna()].sum():.1f} expected hours)"
+    )
+    if jobs:
+        click.echo(
+            f"Submit with: MANIFEST={manifest_file} "
+            f"sbatch --array=0-{len(jobs) - 1} run-equilibrate-single-box.sh"
+        )
@@ -0,0 +1,131 @@
+import json
+
+import click
+
+
+@click.command()
+@click.argument(
+    "box_directory",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.argument(
+    "working_directory",
+    type=click.Path(file_okay=False, writable=True),
+)
+@click.option(
+    "--state",
+    "-s",
+    "states",
+    type=click.Choice(
+        ["pending", "running", "converged", "failed", "exceeded"]
+    ),
+    multiple=True,
+    help=(
+        "Only list boxes in these states. Can be given multiple times. "
+        "By default all boxes are listed."
+    ),
+)
+@click.option(
+    "--max-iterations",
+    "-maxiter",
+    "max_iterations",
+    type=int,
+    default=2000,
+    help="Maximum simulated time for equilibration, in 200 ps iterations.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="Print JSON instead of a table.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to read box states.",
+)
+def status(
+    box_directory: str,
+    working_directory: str,
+    states: tuple[str, ...] = (),
+    max_iterations: int = 2000,
+    as_json: bool = False,
+    n_workers: int | None = None,
+):
+    """
+    Summarize the progress of every box in an equilibration campaign.
+
+    BOX_DIRECTORY holds the box files and WORKING_DIRECTORY is the
+    equilibration working directory. Only the progress file and the
+    end of the statistics file of each box are read.
+
+    Each box is listed with its state, iterations, simulated ns, recent
+    ns/day, estimated uncorrelated samples at the last check against
+    those required, and projected hours to converge, followed by
+    totals over the campaign.
+    """
+    import pandas as pd
+
+    from eveq.equilibration.scheduling import (
+        BOX_STATES,
+        project_hours,
+        scan_boxes,
+    )
+
+    boxes = scan_boxes(
+        box_directory, working_directory, max_iterations, n_workers
+    )
+    boxes["projected_hours"] = project_hours(boxes, max_iterations)
+
+    counts = boxes["state"].value_counts()
+    running = boxes["state"] == "running"
+    summary = {
+        "n_boxes": len(boxes),
+        **{f"n_{state}": int(counts.get(state, 0)) for state in BOX_STATES},
+        "simulated_ns": float(boxes["simulated_ns"].sum()),
+        # the combined speed of boxes that are running now
+        "running_ns_per_day": float(
+            pd.to_numeric(boxes.loc[running, "ns_per_day"]).sum()
+        ),
+        "projected_hours": float(boxes["projected_hours"].sum()),
+        "n_unprojected": int(
+            (
+                boxes["projected_hours"].isna()
+                & ~boxes["state"].isin(["converged", "exceeded"])
+            ).sum()
+        ),
+    }
+
+    if states:
+        boxes = boxes[boxes["state"].isin(states)]
+
+    if as_json:
+        records = json.loads(boxes.to_json(orient="records"))
+        click.echo(json.dumps({"summary": summary, "boxes": records}, indent=2))
+        return
+
+    columns = [
+        "box_key",
+        "state",
+        "n_iterations",
+        "simulated_ns",
+        "ns_per_day",
+        "n_evaluator_samples",
+        "n_required_samples",
+        "projected_hours",
+    ]
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        click.echo(
+            boxes[columns].to_string(
+                index=False, float_format=lambda value: f"{value:.1f}"
+            )
+        )
+    click.echo("")
+    for key, value in summary.items():
+        if isinstance(value, float):
+            value = f"{value:.1f}"
+        click.echo(f"{key}: {value}")
@@ -0,0 +1,128 @@
+import pathlib
+
+import click
+
+
+def _format_bytes(n_bytes: int) -> str:
+    for suffix in ["B", "KB", "MB", "GB"]:
+        if abs(n_bytes) < 1024:
+            return f"{n_bytes:.1f} {suffix}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} TB"
+
+
+@click.group()
+def storage():
+    """Manage a LocalStoredEquilibrationData directory."""
+
+
+@storage.command("deduplicate")
+@click.argument(
+    "root_directory",
+    type=click.Path(exists=True, file_okay=False, writable=True),
+)
+def deduplicate(root_directory: str):
+    """
+    Move the ancillary data of an existing storage into its blob store.
+
+    Every ancillary file is replaced by a link to a single copy of its
+    contents, so identical files are only stored once.
+    """
+    from eveq.storage.storage import LocalStoredEquilibrationData
+    from eveq.utils import get_disk_usage
+
+    n_bytes_before = get_disk_usage(root_directory)
+    storage = LocalStoredEquilibrationData(
+        root_directory,
+        use_index=True,
+        max_cached_objects=1000,
+        deduplicate_ancillary_data=True,
+    )
+    storage.deduplicate_existing_ancillary_data()
+    n_bytes_after = get_disk_usage(root_directory)
+
+    click.echo(
+        f"Disk usage of {root_directory}: {_format_bytes(n_bytes_before)} -> "
+        f"{_format_bytes(n_bytes_after)}"
+    )
+
+
+@storage.command("gc")
+@click.argument(
+    "root_directory",
+    type=click.Path(exists=True, file_okay=False, writable=True),
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Only report the blobs that would be removed.",
+)
+def collect_garbage(root_directory: str, dry_run: bool = False):
+    """Remove ancillary data blobs that no stored object uses any more."""
+    from eveq.storage.blobs import BlobStore
+    from eveq.storage.storage import LocalStoredEquilibrationData
+
+    # the storage does not need to be loaded to find unreferenced blobs
+    blob_directory = (
+        pathlib.Path(root_directory)
+        / LocalStoredEquilibrationData.blob_directory_name
+    )
+    if not blob_directory.is_dir():
+        click.echo(f"No blobs found in {root_directory}")
+        return
+
+    n_blobs, n_bytes = BlobStore(blob_directory).collect_garbage(
+        dry_run=dry_run
+    )
+    action = "Would remove" if dry_run else "Removed"
+    click.echo(f"{action} {n_blobs} blobs ({_format_bytes(n_bytes)})")
+
+
+@storage.command("compress")
+@click.argument(
+    "root_directory",
+    type=click.Path(exists=True, file_okay=False, writable=True),
+)
+@click.option(
+    "--compression",
+    "-c",
+    type=click.Choice(["gzip", "zstd"]),
+    default="gzip",
+    help="The compression to use for coordinate files.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to compress files.",
+)
+def compress(
+    root_directory: str, compression: str = "gzip", n_workers: int | None = None
+):
+    """
+    Compress the coordinate files of an existing storage in place.
+
+    Compressed files are decompressed transparently, outside the storage,
+    when objects are retrieved from a LocalStoredEquilibrationData.
+    """
+    from eveq.storage.storage import LocalStoredEquilibrationData
+    from eveq.utils import get_disk_usage
+
+    n_bytes_before = get_disk_usage(root_directory)
+    storage = LocalStoredEquilibrationData(
+        root_directory,
+        use_index=True,
+        max_cached_objects=1000,
+        compression=compression,
+    )
+    storage.compress_existing_ancillary_data(n_workers=n_workers)
+    n_bytes_after = get_disk_usage(root_directory)
+
+    reduction = 1 - n_bytes_after / n_bytes_before if n_bytes_before else 0
+    click.echo(
+        f"Disk usage of {root_directory}: {_format_bytes(n_bytes_before)} -> "
+        f"{_format_bytes(n_bytes_after)} ({reduction:.1%} smaller)"
+    )
@@ -0,0 +1,108 @@
+import json
+
+import click
+
+
+@click.command()
+@click.argument(
+    "working_directory",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.option(
+    "--box-key",
+    "-k",
+    "box_keys",
+    type=str,
+    multiple=True,
+    help=(
+        "Storage key of a box to summarize. Can be given multiple times. "
+        "By default all boxes are summarized."
+    ),
+)
+@click.option(
+    "--by-box",
+    "by_box",
+    is_flag=True,
+    default=False,
+    help="Summarize the time of each box rather than of each stage.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="Print JSON instead of a table.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to read timings.",
+)
+def timings(
+    working_directory: str,
+    box_keys: tuple[str, ...] = (),
+    by_box: bool = False,
+    as_json: bool = False,
+    n_workers: int | None = None,
+):
+    """
+    Summarize where equilibration time goes, across boxes.
+
+    WORKING_DIRECTORY is the equilibration working directory, with one
+    directory per box. The timings.jsonl of each box is read and the
+    time spent in each stage (packing, parameterizing, minimizing,
+    creating the simulation, MD, writing frames, reading statistics,
+    detection, checkpointing and writing output) is totalled.
+    """
+    import pandas as pd
+
+    from eveq.equilibration.timing import read_box_timings, summarize_timings
+
+    records = read_box_timings(
+        working_directory, list(box_keys) or None, n_workers
+    )
+    if not len(records):
+        click.echo("No timings found")
+        return
+
+    summary = summarize_timings(records, by="box_key" if by_box else "stage")
+
+    # the simulated speed, over MD alone
+    md = records[records["stage"] == "md"]
+    md_ns_per_day = None
+    if len(md) and "n_steps" in md:
+        # 2 fs steps
+        md_ns = md["n_steps"].sum() * 2e-6
+        md_ns_per_day = float(md_ns / (md["seconds"].sum() / 86400))
+
+    totals = {
+        "n_boxes": int(records["box_key"].nunique()),
+        "total_hours": float(records["seconds"].sum() / 3600),
+        "md_fraction": (
+            float(md["seconds"].sum() / records["seconds"].sum())
+            if len(md)
+            else 0.0
+        ),
+        "md_ns_per_day": md_ns_per_day,
+    }
+
+    if as_json:
+        output = {
+            "totals": totals,
+            "summary": json.loads(
+                summary.reset_index().to_json(orient="records")
+            ),
+        }
+        click.echo(json.dumps(output, indent=2))
+        return
+
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        click.echo(summary.to_string(float_format=lambda value: f"{value:.3f}"))
+    click.echo("")
+    for key, value in totals.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        click.echo(f"{key}: {value}")
@@ -0,0 +1,230 @@
+"""
+Selecting properties by the chemical environments of their components.
+"""
+
+import concurrent.futures
+import json
+import logging
+import pathlib
+import typing
+
+import pandas as pd
+
+from openff.evaluator.datasets.curation.components import (
+    CurationComponent,
+    CurationComponentSchema,
+)
+from openff.evaluator.utils.checkmol import (
+    ChemicalEnvironment,
+    analyse_functional_groups,
+)
+
+try:
+    from openff.evaluator._pydantic import Field
+except ImportError:
+    from pydantic import Field
+
+from eveq.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def _get_component_columns(data_frame: pd.DataFrame) -> list[str]:
+    return [
+        column
+        for column in data_frame.columns
+        if column.startswith("Component ")
+    ]
+
+
+def get_unique_smiles(data_frame: pd.DataFrame) -> list[str]:
+    """Return the unique SMILES in all ``Component *`` columns
+    of a data frame.
+    """
+    columns = _get_component_columns(data_frame)
+    if not columns:
+        return []
+    smiles = pd.unique(data_frame[columns].values.ravel())
+    return sorted(str(pattern) for pattern in smiles if not pd.isna(pattern))
+
+
+def _classify(smiles: str) -> list[str]:
+    groups = analyse_functional_groups(smiles)
+    # checkmol could not analyse the molecule
+    if groups is None:
+        return []
+    return sorted(group.value for group in groups)
+
+
+class FunctionalGroupCache:
+    """
+    A cache of the functional groups ``checkmol`` finds in each SMILES.
+
+    Running ``checkmol`` spawns a process per molecule, so each SMILES
+    is only classified once. If a file is given, the cache is loaded
+    from and saved to it, so it persists across runs.
+
+    Parameters
+    ----------
+    cache_file : str or pathlib.Path, optional
+        A JSON file mapping SMILES to the values of their
+        ``ChemicalEnvironment``s. If not given, groups are
+        only cached in memory.
+    """
+
+    def __init__(self, cache_file: str | pathlib.Path | None = None):
+        self.cache_file = (
+            None if cache_file is None else pathlib.Path(cache_file)
+        )
+        self._groups: dict[str, list[str]] = {}
+        if self.cache_file is not None and self.cache_file.exists():
+            self._groups = json.loads(self.cache_file.read_text())
+
+    def __contains__(self, smiles: str) -> bool:
+        return smiles in self._groups
+
+    def get_groups(
+        self,
+        smiles: list[str],
+        n_processes: int = 1,
+    ) -> dict[str, list[str]]:
+        """
+        Return the functional groups of each SMILES, classifying
+        any that are not cached in a process pool.
+
+        Parameters
+        ----------
+        smiles : list[str]
+            The SMILES to classify.
+        n_processes : int, optional
+            The number of processes to classify new SMILES with.
+
+        Returns
+        -------
+        dict[str, list[str]]
+            The values of the ``ChemicalEnvironment``s in each SMILES.
+        """
+        new_smiles = sorted(set(smiles) - set(self._groups))
+        if new_smiles:
+            logger.info(
+                f"Classifying {len(new_smiles)} new SMILES with checkmol"
+            )
+            if n_processes > 1:
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=n_processes
+                ) as executor:
+                    groups = list(
+                        executor.map(
+                            _classify,
+                            new_smiles,
+                            chunksize=max(
+                                1, len(new_smiles) // (4 * n_processes)
+                            ),
+                        )
+                    )
+            else:
+                groups = [_classify(pattern) for pattern in new_smiles]
+            self._groups.update(zip(new_smiles, groups))
+            self.save()
+
+        return {pattern: self._groups[pattern] for pattern in smiles}
+
+    def save(self):
+        """Save the cache to its file, if it has one."""
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(
+            self.cache_file, json.dumps(self._groups, indent=2, sort_keys=True)
+        )
+
+
+def get_environment_mask(
+    data_frame: pd.DataFrame,
+    environments: list[ChemicalEnvironment],
+    functional_group_cache: FunctionalGroupCache | None = None,
+    n_processes: int = 1,
+) -> pd.Series:
+    """
+    Find the rows of a data frame where any component
+    contains any of the given chemical environments.
+
+    Each unique SMILES is only classified once, and rows
+    are then selected with a vectorized mask.
+
+    Parameters
+    ----------
+    data_frame : pandas.DataFrame
+        The properties, as from ``PhysicalPropertyDataSet.to_pandas``.
+    environments : list[ChemicalEnvironment]
+        The environments to look for.
+    functional_group_cache : FunctionalGroupCache, optional
+        The cache of functional groups to use.
+    n_processes : int, optional
+        The number of processes to classify new SMILES with.
+
+    Returns
+    -------
+    pandas.Series
+        A boolean mask of the selected rows.
+    """
+    if functional_group_cache is None:
+        functional_group_cache = FunctionalGroupCache()
+
+    environment_values = {
+        ChemicalEnvironment(environment).value for environment in environments
+    }
+    groups = functional_group_cache.get_groups(
+        get_unique_smiles(data_frame), n_processes
+    )
+    matching_smiles = [
+        smiles
+        for smiles, smiles_groups in groups.items()
+        if environment_values.intersection(smiles_groups)
+    ]
+
+    columns = _get_component_columns(data_frame)
+    if not columns:
+        return pd.Series(False, index=data_frame.index)
+    return data_frame[columns].isin(matching_smiles).any(axis=1)
+
+
+class FilterByAnyEnvironmentSchema(CurationComponentSchema):
+    type: typing.Literal["FilterByAnyEnvironment"] = "FilterByAnyEnvironment"
+
+    environments: list[ChemicalEnvironment] = Field(
+        ...,
+        description="The chemical environments to look for. Properties are "
+        "retained if any of their components contain any of them.",
+    )
+    functional_group_cache_file: str | None = Field(
+        None,
+        description="An optional JSON file to cache the functional groups "
+        "of each SMILES in between runs.",
+    )
+
+
+class FilterByAnyEnvironment(CurationComponent):
+    """
+    A component which retains properties where any component contains any
+    of a set of chemical environments.
+
+    Unlike ``FilterByEnvironments``, which requires every component to match,
+    this retains e.g. all mixtures containing at least one amine. Each unique
+    SMILES in the data set is only analysed once.
+    """
+
+    @classmethod
+    def _apply(
+        cls,
+        data_frame: pd.DataFrame,
+        schema: FilterByAnyEnvironmentSchema,
+        n_processes,
+    ) -> pd.DataFrame:
+        mask = get_environment_mask(
+            data_frame,
+            schema.environments,
+            FunctionalGroupCache(schema.functional_group_cache_file),
+            n_processes,
+        )
+        return data_frame[mask]
@@ -0,0 +1,235 @@
+import collections
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import pathlib
+
+import numpy as np
+
+from openff.interchange import Interchange
+from openff.toolkit import ForceField, Molecule, Topology
+from openff.units import unit
+
+from eveq.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def get_force_field_digest(forcefield: ForceField) -> str:
+    """Return a SHA-256 digest of a force field
+    that is the same in every process.
+    """
+    return hashlib.sha256(forcefield.to_string().encode("utf-8")).hexdigest()
+
+
+class PartialChargeCache:
+    """
+    A cache of the partial charges a force field assigns to each molecule.
+
+    Charges are keyed by a digest of the force field and the canonical
+    SMILES of the molecule, so each unique molecule is only charged
+    (e.g. with AM1-BCC) once per force field. They are stored, and shared
+    between processes, in the same way as the templates of
+    :class:`eveq.box.templates.MoleculeTemplateCache`.
+
+    The most recently parameterized interchanges are also kept in memory,
+    keyed by the force field and the molecules of the topology in order.
+    Boxes with the same composition (e.g. the same substance at other
+    temperatures or pressures) then skip parameter assignment entirely.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path, optional
+        The directory to save charges in. If not given,
+        charges are only cached in memory.
+    max_interchanges : int, optional
+        The maximum number of parameterized interchanges to keep in
+        memory, least recently used first out. By default 4.
+    """
+
+    def __init__(
+        self,
+        directory: str | pathlib.Path | None = None,
+        max_interchanges: int = 4,
+    ):
+        self.directory = None
+        if directory is not None:
+            self.directory = pathlib.Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._molecules: dict[tuple[str, str], Molecule] = {}
+        self.max_interchanges = max_interchanges
+        self._interchanges: collections.OrderedDict[tuple, Interchange] = (
+            collections.OrderedDict()
+        )
+
+    def _get_charge_path(
+        self, forcefield_digest: str, canonical_smiles: str
+    ) -> pathlib.Path:
+        digest = hashlib.sha256(canonical_smiles.encode("utf-8")).hexdigest()
+        return self.directory / forcefield_digest[:16] / f"{digest}.json"
+
+    def _load_charges(
+        self, forcefield_digest: str, canonical_smiles: str
+    ) -> Molecule | None:
+        if self.directory is None:
+            return None
+        charge_path = self._get_charge_path(forcefield_digest, canonical_smiles)
+        if not charge_path.exists():
+            return None
+        try:
+            contents = json.loads(charge_path.read_text())
+            molecule = Molecule.from_mapped_smiles(
+                contents["mapped_smiles"], allow_undefined_stereo=True
+            )
+            charges = np.asarray(contents["partial_charges"], dtype=float)
+        except Exception as error:
+            logger.warning(
+                f"Could not load charges {charge_path}, regenerating: {error}"
+            )
+            return None
+        if (
+            contents.get("canonical_smiles") != canonical_smiles
+            or contents.get("forcefield") != forcefield_digest
+            or len(charges) != molecule.n_atoms
+        ):
+            logger.warning(
+                f"Charges {charge_path} do not match {canonical_smiles}, "
+                "regenerating"
+            )
+            return None
+        molecule.partial_charges = charges * unit.elementary_charge
+        return molecule
+
+    def _save_charges(
+        self,
+        forcefield_digest: str,
+        canonical_smiles: str,
+        molecule: Molecule,
+    ):
+        charge_path = self._get_charge_path(forcefield_digest, canonical_smiles)
+        charge_path.parent.mkdir(parents=True, exist_ok=True)
+        contents = {
+            "forcefield": forcefield_digest,
+            "canonical_smiles": canonical_smiles,
+            "mapped_smiles": molecule.to_smiles(mapped=True),
+            "partial_charges": molecule.partial_charges.m_as(
+                unit.elementary_charge
+            ).tolist(),
+        }
+        atomic_write(charge_path, json.dumps(contents))
+
+    def get_charged_molecule(
+        self,
+        molecule: Molecule,
+        forcefield: ForceField,
+        forcefield_digest: str | None = None,
+    ) -> Molecule:
+        """
+        Return a copy of ``molecule`` with the partial charges
+        assigned by ``forcefield``, computing them if they
+        are not already cached.
+        """
+        if forcefield_digest is None:
+            forcefield_digest = get_force_field_digest(forcefield)
+        canonical_smiles = molecule.to_smiles()
+        key = (forcefield_digest, canonical_smiles)
+
+        charged_molecule = self._molecules.get(key)
+        if charged_molecule is None:
+            charged_molecule = self._load_charges(
+                forcefield_digest, canonical_smiles
+            )
+        if charged_molecule is None:
+            logger.info(f"Assigning partial charges to {canonical_smiles}")
+            charged_molecule = Molecule(molecule)
+            charged_molecule.partial_charges = forcefield.get_partial_charges(
+                charged_molecule
+            )
+            if self.directory is not None:
+                self._save_charges(
+                    forcefield_digest, canonical_smiles, charged_molecule
+                )
+        self._molecules[key] = charged_molecule
+
+        # copy, so that callers can't modify the cached charges
+        return Molecule(charged_molecule)
+
+    @staticmethod
+    def _get_composition(
+        topology: Topology,
+    ) -> tuple[tuple[str, int], ...] | None:
+        """
+        Return the molecules of a topology in order, as runs of the mapped
+        SMILES of each unique molecule and the number of its copies.
+
+        Only the unique molecules are converted to SMILES. Copies are
+        matched to them through ``Topology.identical_molecule_groups``.
+        If any copy has its atoms in another order than its unique
+        molecule, None is returned, as its parameters could not be reused.
+        """
+        labels = [None] * topology.n_molecules
+        for unique_index, group in topology.identical_molecule_groups.items():
+            for molecule_index, atom_map in group:
+                if any(index != mapped for index, mapped in atom_map.items()):
+                    return None
+                labels[molecule_index] = unique_index
+        mapped_smiles = {
+            unique_index: topology.molecule(unique_index).to_smiles(mapped=True)
+            for unique_index in set(labels)
+        }
+        return tuple(
+            (mapped_smiles[unique_index], len(list(run)))
+            for unique_index, run in itertools.groupby(labels)
+        )
+
+    def create_interchange(
+        self, forcefield: ForceField, topology: Topology
+    ) -> Interchange:
+        """
+        Parameterize a topology, reusing cached interchanges
+        and partial charges.
+
+        If a topology with the same molecules in the same order was
+        parameterized with the same force field, a copy of its interchange
+        is returned with the topology, positions and box vectors of
+        ``topology``. Otherwise, charges are assigned to each unique
+        molecule in the topology and passed to
+        ``ForceField.create_interchange`` through ``charge_from_molecules``,
+        which matches them by isomorphism.
+        """
+        forcefield_digest = get_force_field_digest(forcefield)
+        composition = self._get_composition(topology)
+        key = None if composition is None else (forcefield_digest, composition)
+
+        template = None if key is None else self._interchanges.get(key)
+        if template is not None:
+            self._interchanges.move_to_end(key)
+            logger.info("Reusing the parameters of a cached interchange")
+            interchange = copy.deepcopy(template)
+            # the molecules are the same, in the same order,
+            # so the parameters apply to the new topology as they are
+            interchange.topology = topology
+            interchange.positions = topology.get_positions()
+            interchange.box = topology.box_vectors
+            return interchange
+
+        charged_molecules = [
+            self.get_charged_molecule(molecule, forcefield, forcefield_digest)
+            for molecule in topology.unique_molecules
+        ]
+        interchange = forcefield.create_interchange(
+            topology,
+            charge_from_molecules=charged_molecules,
+        )
+        if key is not None and self.max_interchanges > 0:
+            # copy, so that callers can't modify the cached parameters
+            self._interchanges[key] = copy.deepcopy(interchange)
+            while len(self._interchanges) > self.max_interchanges:
+                self._interchanges.popitem(last=False)
+        return interchange
+
+
+# charges and interchanges are always reused within a process
+_DEFAULT_CHARGE_CACHE = PartialChargeCache()
@@ -0,0 +1,548 @@
+"""
+Detecting whether the timeseries of a simulation have equilibrated.
+
+The full detection runs every method in ``red``. Cheap, incremental
+estimates are used to decide when it is worth running.
+"""
+
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+#: The columns of the statistics file written during equilibration.
+STATISTICS_COLUMNS = [
+    "Step",
+    "Potential Energy (kJ/mole)",
+    "Kinetic Energy (kJ/mole)",
+    "Total Energy (kJ/mole)",
+    "Temperature (K)",
+    "Box Volume (nm^3)",
+    "Density (g/mL)",
+    "Speed (ns/day)",
+]
+
+#: The statistics columns used to detect equilibration, by observable name.
+EQUILIBRATION_OBSERVABLES = {
+    "potential_energy": "Potential Energy (kJ/mole)",
+    "density": "Density (g/mL)",
+}
+
+
+def read_statistics(statistics_file: str | pathlib.Path) -> pd.DataFrame:
+    """Read a statistics file written during equilibration."""
+    return pd.read_csv(statistics_file, names=STATISTICS_COLUMNS)
+
+
+def read_last_statistics(
+    statistics_file: str | pathlib.Path,
+    n_bytes: int = 4096,
+) -> dict[str, float] | None:
+    """
+    Read the last complete row of a statistics file, without
+    reading the whole file.
+
+    Parameters
+    ----------
+    statistics_file : str or pathlib.Path
+        The statistics file written during equilibration.
+    n_bytes : int, optional
+        The number of bytes to read from the end of the file.
+        This must be longer than a row.
+
+    Returns
+    -------
+    dict[str, float] or None
+        The last row by column, or None if the file has no complete rows.
+    """
+    try:
+        with open(statistics_file, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(max(0, size - n_bytes))
+            tail = file.read()
+    except FileNotFoundError:
+        return None
+
+    # the last line may be partly written
+    for line in reversed(tail.split(b"\n")[:-1]):
+        values = line.decode("utf-8", errors="replace").split(",")
+        if len(values) != len(STATISTICS_COLUMNS):
+            continue
+        try:
+            return dict(zip(STATISTICS_COLUMNS, map(float, values)))
+        except ValueError:
+            continue
+    return None
+
+
+#: The ``red`` detectors run on each observable, as the function name and its
+#: keyword arguments. Chodera's is likely the most influential as it selects
+#: the latest points, but using all of them is more automated.
+DETECTORS = {
+    "window": ("detect_equilibration_window", {"method": "min_sse"}),
+    "geyer": ("detect_equilibration_init_seq", {"method": "min_sse"}),
+    "chodera": (
+        "detect_equilibration_init_seq",
+        {"method": "max_ess", "sequence_estimator": "positive"},
+    ),
+}
+
+
+def run_detector(
+    detector_name: str, data: np.ndarray
+) -> tuple[int, float, float]:
+    """
+    Run one of the :data:`DETECTORS` on a timeseries, without plotting.
+
+    Returns
+    -------
+    index : int
+        The equilibration index.
+    inefficiency : float
+        The statistical inefficiency after the index.
+    ess : float
+        The effective sample size after the index.
+    """
+    import red
+
+    function_name, kwargs = DETECTORS[detector_name]
+    return getattr(red, function_name)(data, **kwargs)
+
+
+def _combine_results(
+    results: list[tuple[int, float, float]],
+) -> tuple[int, float, float]:
+    indices, inefficiencies, effective_sample_sizes = zip(*results)
+    return max(indices), max(inefficiencies), min(effective_sample_sizes)
+
+
+def _get_plot_name(
+    plot_directory: str | pathlib.Path,
+    detector_name: str,
+    property_name: str,
+) -> pathlib.Path:
+    file_name = f"equilibration_{detector_name}_{property_name}.png"
+    return pathlib.Path(plot_directory) / file_name
+
+
+def plot_detection(
+    data: np.ndarray,
+    result: tuple[int, float, float],
+    plot_name: str | pathlib.Path,
+    title: str = "",
+):
+    """
+    Save a diagnostic plot of a timeseries and the result of a detector,
+    shading the samples discarded before the equilibration index.
+
+    The plot is drawn from a result that has already been computed, so
+    detection is not repeated. The object-oriented matplotlib API is used
+    rather than ``pyplot``, which keeps no global state, but plots should
+    still be rendered from one thread at a time.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    index, inefficiency, ess = result
+    figure = Figure(figsize=(8, 4))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.plot(np.arange(len(data)), data, linewidth=0.5)
+    axes.axvspan(0, index, color="grey", alpha=0.3)
+    axes.axvline(index, color="red", linestyle="--")
+    axes.set_xlabel("Sample")
+    axes.set_title(
+        f"{title}: index {index}, statistical inefficiency "
+        f"{inefficiency:.1f}, ESS {ess:.1f}"
+    )
+    figure.tight_layout()
+    figure.savefig(plot_name, dpi=150)
+
+
+def detect_equilibration(
+    data: np.ndarray,
+    property_name: str,
+    plot_directory: str | pathlib.Path | None = None,
+) -> tuple[int, float, float]:
+    """
+    Detect equilibration of a timeseries with every one of the
+    :data:`DETECTORS`, one after another. See :class:`EquilibrationAnalyzer`
+    to run them concurrently over several timeseries.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The timeseries.
+    property_name : str
+        The name of the observable, used to name plots.
+    plot_directory : str or pathlib.Path, optional
+        If given, a diagnostic plot of each method is saved here.
+        Rendering plots is much slower than the detection itself.
+
+    Returns
+    -------
+    max_index : int
+        The latest equilibration index of any method.
+    max_inefficiency : float
+        The largest statistical inefficiency of any method.
+    min_ess : float
+        The smallest effective sample size of any method.
+    """
+    results = {
+        detector_name: run_detector(detector_name, data)
+        for detector_name in DETECTORS
+    }
+    if plot_directory is not None:
+        for detector_name, result in results.items():
+            plot_detection(
+                data,
+                result,
+                _get_plot_name(plot_directory, detector_name, property_name),
+                f"{detector_name} {property_name}",
+            )
+    return _combine_results(list(results.values()))
+
+
+class EquilibrationAnalyzer:
+    """
+    Detect equilibration of several timeseries at once, running every
+    pair of timeseries and detector concurrently.
+
+    Results are memoized by the name and length of the timeseries and by
+    detector. Timeseries only grow while a simulation runs, so repeating an
+    analysis of the same samples, such as when the final check is repeated
+    to build stored data, costs nothing. Call :meth:`clear` if the samples
+    of a timeseries may change, e.g. after resuming from a checkpoint.
+
+    Parameters
+    ----------
+    detectors : list[str], optional
+        The names of the :data:`DETECTORS` to run. By default, all of them.
+    n_workers : int, optional
+        The number of workers. By default this is chosen
+        by ``concurrent.futures``.
+    use_processes : bool, optional
+        Whether to run detectors in processes rather than threads.
+        Processes are started with "spawn", so they are safe to use
+        from processes with a GPU context.
+    """
+
+    def __init__(
+        self,
+        detectors: list[str] | None = None,
+        n_workers: int | None = None,
+        use_processes: bool = False,
+    ):
+        if detectors is None:
+            detectors = list(DETECTORS)
+        unknown = set(detectors) - set(DETECTORS)
+        if unknown:
+            raise ValueError(
+                f"Unknown detectors {sorted(unknown)}. "
+                f"Available detectors are {sorted(DETECTORS)}."
+            )
+        self.detectors = list(detectors)
+        self.n_workers = n_workers
+        self.use_processes = use_processes
+        self._executor = None
+        self._results: dict[tuple[str, int, str], tuple[int, float, float]] = {}
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.n_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.n_workers
+                )
+        return self._executor
+
+    def analyze(
+        self,
+        observables: dict[str, np.ndarray],
+        plot_directory: str | pathlib.Path | None = None,
+    ) -> dict[str, tuple[int, float, float]]:
+        """
+        Detect equilibration of every timeseries.
+
+        Parameters
+        ----------
+        observables : dict[str, np.ndarray]
+            The timeseries, by name.
+        plot_directory : str or pathlib.Path, optional
+            If given, a diagnostic plot of each timeseries and detector is
+            saved here. Plots are drawn from the (possibly memoized) results
+            after detection, one at a time in the calling thread, so
+            detection is never repeated to plot.
+
+        Returns
+        -------
+        dict[str, tuple[int, float, float]]
+            The latest equilibration index, largest statistical inefficiency
+            and smallest effective sample size of any detector, by name.
+        """
+        futures = {}
+        for property_name, data in observables.items():
+            for detector_name in self.detectors:
+                key = (property_name, len(data), detector_name)
+                if key in self._results:
+                    continue
+                # copy, as the caller's array may be a view that changes
+                futures[key] = self._get_executor().submit(
+                    run_detector, detector_name, np.array(data)
+                )
+
+        for key, future in futures.items():
+            self._results[key] = future.result()
+
+        if plot_directory is not None:
+            for property_name, data in observables.items():
+                for detector_name in self.detectors:
+                    key = (property_name, len(data), detector_name)
+                    plot_detection(
+                        data,
+                        self._results[key],
+                        _get_plot_name(
+                            plot_directory, detector_name, property_name
+                        ),
+                        f"{detector_name} {property_name}",
+                    )
+
+        return {
+            property_name: _combine_results([
+                self._results[(property_name, len(data), detector_name)]
+                for detector_name in self.detectors
+            ])
+            for property_name, data in observables.items()
+        }
+
+    def clear(self):
+        """Forget memoized results."""
+        self._results.clear()
+
+    def shutdown(self):
+        """Shut down the workers. They are restarted if needed again."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def plot_equilibration(
+    statistics_file: str | pathlib.Path,
+    plot_directory: str | pathlib.Path,
+    observables: dict[str, str] | None = None,
+    analyzer: EquilibrationAnalyzer | None = None,
+):
+    """
+    Save the diagnostic plots of every equilibration observable
+    in a statistics file.
+
+    Parameters
+    ----------
+    statistics_file : str or pathlib.Path
+        The statistics file written during equilibration.
+    plot_directory : str or pathlib.Path
+        The directory to save plots in.
+    observables : dict[str, str], optional
+        The statistics columns to plot, by observable name.
+        By default, :data:`EQUILIBRATION_OBSERVABLES`.
+    analyzer : EquilibrationAnalyzer, optional
+        The analyzer to detect equilibration with.
+    """
+    if observables is None:
+        observables = EQUILIBRATION_OBSERVABLES
+    if analyzer is None:
+        analyzer = EquilibrationAnalyzer()
+    statistics = read_statistics(statistics_file)
+    try:
+        analyzer.analyze(
+            {
+                name: statistics[column].values
+                for name, column in observables.items()
+            },
+            plot_directory,
+        )
+    finally:
+        analyzer.shutdown()
+
+
+def get_statistical_inefficiency(data: np.ndarray) -> float:
+    """
+    Estimate the statistical inefficiency of a timeseries.
+
+    The autocorrelation function is computed with an FFT and summed
+    up to its first non-positive value, as in ``pymbar``.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The timeseries.
+
+    Returns
+    -------
+    float
+        The statistical inefficiency, at least 1.
+    """
+    data = np.asarray(data, dtype=float)
+    n_samples = len(data)
+    if n_samples < 3:
+        return 1.0
+
+    fluctuations = data - data.mean()
+    variance = fluctuations.dot(fluctuations) / n_samples
+    if variance == 0:
+        return 1.0
+
+    # zero-pad to avoid circular correlation
+    fft_size = 2 ** math.ceil(math.log2(2 * n_samples))
+    transform = np.fft.rfft(fluctuations, fft_size)
+    autocovariance = np.fft.irfft(
+        transform * np.conj(transform), fft_size
+    )[:n_samples]
+    autocorrelation = autocovariance / np.arange(n_samples, 0, -1) / variance
+
+    lags = np.arange(1, n_samples)
+    correlations = autocorrelation[1:]
+    non_positive = np.flatnonzero(correlations <= 0)
+    cutoff = non_positive[0] if len(non_positive) else len(correlations)
+
+    inefficiency = 1 + 2 * np.sum(
+        (1 - lags[:cutoff] / n_samples) * correlations[:cutoff]
+    )
+    return max(1.0, float(inefficiency))
+
+
+class SampleBuffer:
+    """
+    A growable 2D array of samples, with one column per observable.
+
+    Appending is amortized O(1), as the storage doubles in size when full.
+
+    Parameters
+    ----------
+    n_columns : int
+        The number of observables.
+    capacity : int, optional
+        The initial number of samples to allocate space for.
+    """
+
+    def __init__(self, n_columns: int, capacity: int = 1024):
+        self._data = np.empty((capacity, n_columns), dtype=float)
+        self._n_samples = 0
+
+    def __len__(self) -> int:
+        return self._n_samples
+
+    def extend(self, samples: np.ndarray):
+        """Append samples, given as an array of shape (n_samples, n_columns)."""
+        samples = np.asarray(samples, dtype=float).reshape(
+            -1, self._data.shape[1]
+        )
+        n_total = self._n_samples + len(samples)
+        if n_total > len(self._data):
+            capacity = max(n_total, 2 * len(self._data))
+            data = np.empty((capacity, self._data.shape[1]), dtype=float)
+            data[:self._n_samples] = self._data[:self._n_samples]
+            self._data = data
+        self._data[self._n_samples:n_total] = samples
+        self._n_samples = n_total
+
+    def get_column(self, index: int) -> np.ndarray:
+        """Return a view of one observable."""
+        return self._data[:self._n_samples, index]
+
+
+class EquilibrationGate:
+    """
+    Keep timeseries in memory as samples arrive, and cheaply estimate
+    whether they may have enough uncorrelated samples to be equilibrated.
+
+    Only the samples are kept incrementally, so that the statistics file
+    is never re-read. The estimate is recomputed in full from every sample
+    by :meth:`recompute`, with two FFTs per timeseries, which costs
+    O(n log n) but is far cheaper than the full detection it gates.
+
+    The estimate for each timeseries is the number of samples divided by
+    its statistical inefficiency, taken as the lower of the estimates
+    over the whole series and over its second half, as the start of the
+    series may not be equilibrated. This is compared against a fraction
+    (``gate_fraction``) of the required samples, so that the full
+    detection is only skipped when it is very unlikely to pass.
+
+    Parameters
+    ----------
+    names : list[str]
+        The names of the timeseries.
+    n_required_samples : int
+        The number of uncorrelated samples needed to be equilibrated.
+    gate_fraction : float, optional
+        The fraction of ``n_required_samples`` the cheap estimate must
+        reach before the full detection is worth running.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        n_required_samples: int,
+        gate_fraction: float = 0.5,
+    ):
+        self.names = list(names)
+        self.n_required_samples = n_required_samples
+        self.gate_fraction = gate_fraction
+        self._buffer = SampleBuffer(len(self.names))
+        #: The estimated uncorrelated samples of each timeseries,
+        #: as of the last call to :meth:`recompute`.
+        self.estimates: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def extend(self, samples: np.ndarray):
+        """Append samples, with one column per timeseries
+        in the order of ``names``.
+        """
+        self._buffer.extend(samples)
+
+    def get_series(self, name: str) -> np.ndarray:
+        """Return a timeseries by name."""
+        return self._buffer.get_column(self.names.index(name))
+
+    def estimate_n_uncorrelated_samples(self, name: str) -> float:
+        """Cheaply estimate the number of uncorrelated samples
+        in a timeseries.
+        """
+        data = self.get_series(name)
+        if not len(data):
+            return 0.0
+        inefficiency = min(
+            get_statistical_inefficiency(data),
+            get_statistical_inefficiency(data[len(data) // 2:]),
+        )
+        return len(data) / inefficiency
+
+    def recompute(self) -> bool:
+        """
+        Recompute the estimates of every timeseries from all samples,
+        saving them in :attr:`estimates`.
+
+        Returns
+        -------
+        bool
+            Whether every timeseries may have enough uncorrelated samples.
+        """
+        self.estimates = {
+            name: self.estimate_n_uncorrelated_samples(name)
+            for name in self.names
+        }
+        threshold = self.gate_fraction * self.n_required_samples
+        return all(
+            estimate >= threshold for estimate in self.estimates.values()
+        )
@@ -0,0 +1,121 @@
+"""
+Preparing boxes for equilibration in a process pool.
+"""
+
+import concurrent.futures
+import logging
+import pathlib
+import time
+import traceback
+
+from eveq.box.box import PropertyBox
+from eveq.box.templates import MoleculeTemplateCache
+from eveq.equilibration.charges import PartialChargeCache
+from eveq.equilibration.system import EquilibrationSystem
+
+logger = logging.getLogger(__name__)
+
+
+# set once per worker process by _initialize_worker
+_FORCEFIELD = None
+_TEMPLATE_CACHE = None
+_CHARGE_CACHE = None
+
+
+def _initialize_worker(
+    forcefield: str,
+    template_cache_directory: str | None,
+    charge_cache_directory: str | None,
+):
+    from openff.toolkit import ForceField
+
+    global _FORCEFIELD, _TEMPLATE_CACHE, _CHARGE_CACHE
+    _FORCEFIELD = ForceField(forcefield)
+    _TEMPLATE_CACHE = MoleculeTemplateCache(template_cache_directory)
+    _CHARGE_CACHE = PartialChargeCache(charge_cache_directory)
+
+
+def prepare_box(
+    box_file: str | pathlib.Path, working_directory: str | pathlib.Path
+) -> dict:
+    """
+    Pack, parameterize and minimize a single box.
+
+    Returns
+    -------
+    dict
+        The storage key of the box, the time taken by each stage
+        that was run, in seconds, and the traceback if preparation failed.
+    """
+    box = PropertyBox.from_json(box_file)
+    result = {"box": box._get_storage_key(), "timings": {}, "error": None}
+    start = time.perf_counter()
+    try:
+        system = EquilibrationSystem(
+            box=box,
+            forcefield=_FORCEFIELD,
+            working_directory=working_directory,
+            template_cache=_TEMPLATE_CACHE,
+            charge_cache=_CHARGE_CACHE,
+        )
+        result["timings"] = system.prepare()
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["timings"]["total"] = time.perf_counter() - start
+    return result
+
+
+def prepare_boxes(
+    box_files: list[str | pathlib.Path],
+    working_directory: str | pathlib.Path,
+    forcefield: str = "openff-2.1.0.offxml",
+    template_cache_directory: str | pathlib.Path | None = None,
+    charge_cache_directory: str | pathlib.Path | None = None,
+    n_workers: int | None = None,
+):
+    """
+    Prepare boxes for equilibration in a process pool, yielding
+    the result of each box as it finishes. See :func:`prepare_box`.
+
+    Boxes that have already been prepared are skipped by
+    ``EquilibrationSystem.prepare``, and report no stage timings.
+
+    Parameters
+    ----------
+    box_files : list of str or pathlib.Path
+        The JSON files of the boxes to prepare.
+    working_directory : str or pathlib.Path
+        The working directory for equilibration.
+    forcefield : str, optional
+        The force field to parameterize boxes with.
+    template_cache_directory : str or pathlib.Path, optional
+        The directory of molecule templates shared between boxes.
+    charge_cache_directory : str or pathlib.Path, optional
+        The directory of partial charges shared between boxes.
+    n_workers : int, optional
+        The number of processes. By default this is chosen
+        by ``concurrent.futures``.
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_initialize_worker,
+        initargs=(
+            forcefield,
+            (
+                None
+                if template_cache_directory is None
+                else str(template_cache_directory)
+            ),
+            (
+                None
+                if charge_cache_directory is None
+                else str(charge_cache_directory)
+            ),
+        ),
+    ) as executor:
+        futures = [
+            executor.submit(prepare_box, str(box_file), str(working_directory))
+            for box_file in box_files
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
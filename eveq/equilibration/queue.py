@@ -0,0 +1,305 @@
+"""
+A queue of boxes shared between many equilibration workers.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import pathlib
+import signal
+import socket
+import threading
+import time
+
+from eveq.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class BoxQueue:
+    """
+    A queue of box files that workers claim one at a time.
+
+    A box is claimed by writing a claim file for its storage key,
+    while holding an exclusive lock on the claim directory, so that
+    each box is only equilibrated by one worker at a time. Boxes that
+    already have stored equilibration data are done and never claimed.
+
+    A claim is stale, and the box can be claimed again, once it is older
+    than ``claim_timeout`` or if the process that made it is no longer
+    running on this host. This lets boxes left by killed workers
+    be picked up by later ones.
+
+    Parameters
+    ----------
+    box_directory : str or pathlib.Path
+        The directory of box files, as written by ``set-up-equilibration.py``.
+    working_directory : str or pathlib.Path
+        The working directory for equilibration.
+    claim_timeout : float, optional
+        The number of seconds after which a claim is stale,
+        by default 24 hours. This should be longer than a worker's
+        wall time.
+    """
+
+    def __init__(
+        self,
+        box_directory: str | pathlib.Path,
+        working_directory: str | pathlib.Path,
+        claim_timeout: float = 24 * 60 * 60,
+    ):
+        self.box_directory = pathlib.Path(box_directory)
+        self.working_directory = pathlib.Path(working_directory)
+        self.claim_directory = self.working_directory / "claims"
+        self.claim_directory.mkdir(parents=True, exist_ok=True)
+        self.claim_timeout = claim_timeout
+
+    def _get_claim_path(self, box_file: pathlib.Path) -> pathlib.Path:
+        return self.claim_directory / f"{box_file.stem}.claim"
+
+    def is_done(self, box_file: str | pathlib.Path) -> bool:
+        """Whether a box has finished equilibrating."""
+        box_file = pathlib.Path(box_file)
+        output_file = (
+            self.working_directory
+            / box_file.stem
+            / "stored_equilibration_data.json"
+        )
+        return output_file.exists()
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(self.claim_directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_claim(self, claim_path: pathlib.Path) -> dict | None:
+        try:
+            return json.loads(claim_path.read_text())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # a claim file that can't be read is treated as stale
+            return {}
+
+    def _is_stale(self, claim: dict) -> bool:
+        if claim.get("failed"):
+            return False
+        if time.time() - claim.get("claimed_at", 0) > self.claim_timeout:
+            return True
+        if claim.get("host") == socket.gethostname():
+            try:
+                os.kill(claim["pid"], 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        return False
+
+    def get_claim(self, box_file: str | pathlib.Path) -> dict | None:
+        """Return the claim on a box, or None if it is not claimed."""
+        return self._read_claim(self._get_claim_path(pathlib.Path(box_file)))
+
+    def is_claimed(self, box_file: str | pathlib.Path) -> bool:
+        """Whether a box is claimed by a running worker."""
+        claim = self.get_claim(box_file)
+        return (
+            claim is not None
+            and not claim.get("failed")
+            and not self._is_stale(claim)
+        )
+
+    def is_failed(self, box_file: str | pathlib.Path) -> bool:
+        """Whether a box failed and has not been released since."""
+        claim = self.get_claim(box_file)
+        return claim is not None and bool(claim.get("failed"))
+
+    def _try_claim(self, box_file: pathlib.Path) -> bool:
+        if self.is_done(box_file):
+            return False
+        claim_path = self._get_claim_path(box_file)
+        claim = self._read_claim(claim_path)
+        if claim is not None:
+            if not self._is_stale(claim):
+                return False
+            logger.info(f"Taking over stale claim on {box_file.name}: {claim}")
+        claim = {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "claimed_at": time.time(),
+        }
+        atomic_write(claim_path, json.dumps(claim))
+        return True
+
+    def claim(self) -> pathlib.Path | None:
+        """
+        Claim the next box that is not done or claimed by another worker.
+
+        Returns
+        -------
+        pathlib.Path or None
+            The box file, or None if no boxes are left.
+        """
+        with self._lock():
+            for box_file in sorted(self.box_directory.glob("u*.json")):
+                if self._try_claim(box_file):
+                    return box_file
+        return None
+
+    def claim_box(self, box_key: str) -> pathlib.Path | None:
+        """
+        Claim a particular box, if it is not done or claimed by another worker.
+
+        Parameters
+        ----------
+        box_key : str
+            The storage key of the box.
+
+        Returns
+        -------
+        pathlib.Path or None
+            The box file, or None if the box could not be claimed.
+        """
+        box_file = self.box_directory / f"{box_key}.json"
+        if not box_file.exists():
+            raise FileNotFoundError(f"No box file {box_file}")
+        with self._lock():
+            if self._try_claim(box_file):
+                return box_file
+        return None
+
+    def release(self, box_file: str | pathlib.Path, failed: bool = False):
+        """
+        Release the claim on a box.
+
+        Parameters
+        ----------
+        box_file : str or pathlib.Path
+            The box file.
+        failed : bool, optional
+            If True, the claim is kept and marked as failed, so the box
+            is not claimed again until its claim file is removed.
+        """
+        claim_path = self._get_claim_path(pathlib.Path(box_file))
+        with self._lock():
+            if failed:
+                claim = self._read_claim(claim_path) or {}
+                claim["failed"] = True
+                atomic_write(claim_path, json.dumps(claim))
+            elif claim_path.exists():
+                claim_path.unlink()
+
+
+def _raise_system_exit(signal_number, frame):
+    raise SystemExit(128 + signal_number)
+
+
+@contextlib.contextmanager
+def _exit_on_sigterm():
+    """Turn SIGTERM (e.g. from SLURM at the time limit) into ``SystemExit``,
+    so that the claim on the current box is released on the way out.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous_handler = signal.signal(signal.SIGTERM, _raise_system_exit)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+
+
+def equilibrate_boxes(
+    queue: BoxQueue,
+    box_keys: list[str] | None = None,
+    deadline: float | None = None,
+    **kwargs,
+) -> int:
+    """
+    Claim and equilibrate boxes one after another, in this process.
+
+    Each box is prepared if needed and equilibrated with
+    ``EquilibrationSystem.run_all``. A box that raises an error is
+    marked as failed. If the worker is stopped instead, e.g. by
+    SIGTERM or ``KeyboardInterrupt``, the claim on its box is released
+    so that another worker can pick it up.
+
+    Parameters
+    ----------
+    queue : BoxQueue
+        The queue to claim boxes from.
+    box_keys : list[str], optional
+        The storage keys of the boxes to equilibrate, in order.
+        Boxes that are done or claimed are skipped. By default,
+        boxes are claimed from the queue until none are left.
+    deadline : float, optional
+        A ``time.time()`` after which no more boxes are claimed,
+        also passed to ``EquilibrationSystem.run_all``.
+    **kwargs
+        Passed to ``EquilibrationSystem``, e.g. ``forcefield``.
+
+    Returns
+    -------
+    int
+        The number of boxes that finished equilibrating.
+    """
+    from eveq.box.box import PropertyBox
+    from eveq.equilibration.system import EquilibrationSystem
+
+    remaining_keys = None if box_keys is None else list(box_keys)
+    n_finished = 0
+    with _exit_on_sigterm():
+        while True:
+            if deadline is not None and time.time() >= deadline:
+                logger.info("Out of wall time")
+                break
+
+            if remaining_keys is None:
+                box_file = queue.claim()
+                if box_file is None:
+                    logger.info("No boxes left to equilibrate")
+                    break
+            elif not remaining_keys:
+                break
+            else:
+                box_key = remaining_keys.pop(0)
+                box_file = queue.claim_box(box_key)
+                if box_file is None:
+                    logger.info(
+                        f"Skipping box {box_key}, which is done or claimed"
+                    )
+                    continue
+
+            logger.info(f"Working with box: {box_file.name}")
+            try:
+                box = PropertyBox.from_json(box_file)
+                logger.info(box)
+                system = EquilibrationSystem(
+                    box=box,
+                    working_directory=queue.working_directory,
+                    **kwargs,
+                )
+                finished = system.run_all(deadline=deadline)
+                # the platform is only chosen once per worker
+                kwargs["platform"] = system.platform
+            except Exception:
+                logger.exception(f"Failed to equilibrate {box_file.name}")
+                queue.release(box_file, failed=True)
+                continue
+            except BaseException:
+                logger.info(
+                    f"Stopped while equilibrating {box_file.name}, "
+                    "releasing it"
+                )
+                queue.release(box_file)
+                raise
+
+            queue.release(box_file)
+            if finished:
+                n_finished += 1
+    return n_finished
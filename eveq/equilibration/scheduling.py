@@ -0,0 +1,304 @@
+"""
+Scheduling the boxes that still need equilibrating into batch jobs.
+"""
+
+import concurrent.futures
+import json
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from eveq.equilibration.convergence import read_last_statistics
+from eveq.equilibration.queue import BoxQueue
+
+#: The states a box can be in, as reported by :func:`scan_boxes`.
+BOX_STATES = ("pending", "running", "converged", "failed", "exceeded")
+
+# as in EquilibrationSystem: 100000 steps of 2 fs per 200 ps
+# iteration, with a sample every 1000 steps
+STEPS_PER_ITERATION = 100000
+TIMESTEP_NS = 2e-6
+REPORT_INTERVAL = 1000
+
+#: The columns returned by :func:`scan_boxes`.
+BOX_COLUMNS = [
+    "box_key", "state", "n_molecules", "prepared", "n_iterations", "n_steps",
+    "simulated_ns", "ns_per_day", "n_samples", "n_evaluator_samples",
+    "n_required_samples", "n_remaining_samples", "checkpointed_at",
+]
+
+
+def _read_json(path: pathlib.Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def scan_box(
+    box_file: str | pathlib.Path,
+    working_directory: str | pathlib.Path,
+    queue: BoxQueue,
+    max_iterations: int = 2000,
+) -> dict:
+    """
+    Read the state of one box from its working directory and claim,
+    without loading its simulation.
+
+    A box is "converged" or "exceeded" once it has stored equilibration
+    data, depending on whether it converged before ``max_iterations``.
+    A box that has run out of time but not saved its data is also
+    "exceeded". Otherwise, a box is "failed" if its claim is marked as
+    failed, "running" if it is claimed by a running worker, and
+    "pending" if it still needs to be (re)started.
+
+    Parameters
+    ----------
+    box_file : str or pathlib.Path
+        The box file, named by its storage key.
+    working_directory : str or pathlib.Path
+        The working directory for equilibration.
+    queue : BoxQueue
+        The queue that holds claims on boxes.
+    max_iterations : int, optional
+        The maximum simulated time, in 200 ps iterations.
+
+    Returns
+    -------
+    dict
+        The :data:`BOX_COLUMNS` of the box. The last ``ns_per_day`` is
+        read from the statistics file; sample counts are those of the last
+        convergence check before the last checkpoint, and are missing for
+        boxes run by earlier versions.
+    """
+    box_file = pathlib.Path(box_file)
+    box_working_directory = pathlib.Path(working_directory) / box_file.stem
+
+    # read the raw JSON to avoid building the substance
+    box = _read_json(box_file) or {}
+    progress = (
+        _read_json(box_working_directory / "equilibration_state.json") or {}
+    )
+    statistics = read_last_statistics(
+        box_working_directory / "openmm_statistics.csv"
+    )
+
+    # earlier versions always ran fixed iterations
+    n_steps = progress.get(
+        "n_steps", progress.get("n_iterations", 0) * STEPS_PER_ITERATION
+    )
+    max_steps = max_iterations * STEPS_PER_ITERATION
+    if queue.is_done(box_file):
+        converged = progress.get("converged")
+        # earlier versions did not record convergence
+        if converged is None:
+            converged = n_steps < max_steps
+        state = "converged" if converged else "exceeded"
+    elif queue.is_failed(box_file):
+        state = "failed"
+    elif queue.is_claimed(box_file):
+        state = "running"
+    elif n_steps >= max_steps:
+        state = "exceeded"
+    else:
+        state = "pending"
+
+    return {
+        "box_key": box_file.stem,
+        "state": state,
+        "n_molecules": box.get("n_molecules"),
+        "prepared": (
+            (box_working_directory / "interchange.json").exists()
+            and (box_working_directory / "minimized_box.pdb").exists()
+        ),
+        # simulated time, as segments between checks vary in length
+        "n_iterations": n_steps / STEPS_PER_ITERATION,
+        "n_steps": n_steps,
+        "simulated_ns": n_steps * TIMESTEP_NS,
+        "ns_per_day": (
+            None if statistics is None else statistics["Speed (ns/day)"]
+        ),
+        "n_samples": progress.get("n_samples"),
+        "n_evaluator_samples": progress.get("n_evaluator_samples"),
+        "n_required_samples": progress.get("n_required_samples"),
+        "n_remaining_samples": progress.get("n_remaining_samples"),
+        "checkpointed_at": progress.get("checkpointed_at"),
+    }
+
+
+def scan_boxes(
+    box_directory: str | pathlib.Path,
+    working_directory: str | pathlib.Path,
+    max_iterations: int = 2000,
+    n_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Read the state of every box in a box directory, in a thread pool.
+
+    See :func:`scan_box` for the states and columns.
+    """
+    box_files = sorted(pathlib.Path(box_directory).glob("u*.json"))
+    queue = BoxQueue(box_directory, working_directory)
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=n_workers
+    ) as executor:
+        rows = list(executor.map(
+            lambda box_file: scan_box(
+                box_file, working_directory, queue, max_iterations
+            ),
+            box_files,
+        ))
+    return pd.DataFrame(rows, columns=BOX_COLUMNS)
+
+
+def estimate_hours(
+    boxes: pd.DataFrame,
+    max_iterations: int = 2000,
+    default_ns_per_day: float = 50.0,
+    preparation_hours: float = 0.25,
+) -> pd.Series:
+    """
+    Estimate the wall time in hours each box needs to finish.
+
+    The simulated time a box needs is taken as the median of the boxes
+    that have already converged, or the whole ``max_iterations`` budget if
+    none have. Boxes that have run past this are expected to need one more
+    iteration. The speed of a box is its last ns/day if it has run, or
+    otherwise is scaled from the other boxes by molecule count.
+
+    Parameters
+    ----------
+    boxes : pandas.DataFrame
+        The boxes, as from :func:`scan_boxes`.
+    max_iterations : int, optional
+        The maximum simulated time, in 200 ps iterations.
+    default_ns_per_day : float, optional
+        The speed to assume if no boxes have run yet.
+    preparation_hours : float, optional
+        The time to pack, parameterize and minimize a box
+        that has not yet been prepared.
+
+    Returns
+    -------
+    pandas.Series
+        The estimated hours for each box.
+    """
+    iteration_ns = STEPS_PER_ITERATION * TIMESTEP_NS
+    max_ns = max_iterations * iteration_ns
+
+    converged_ns = boxes.loc[boxes["state"] == "converged", "simulated_ns"]
+    expected_ns = converged_ns.median() if len(converged_ns) else max_ns
+
+    n_molecules = pd.to_numeric(boxes["n_molecules"], errors="coerce")
+    ns_per_day = pd.to_numeric(boxes["ns_per_day"], errors="coerce")
+    # ns/day falls roughly in proportion to the size of the box
+    throughput = (ns_per_day * n_molecules).median()
+    if np.isnan(throughput):
+        estimated_ns_per_day = pd.Series(default_ns_per_day, index=boxes.index)
+    else:
+        estimated_ns_per_day = (throughput / n_molecules).fillna(
+            default_ns_per_day
+        )
+    ns_per_day = ns_per_day.where(ns_per_day > 0, estimated_ns_per_day)
+
+    remaining_ns = (expected_ns - boxes["simulated_ns"]).clip(
+        lower=iteration_ns
+    )
+    remaining_ns = np.minimum(
+        remaining_ns, (max_ns - boxes["simulated_ns"]).clip(lower=0)
+    )
+
+    hours = remaining_ns / ns_per_day * 24
+    return hours + np.where(
+        boxes["prepared"].astype(bool), 0.0, preparation_hours
+    )
+
+
+def project_hours(boxes: pd.DataFrame, max_iterations: int = 2000) -> pd.Series:
+    """
+    Project the wall time in hours each box needs to converge, from the
+    samples it still needed at its last convergence check and its last speed.
+
+    Unlike :func:`estimate_hours`, this only uses the box's own history,
+    so is missing for boxes that have not been checked yet. Boxes that
+    are done need no more time.
+
+    Parameters
+    ----------
+    boxes : pandas.DataFrame
+        The boxes, as from :func:`scan_boxes`.
+    max_iterations : int, optional
+        The maximum simulated time, in 200 ps iterations.
+
+    Returns
+    -------
+    pandas.Series
+        The projected hours for each box.
+    """
+    max_ns = max_iterations * STEPS_PER_ITERATION * TIMESTEP_NS
+    n_remaining_samples = pd.to_numeric(
+        boxes["n_remaining_samples"], errors="coerce"
+    )
+    remaining_ns = (
+        n_remaining_samples.clip(lower=0) * REPORT_INTERVAL * TIMESTEP_NS
+    )
+    remaining_ns = np.minimum(
+        remaining_ns, (max_ns - boxes["simulated_ns"]).clip(lower=0)
+    )
+
+    ns_per_day = pd.to_numeric(boxes["ns_per_day"], errors="coerce")
+    hours = remaining_ns / ns_per_day.where(ns_per_day > 0) * 24
+    return hours.mask(boxes["state"].isin(["converged", "exceeded"]), 0.0)
+
+
+def pack_boxes(
+    hours: dict[str, float],
+    wall_time: float,
+    priorities: dict[str, float] | None = None,
+) -> list[list[str]]:
+    """
+    Pack boxes into jobs that each fit within a wall time, first-fit
+    decreasing. Boxes longer than the wall time get a job to themselves;
+    they are checkpointed and continue in the next submission.
+
+    Parameters
+    ----------
+    hours : dict[str, float]
+        The estimated hours of each box, by storage key.
+    wall_time : float
+        The hours available to each job.
+    priorities : dict[str, float], optional
+        The priority of each box, by storage key, e.g. the number of
+        properties that need it. Jobs are ordered so that those holding
+        the highest priority boxes come first, as do boxes within a job.
+
+    Returns
+    -------
+    list[list[str]]
+        The storage keys of the boxes in each job.
+    """
+    if priorities is None:
+        priorities = {}
+
+    jobs = []
+    remaining = []
+    for box_key in sorted(
+        hours, key=lambda box_key: (-hours[box_key], box_key)
+    ):
+        for index, job in enumerate(jobs):
+            if hours[box_key] <= remaining[index]:
+                job.append(box_key)
+                remaining[index] -= hours[box_key]
+                break
+        else:
+            jobs.append([box_key])
+            remaining.append(wall_time - hours[box_key])
+
+    def get_priority(box_key):
+        return -priorities.get(box_key, 0), box_key
+
+    for job in jobs:
+        job.sort(key=get_priority)
+    jobs.sort(key=lambda job: get_priority(job[0]))
+    return jobs
@@ -0,0 +1,1021 @@
+"""
+Equilibration of a single box, determined using the
+potential energy and density of the simulation.
+"""
+
+import io
+import json
+import logging
+import math
+import os
+import pathlib
+import re
+import shutil
+import struct
+import time
+
+import numpy as np
+import openmm
+import openmm.app
+
+from openmm import unit as openmm_unit
+
+from openff.evaluator.utils.serialization import TypedJSONEncoder
+from openff.evaluator.forcefield.forcefield import SmirnoffForceFieldSource
+from openff.evaluator.storage.data import (
+    StoredEquilibrationData,
+    ForceFieldData,
+)
+from openff.toolkit import ForceField
+from openff.interchange import Interchange
+from openff.units import unit
+
+from eveq.box.box import PropertyBox
+from eveq.box.templates import MoleculeTemplateCache
+from eveq.equilibration.charges import PartialChargeCache, _DEFAULT_CHARGE_CACHE
+from eveq.equilibration.convergence import (
+    EQUILIBRATION_OBSERVABLES,
+    STATISTICS_COLUMNS,
+    EquilibrationAnalyzer,
+    EquilibrationGate,
+    read_statistics,
+)
+from eveq.equilibration.timing import StageTimer, read_timings
+from eveq.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class EquilibrationSystem:
+    """
+    Pack, minimize and equilibrate a single box in its own working directory.
+
+    Every stage saves its output to the working directory,
+    so a box can be prepared and equilibrated in separate processes,
+    and an interrupted equilibration picks up where it stopped.
+    """
+
+    def __init__(
+        self,
+        box: PropertyBox,
+        forcefield: ForceField,
+        working_directory: str,
+        n_required_samples: int = 100,
+        max_iterations: int=2000,
+        template_cache: MoleculeTemplateCache | None = None,
+        charge_cache: PartialChargeCache | None = None,
+        platform: openmm.Platform | None = None,
+        checkpoint_interval: int = 1,
+        plot_policy: str = "final",
+        observables: dict[str, str] | None = None,
+        analyzer: EquilibrationAnalyzer | None = None,
+        min_steps_per_segment: int = 10000,
+        max_steps_per_segment: int = 100000,
+        profile: str | None = None,
+        frame_interval: int | None = None,
+    ):
+        self.box = box
+        self.template_cache = template_cache
+        if charge_cache is None:
+            charge_cache = _DEFAULT_CHARGE_CACHE
+        self.charge_cache = charge_cache
+        self.platform = platform
+        if isinstance(forcefield, str):
+            forcefield = ForceField(forcefield)
+
+        self.forcefield = forcefield
+        # 2000 * 200 ps = 400 ns
+        self.max_iterations = max_iterations
+        # 50 --> 100 ps
+        self.n_required_samples = n_required_samples
+        # 100000 * 2 fs = 200 ps per iteration, sampled every 2 ps.
+        # max_iterations limits the simulated time in these iterations,
+        # but segments between convergence checks are sized adaptively
+        self.steps_per_iteration = 100000
+        self.report_interval = 1000
+        if not 0 < min_steps_per_segment <= max_steps_per_segment:
+            raise ValueError(
+                "min_steps_per_segment must be positive and "
+                "no more than max_steps_per_segment."
+            )
+        self.min_steps_per_segment = min_steps_per_segment
+        self.max_steps_per_segment = max_steps_per_segment
+        # a DCD file has one interval between frames, so frames are written
+        # every frame_interval steps rather than after each segment.
+        # A trajectory that is resumed keeps the interval it was started with
+        if frame_interval is None:
+            frame_interval = self.steps_per_iteration
+        if frame_interval <= 0:
+            raise ValueError("frame_interval must be positive.")
+        self.frame_interval = frame_interval
+        # simulated time between checkpoints, in iterations,
+        # however many segments that takes
+        self.checkpoint_interval = checkpoint_interval
+        # "never", "final", or "every-N" iterations (and the final check)
+        if plot_policy not in ("never", "final") and not re.fullmatch(
+            r"every-[1-9]\d*", plot_policy
+        ):
+            raise ValueError(
+                f"Unknown plot policy {plot_policy}. "
+                "Use 'never', 'final' or 'every-N'."
+            )
+        self.plot_policy = plot_policy
+        # statistics columns that must all equilibrate, by name
+        if observables is None:
+            observables = EQUILIBRATION_OBSERVABLES
+        self.observables = dict(observables)
+        if analyzer is None:
+            analyzer = EquilibrationAnalyzer()
+        self.analyzer = analyzer
+        
+        working_directory = (
+            pathlib.Path(working_directory) / box._get_storage_key()
+        )
+        working_directory.mkdir(parents=True, exist_ok=True)
+        self.working_directory = working_directory
+
+        self.interchange_file = self.working_directory / "interchange.json"
+        self.input_file = self.working_directory / "input_packed_box.pdb"
+        self.minimized_file = self.working_directory / "minimized_box.pdb"
+        self.statistics_file = self.working_directory / "openmm_statistics.csv"
+        self.checkpoint_file = self.working_directory / "checkpoint.npz"
+        # full XML states, checkpointed by earlier versions
+        self.legacy_checkpoint_file = self.working_directory / "checkpoint.xml"
+        self.trajectory_file = self.working_directory / "trajectory.dcd"
+        self.progress_file = self.working_directory / "equilibration_state.json"
+        self.equilibrated_file = (
+            self.working_directory / "output" / "output.pdb"
+        )
+        self.output_file = (
+            self.working_directory / "stored_equilibration_data.json"
+        )
+        # one record per stage, appended as stages finish
+        self.timings_file = self.working_directory / "timings.jsonl"
+        self.timer = StageTimer(
+            self.timings_file,
+            profile=profile,
+            profile_directory=self.working_directory / "profiles",
+        )
+
+        self._load_current_state()
+        self._simulation = None
+        self._statistics_stream = None
+        self._trajectory_stream = None
+        self._trajectory = None
+        self._n_frames = 0
+        # convergence checks, each after a segment of adaptive length
+        self._n_segments = 0
+        self._n_steps = 0
+        self._n_checkpointed_steps = 0
+        self._n_last_segment_steps = 0
+        # samples still needed to equilibrate, estimated at the last check
+        self._n_remaining_samples = None
+        # the fewest uncorrelated samples of any observable at the last check
+        self._n_evaluator_samples = None
+        self._gate = None
+        self._statistics_read_offset = 0
+
+        # easy defaults
+        self.pressure = box.thermodynamic_state.pressure.to_openmm()
+        self.temperature = box.thermodynamic_state.temperature.to_openmm()
+        self.timestep = 2.0 * unit.femtosecond
+        self.csv_columns = list(STATISTICS_COLUMNS)
+
+    def _load_current_state(self):
+        if self.interchange_file.exists():
+            self.interchange = Interchange.parse_file(self.interchange_file)
+        else:
+            self.interchange = None
+
+    def pack_initial_box(self):
+        topology = self.box.to_topology(template_cache=self.template_cache)
+        self.parameterize(topology)
+
+    def parameterize(self, topology):
+        self.interchange = self.charge_cache.create_interchange(
+            self.forcefield, topology
+        )
+        self._write_pdb(self.input_file)
+        self.save_interchange()
+
+    def is_prepared(self) -> bool:
+        """Whether the box has been packed, parameterized and minimized."""
+        return self.interchange is not None and self.minimized_file.exists()
+
+    def prepare(self) -> dict[str, float]:
+        """
+        Pack, parameterize and minimize the box, skipping
+        any stage that has already been done.
+
+        None of these stages need a GPU, so boxes can be
+        prepared ahead of time on CPU nodes.
+
+        Returns
+        -------
+        dict[str, float]
+            The time taken by each stage that was run, in seconds.
+        """
+        records = []
+        if self.interchange is None:
+            with self.timer.time("pack") as record:
+                topology = self.box.to_topology(
+                    template_cache=self.template_cache
+                )
+            records.append(record)
+
+            with self.timer.time("parameterize") as record:
+                self.parameterize(topology)
+            records.append(record)
+            logger.info(f"Packed box saved to: {self.input_file}")
+
+        if not self.minimized_file.exists():
+            with self.timer.time("minimize") as record:
+                self.minimize()
+            records.append(record)
+            logger.info(f"Minimized box saved to: {self.minimized_file}")
+
+        self.timer.save_profiles()
+        return {record["stage"]: record["seconds"] for record in records}
+
+    def run_all(self, deadline: float | None = None) -> bool:
+        """
+        Run the entire equilibration protocol,
+        skipping preparation if it has already been done.
+
+        Parameters
+        ----------
+        deadline : float, optional
+            A ``time.time()`` after which no new equilibration
+            iterations are started. See :meth:`equilibrate`.
+
+        Returns
+        -------
+        bool
+            Whether equilibration finished before the deadline.
+        """
+        self.prepare()
+        finished = self.equilibrate(deadline=deadline)
+        if finished:
+            logger.info(f"Equilibrated box saved to: {self.equilibrated_file}")
+        return finished
+
+
+    def save_interchange(self):
+        if self.interchange is None:
+            raise ValueError(
+                "Interchange not initialized. Call pack_initial_box first."
+            )
+        atomic_write(self.interchange_file, self.interchange.json())
+
+    def _write_pdb(self, path: pathlib.Path):
+        """Write the interchange to a PDB file atomically,
+        as ``atomic_write`` does.
+        """
+        tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+        try:
+            self.interchange.to_pdb(tmp_path)
+            with open(tmp_path, "rb") as file:
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def minimize(self):
+        if self.interchange is None:
+            raise ValueError(
+                "Interchange not initialized. Call pack_initial_box first."
+            )
+
+        # Evaluator defaults
+        self.interchange.minimize(
+            force_tolerance=10 * unit.kilojoules_per_mole / unit.nanometer,
+            max_iterations=0
+        )
+        # the minimized PDB marks the box as prepared, so is written last
+        self.save_interchange()
+        self._write_pdb(self.minimized_file)
+
+
+    def _create_integrator(self):
+        integrator = openmm.LangevinMiddleIntegrator(
+            self.temperature,
+            (1.0 / unit.picoseconds).to_openmm(),
+            self.timestep.to_openmm()
+        )
+        return integrator
+    
+
+    def get_platform(self) -> openmm.Platform:
+        """Return the platform to simulate on,
+        finding the fastest one on first use.
+        """
+        if self.platform is None:
+            from openmmtools.utils import get_fastest_platform
+
+            self.platform = get_fastest_platform()
+            logger.info(f"Using platform: {self.platform.getName()}")
+        return self.platform
+
+    def _create_simulation(self) -> openmm.app.Simulation:
+        """
+        Create the simulation, resuming from the last checkpoint
+        if there is one.
+
+        Statistics are appended to the statistics file, which is first
+        truncated to its length at the last checkpoint, so that samples
+        from iterations after it are discarded when resuming.
+        """
+        barostat = openmm.MonteCarloBarostat(
+            self.pressure,
+            self.temperature,
+            25,
+        )
+
+        simulation = self.interchange.to_openmm_simulation(
+            integrator=self._create_integrator(),
+            platform=self.get_platform(),
+            combine_nonbonded_forces=True,
+            additional_forces=[barostat],
+        )
+
+        # load any existing checkpoint, keeping its velocities
+        progress = self._read_progress()
+        checkpoint = None if progress is None else self._read_checkpoint()
+        if checkpoint is not None:
+            context = simulation.context
+            context.setPeriodicBoxVectors(
+                *[
+                    openmm.Vec3(*vector) * openmm_unit.nanometer
+                    for vector in checkpoint["box_vectors"]
+                ]
+            )
+            context.setPositions(
+                checkpoint["positions"] * openmm_unit.nanometer
+            )
+            context.setVelocities(
+                checkpoint["velocities"]
+                * openmm_unit.nanometer
+                / openmm_unit.picosecond
+            )
+            context.setTime(float(checkpoint["time"]) * openmm_unit.picosecond)
+        else:
+            progress = {
+                "n_steps": self._n_steps,
+                "n_frames": 0,
+                "trajectory_size": 0,
+            }
+            if self.legacy_checkpoint_file.exists():
+                with open(self.legacy_checkpoint_file, "r") as file:
+                    current_state = openmm.XmlSerializer.deserialize(
+                        file.read()
+                    )
+                simulation.context.setState(current_state)
+                progress["statistics_size"] = (
+                    self.statistics_file.stat().st_size
+                    if self.statistics_file.exists()
+                    else 0
+                )
+            else:
+                simulation.context.setVelocitiesToTemperature(self.temperature)
+                progress["statistics_size"] = 0
+
+        if progress["n_frames"]:
+            # earlier versions wrote a frame every iteration
+            frame_interval = progress.get(
+                "frame_interval", self.steps_per_iteration
+            )
+            if frame_interval != self.frame_interval:
+                logger.warning(
+                    f"Keeping the frame interval of {frame_interval} steps "
+                    f"of the existing trajectory, not {self.frame_interval}"
+                )
+                self.frame_interval = frame_interval
+
+        # drop samples and frames from after the checkpoint
+        self._statistics_stream = open(self.statistics_file, "a")
+        self._statistics_stream.truncate(progress["statistics_size"])
+        self._open_trajectory(
+            simulation.topology,
+            progress["n_frames"],
+            progress["trajectory_size"],
+        )
+
+        statistics_reporter = openmm.app.StateDataReporter(
+            self._statistics_stream,
+            self.report_interval,
+            step=True,
+            potentialEnergy=True,
+            kineticEnergy=True,
+            totalEnergy=True,
+            temperature=True,
+            volume=True,
+            density=True,
+            speed=True,
+            append=True,
+        )
+        simulation.reporters.append(statistics_reporter)
+        return simulation
+
+    def _open_trajectory(
+        self,
+        topology: openmm.app.Topology,
+        n_frames: int,
+        trajectory_size: int,
+    ):
+        """Open the trajectory for appending,
+        truncated to ``n_frames`` frames.
+        """
+        self._n_frames = n_frames
+        if not n_frames:
+            self._trajectory_stream = open(self.trajectory_file, "wb")
+            self._trajectory = openmm.app.DCDFile(
+                self._trajectory_stream,
+                topology,
+                self.timestep.to_openmm(),
+                interval=self.frame_interval,
+            )
+            return
+
+        self._trajectory_stream = open(self.trajectory_file, "r+b")
+        self._trajectory_stream.truncate(trajectory_size)
+        # the DCD header holds the number of frames,
+        # which DCDFile reads to append
+        self._trajectory_stream.seek(8)
+        self._trajectory_stream.write(struct.pack("<i", n_frames))
+        self._trajectory = openmm.app.DCDFile(
+            self._trajectory_stream,
+            topology,
+            self.timestep.to_openmm(),
+            interval=self.frame_interval,
+            append=True,
+        )
+
+    def checkpoint(self):
+        """
+        Save the state of the running simulation, and the statistics
+        and trajectory frames reported so far, so that equilibration
+        can resume from here.
+
+        The state is saved to ``checkpoint.npz`` and progress to the small
+        ``equilibration_state.json``, which is written after it; resuming
+        uses the checkpoint only if it has progress to go with it.
+        """
+        if self._simulation is None:
+            return
+        with self.timer.time("checkpoint", segment=self._n_segments):
+            self._write_checkpoint()
+
+    def _write_checkpoint(self):
+        # only what is needed to resume is saved; energies and
+        # forces are recomputed and parameters come from the interchange
+        state = self._simulation.context.getState(
+            getPositions=True,
+            getVelocities=True,
+            enforcePeriodicBox=True,
+        )
+        self._statistics_stream.flush()
+        self._trajectory_stream.flush()
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            positions=state.getPositions(asNumpy=True).value_in_unit(
+                openmm_unit.nanometer
+            ),
+            velocities=state.getVelocities(asNumpy=True).value_in_unit(
+                openmm_unit.nanometer / openmm_unit.picosecond
+            ),
+            box_vectors=state.getPeriodicBoxVectors(
+                asNumpy=True
+            ).value_in_unit(openmm_unit.nanometer),
+            time=state.getTime().value_in_unit(openmm_unit.picosecond),
+        )
+        atomic_write(self.checkpoint_file, buffer.getvalue())
+
+        # statistics and frames after these sizes are discarded when resuming
+        progress = {
+            # simulated time, in iterations
+            "n_iterations": self._n_steps / self.steps_per_iteration,
+            "n_segments": self._n_segments,
+            "n_steps": self._n_steps,
+            "n_frames": self._n_frames,
+            "frame_interval": self.frame_interval,
+            "trajectory_size": os.fstat(
+                self._trajectory_stream.fileno()
+            ).st_size,
+            "statistics_size": self._statistics_stream.tell(),
+            # the last convergence check, for `eveq status`
+            "n_samples": None if self._gate is None else len(self._gate),
+            "n_evaluator_samples": self._n_evaluator_samples,
+            "n_remaining_samples": self._n_remaining_samples,
+            "n_required_samples": self.n_required_samples,
+            "checkpointed_at": time.time(),
+        }
+        atomic_write(self.progress_file, json.dumps(progress, indent=2))
+        self._n_checkpointed_steps = self._n_steps
+
+    def _read_checkpoint(self) -> dict[str, np.ndarray] | None:
+        if not self.checkpoint_file.exists():
+            return None
+        with np.load(self.checkpoint_file) as checkpoint:
+            return {key: checkpoint[key] for key in checkpoint.files}
+
+    def _read_progress(self) -> dict[str, int] | None:
+        if not self.progress_file.exists():
+            return None
+        return json.loads(self.progress_file.read_text())
+
+    def close(self, checkpoint: bool = True):
+        """
+        Release the running simulation.
+
+        Parameters
+        ----------
+        checkpoint : bool, optional
+            Whether to checkpoint steps run since the last checkpoint.
+        """
+        if self._simulation is None:
+            return
+        if checkpoint and self._n_steps > self._n_checkpointed_steps:
+            self.checkpoint()
+        self._statistics_stream.close()
+        self._statistics_stream = None
+        self._trajectory_stream.close()
+        self._trajectory_stream = None
+        self._trajectory = None
+        self._simulation = None
+
+    def get_n_completed_iterations(self) -> float:
+        """The simulated time saved by the last checkpoint, in iterations."""
+        return self.get_n_completed_steps() / self.steps_per_iteration
+
+    def get_n_completed_steps(self) -> int:
+        """The number of steps simulated up to the last checkpoint."""
+        progress = self._read_progress()
+        if progress is not None:
+            # earlier versions always ran fixed iterations
+            return progress.get(
+                "n_steps", progress["n_iterations"] * self.steps_per_iteration
+            )
+        if (
+            not self.legacy_checkpoint_file.exists()
+            or not self.statistics_file.exists()
+        ):
+            return 0
+        with open(self.statistics_file, "r") as file:
+            n_samples = sum(1 for line in file if line.strip())
+        samples_per_iteration = self.steps_per_iteration // self.report_interval
+        n_iterations = n_samples // samples_per_iteration
+        return n_iterations * self.steps_per_iteration
+
+    def get_n_completed_segments(self) -> int:
+        """The number of segments saved by the last checkpoint."""
+        progress = self._read_progress()
+        if progress is None:
+            return self.get_n_completed_steps() // self.steps_per_iteration
+        # earlier versions only counted segments as iterations
+        return progress.get("n_segments", int(progress["n_iterations"]))
+
+    def get_next_segment_steps(self, previous_steps: int = 0) -> int:
+        """
+        Choose the number of steps to simulate before the next
+        convergence check.
+
+        Segments start at ``min_steps_per_segment`` and double in length
+        while the box is far from equilibrated, up to
+        ``max_steps_per_segment``.
+        Once the last check estimates how many more samples are needed,
+        the segment is cut to exactly that many, so that the next check
+        is the first that can plausibly succeed.
+
+        Parameters
+        ----------
+        previous_steps : int, optional
+            The length of the previous segment, if any.
+
+        Returns
+        -------
+        int
+            The number of steps, a multiple of the report interval.
+        """
+        if previous_steps:
+            n_steps = min(2 * previous_steps, self.max_steps_per_segment)
+        else:
+            n_steps = self.min_steps_per_segment
+        if self._n_remaining_samples is not None:
+            n_steps = min(
+                n_steps,
+                math.ceil(self._n_remaining_samples) * self.report_interval,
+            )
+        n_steps = max(n_steps, self.min_steps_per_segment)
+
+        # only whole samples, and not past the maximum simulation time
+        n_steps = (
+            math.ceil(n_steps / self.report_interval) * self.report_interval
+        )
+        max_steps = self.max_iterations * self.steps_per_iteration
+        return min(n_steps, max_steps - self._n_steps)
+
+    def equilibrate_step(self, n_steps: int | None = None):
+        """
+        Simulate one segment, appending a frame to the trajectory
+        at every multiple of ``frame_interval`` steps.
+
+        Parameters
+        ----------
+        n_steps : int, optional
+            The number of steps. By default, one 200 ps iteration.
+        """
+        if n_steps is None:
+            n_steps = self.steps_per_iteration
+
+        # the simulation is kept between iterations, so the context
+        # is only created once per box
+        if self._simulation is None:
+            with self.timer.time("create_simulation"):
+                self._simulation = self._create_simulation()
+
+        # stop at each frame, so that frames are evenly spaced
+        # however long the segments are
+        n_remaining_steps = n_steps
+        while n_remaining_steps:
+            n_chunk_steps = min(
+                n_remaining_steps,
+                self.frame_interval - self._n_steps % self.frame_interval,
+            )
+            with self.timer.time(
+                "md", segment=self._n_segments + 1, n_steps=n_chunk_steps
+            ):
+                self._simulation.step(n_chunk_steps)
+            self._n_steps += n_chunk_steps
+            n_remaining_steps -= n_chunk_steps
+
+            if self._n_steps % self.frame_interval == 0:
+                with self.timer.time(
+                    "write_frame", segment=self._n_segments + 1
+                ):
+                    state = self._simulation.context.getState(
+                        getPositions=True
+                    )
+                    self._trajectory.writeModel(
+                        state.getPositions(asNumpy=True),
+                        periodicBoxVectors=state.getPeriodicBoxVectors(),
+                    )
+                self._n_frames += 1
+
+        self._n_segments += 1
+        self._n_last_segment_steps = n_steps
+        n_unsaved_steps = self._n_steps - self._n_checkpointed_steps
+        checkpoint_steps = self.checkpoint_interval * self.steps_per_iteration
+        if n_unsaved_steps >= checkpoint_steps:
+            self.checkpoint()
+
+    def export_final_frame(self):
+        """Write the last checkpointed frame to ``output/output.pdb``."""
+        self.equilibrated_file.parent.mkdir(parents=True, exist_ok=True)
+
+        checkpoint = None
+        if self._read_progress() is not None:
+            checkpoint = self._read_checkpoint()
+        if checkpoint is not None:
+            self.interchange.positions = (
+                checkpoint["positions"] * unit.nanometer
+            )
+            self.interchange.box = checkpoint["box_vectors"] * unit.nanometer
+            self._write_pdb(self.equilibrated_file)
+            return
+
+        # boxes equilibrated by earlier versions,
+        # which wrote a PDB per iteration
+        n_iterations = self._n_steps // self.steps_per_iteration
+        legacy_file = (
+            self.working_directory / f"equilibrated_box_{n_iterations}.pdb"
+        )
+        if legacy_file.exists():
+            shutil.copy(legacy_file, self.equilibrated_file)
+        else:
+            self._write_pdb(self.equilibrated_file)
+
+
+    def equilibrate(self, deadline: float | None = None) -> bool:
+        """
+        Equilibrate the box until it converges or the simulated time
+        reaches ``max_iterations`` 200 ps iterations.
+
+        Equilibration is checked after each segment, sized by
+        :meth:`get_next_segment_steps`. A frame is appended to
+        ``trajectory.dcd`` every ``frame_interval`` steps, and the
+        final state is written to ``output/output.pdb``.
+
+        Parameters
+        ----------
+        deadline : float, optional
+            A ``time.time()`` after which no new segments are started.
+            A segment is only started if it is expected to finish
+            before the deadline, judging by the speed of the last one,
+            or for the first segment, the last MD in ``timings.jsonl``.
+            Progress is checkpointed before returning, so a later call
+            continues from there.
+
+        Returns
+        -------
+        bool
+            Whether equilibration finished before the deadline.
+        """
+        if self.interchange is None:
+            raise ValueError(
+                "Interchange not initialized. Call pack_initial_box first."
+            )
+
+        self._n_segments = self.get_n_completed_segments()
+        self._n_steps = self.get_n_completed_steps()
+        self._n_checkpointed_steps = self._n_steps
+        self._n_remaining_samples = None
+        self._n_evaluator_samples = None
+        # statistics may be truncated on resuming, so are re-read
+        self._gate = None
+        self.analyzer.clear()
+
+        max_steps = self.max_iterations * self.steps_per_iteration
+        equilibrated = False
+        stopped = False
+        n_steps = 0
+        time_per_step = self._get_last_time_per_step()
+        try:
+            while not equilibrated and self._n_steps < max_steps:
+                n_steps = self.get_next_segment_steps(n_steps)
+                expected_end = time.time() + time_per_step * n_steps
+                if deadline is not None and expected_end > deadline:
+                    logger.info(
+                        "Stopping at "
+                        f"{self._n_steps / self.steps_per_iteration:.2f} "
+                        f"of {self.max_iterations} iterations "
+                        "to meet the deadline"
+                    )
+                    stopped = True
+                    break
+
+                segment_ps = n_steps * self.timestep.m_as(unit.picosecond)
+                logger.info(
+                    f"Starting equilibration segment {self._n_segments + 1} "
+                    f"({segment_ps:.0f} ps) at "
+                    f"{self._n_steps / self.steps_per_iteration:.2f} "
+                    f"of {self.max_iterations} iterations"
+                )
+
+                start = time.time()
+                self.equilibrate_step(n_steps)
+                equilibrated = self.evaluate_equilibration()
+                time_per_step = (time.time() - start) / n_steps
+        except BaseException:
+            # don't checkpoint a simulation that may have blown up
+            self.close(checkpoint=False)
+            raise
+        self.close()
+
+        if stopped:
+            self.timer.save_profiles()
+            return False
+
+        if not equilibrated:
+            logger.warning(
+                "Equilibration did not converge after "
+                f"{self.max_iterations} iterations of simulated time "
+                f"({self._n_segments} segments)."
+            )
+
+        # so that schedulers can tell converged boxes
+        # from those that ran out of time
+        progress = self._read_progress()
+        if progress is not None:
+            progress["converged"] = equilibrated
+            atomic_write(self.progress_file, json.dumps(progress, indent=2))
+
+        with self.timer.time("export_final_frame"):
+            self.export_final_frame()
+
+        with self.timer.time("stored_data", plot=self._should_plot(final=True)):
+            obj = self.to_stored_equilibration_data()
+        # written last and atomically, as its presence marks the box as done
+        with self.timer.time("write_output"):
+            atomic_write(
+                self.output_file, json.dumps(obj, cls=TypedJSONEncoder)
+            )
+        self.analyzer.shutdown()
+        self.timer.save_profiles()
+        return True
+
+        
+
+    def _get_last_time_per_step(self) -> float:
+        """The wall time per step of the last MD timed for this box,
+        e.g. by an earlier job, or 0 if there is none.
+        """
+        if not self.timings_file.exists():
+            return 0.0
+        for record in reversed(read_timings(self.timings_file)):
+            if (
+                record["stage"] == "md"
+                and record.get("n_steps")
+                and record["seconds"]
+            ):
+                return record["seconds"] / record["n_steps"]
+        return 0.0
+
+    def _update_gate(self) -> EquilibrationGate:
+        """Read statistics reported since the last update into the gate."""
+        if self._gate is None:
+            self._gate = EquilibrationGate(
+                list(self.observables),
+                n_required_samples=self.n_required_samples,
+            )
+            self._statistics_read_offset = 0
+
+        if self._statistics_stream is not None:
+            self._statistics_stream.flush()
+        with open(self.statistics_file, "rb") as file:
+            file.seek(self._statistics_read_offset)
+            contents = file.read()
+        # only read whole lines
+        contents = contents[:contents.rfind(b"\n") + 1]
+        self._statistics_read_offset += len(contents)
+
+        columns = [
+            self.csv_columns.index(column)
+            for column in self.observables.values()
+        ]
+        rows = [
+            line.split(b",") for line in contents.splitlines() if line.strip()
+        ]
+        if rows:
+            self._gate.extend(
+                [[float(row[i]) for i in columns] for row in rows]
+            )
+        return self._gate
+
+    def evaluate_equilibration(self) -> bool:
+        with self.timer.time("read_statistics", segment=self._n_segments):
+            gate = self._update_gate()
+
+        # the full detection is expensive, and only worth
+        # running once it could plausibly pass
+        with self.timer.time(
+            "estimate_samples", segment=self._n_segments
+        ) as record:
+            record["passed"] = gate.recompute()
+        if not record["passed"]:
+            estimates = gate.estimates
+            logger.info(
+                "Skipping equilibration detection: "
+                "estimated uncorrelated samples "
+                + ", ".join(
+                    f"{name}={estimate:.1f}"
+                    for name, estimate in estimates.items()
+                )
+                + f"; n_required_samples: {self.n_required_samples}"
+            )
+            self._n_evaluator_samples = min(estimates.values())
+            # each uncorrelated sample takes n / estimate samples
+            self._n_remaining_samples = None
+            if all(estimates.values()):
+                self._n_remaining_samples = max(
+                    (self.n_required_samples - estimate) * len(gate) / estimate
+                    for estimate in estimates.values()
+                )
+            return False
+
+        observables = {
+            name: gate.get_series(name) for name in self.observables
+        }
+        plot_directory = (
+            self.working_directory if self._should_plot() else None
+        )
+        with self.timer.time(
+            "detection",
+            segment=self._n_segments,
+            plot=plot_directory is not None,
+        ):
+            results = self.analyzer.analyze(observables, plot_directory)
+
+        self._n_remaining_samples = 0
+        n_evaluator_samples = []
+        for name, (max_idx, max_inefficiency, _) in results.items():
+            inefficiency = math.ceil(max_inefficiency)
+            n_evaluator_samples.append(
+                (len(observables[name]) - max_idx) / inefficiency
+            )
+            n_remaining = (
+                self.n_required_samples - n_evaluator_samples[-1]
+            ) * inefficiency
+            self._n_remaining_samples = max(
+                self._n_remaining_samples, n_remaining
+            )
+        self._n_evaluator_samples = min(n_evaluator_samples)
+
+        # check every observable, so that all are logged
+        is_equilibrated = [
+            self._has_enough_samples(
+                name, len(observables[name]), *results[name]
+            )
+            for name in self.observables
+        ]
+        return all(is_equilibrated)
+
+    def _should_plot(self, final: bool = False) -> bool:
+        """Whether to save diagnostic plots with this convergence check."""
+        if self.plot_policy == "never":
+            return False
+        if final:
+            return True
+        if self.plot_policy == "final":
+            return False
+        # whether the last segment crossed a multiple of N iterations
+        n_iterations = int(self.plot_policy.removeprefix("every-"))
+        interval = n_iterations * self.steps_per_iteration
+        n_previous_steps = self._n_steps - self._n_last_segment_steps
+        return self._n_steps // interval > n_previous_steps // interval
+
+    def _has_enough_samples(
+        self,
+        property_name: str,
+        n_samples: int,
+        max_idx: int,
+        max_inefficiency: float,
+        min_ess: float,
+    ) -> bool:
+        """
+        Whether a timeseries has enough uncorrelated samples
+        after equilibration to be considered equilibrated.
+
+        Parameters
+        ----------
+        property_name : str
+            The name of the observable.
+        n_samples : int
+            The number of samples in the timeseries.
+        max_idx : int
+            The latest equilibration index of any detector.
+        max_inefficiency : float
+            The largest statistical inefficiency of any detector.
+        min_ess : float
+            The smallest effective sample size of any detector.
+
+        Returns
+        -------
+        bool
+            True if the system is equilibrated, False otherwise.
+        """
+        n_evaluator_samples = (
+            (n_samples - max_idx) / (math.ceil(max_inefficiency))
+        )
+
+        logger.info(
+            f"{property_name} | Minimum ESS: {min_ess}; "
+            f"Maximum Index: {max_idx}; "
+            f"Maximum Statistical Inefficiency: {max_inefficiency}"
+        )
+        logger.info(
+            f"{property_name} n_samples: {n_samples}; "
+            f"n_evaluator_samples: {n_evaluator_samples}; "
+            f"n_required_samples: {self.n_required_samples}"
+        )
+
+        if n_evaluator_samples < self.n_required_samples:
+            return False
+        return True
+    
+    def get_force_field_id(self):
+        source = SmirnoffForceFieldSource.from_object(self.forcefield)
+        data = ForceFieldData(force_field_source=source)
+        return "ff_" + str(hash(data))
+
+
+    def to_stored_equilibration_data(self):
+        df = read_statistics(self.statistics_file)
+        plot_directory = (
+            self.working_directory if self._should_plot(final=True) else None
+        )
+        # memoized, so this reuses the results
+        # of the last check, even when plotting
+        results = self.analyzer.analyze(
+            {
+                name: df[column].values
+                for name, column in self.observables.items()
+            },
+            plot_directory,
+        )
+        statistical_inefficiency = max(result[1] for result in results.values())
+
+        obj = StoredEquilibrationData(
+            substance=self.box.substance,
+            thermodynamic_state=self.box.thermodynamic_state,
+            property_phase=self.box.phase,
+            source_calculation_id="eveq",
+            force_field_id=self.get_force_field_id(),
+            coordinate_file_name="output.pdb",
+            statistical_inefficiency=statistical_inefficiency,
+            number_of_molecules=self.interchange.topology.n_molecules,
+            max_number_of_molecules=self.box.n_molecules,
+            calculation_layer="EquilibrationLayer"
+        )
+        return obj
@@ -0,0 +1,278 @@
+"""
+Timing and profiling the stages of equilibrating a box.
+"""
+
+import concurrent.futures
+import contextlib
+import json
+import logging
+import pathlib
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+#: The profilers :class:`StageTimer` can capture stages with.
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class StageTimer:
+    """
+    Time stages of work, appending a record of each to a JSON lines file.
+
+    Each record has the ``stage`` name, when it ``started_at`` as a
+    ``time.time()``, how many ``seconds`` it took, and any metadata passed
+    to :meth:`time`. Records are written as each stage finishes, so a job
+    that is killed keeps the timings of everything before.
+
+    If a profiler is chosen, each stage is also profiled. Profiles accumulate
+    over every run of a stage and are written by :meth:`save_profiles`, as
+    ``<stage>.prof`` for cProfile (e.g. for ``snakeviz``) or
+    ``<stage>.html`` for pyinstrument. Stages started within another stage
+    are timed but not profiled, as they are already in its profile.
+
+    Parameters
+    ----------
+    timings_file : str or pathlib.Path, optional
+        The JSON lines file to append records to. If not given,
+        records are only kept in memory.
+    profile : str, optional
+        The profiler to use, one of :data:`PROFILERS`.
+        By default, stages are not profiled.
+    profile_directory : str or pathlib.Path, optional
+        The directory to save profiles in. By default,
+        the directory of ``timings_file``.
+    """
+
+    def __init__(
+        self,
+        timings_file: str | pathlib.Path | None = None,
+        profile: str | None = None,
+        profile_directory: str | pathlib.Path | None = None,
+    ):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(
+                f"Unknown profiler {profile}. "
+                f"Available profilers are {list(PROFILERS)}."
+            )
+        self.timings_file = (
+            None if timings_file is None else pathlib.Path(timings_file)
+        )
+        self.profile = profile
+        if profile_directory is None and self.timings_file is not None:
+            profile_directory = self.timings_file.parent
+        self.profile_directory = (
+            None
+            if profile_directory is None
+            else pathlib.Path(profile_directory)
+        )
+        if profile is not None and self.profile_directory is None:
+            raise ValueError(
+                "A profile directory or timings file is needed "
+                "to save profiles."
+            )
+
+        self.records: list[dict] = []
+        self._profilers = {}
+        self._depth = 0
+
+    def _get_profiler(self, stage: str):
+        if stage not in self._profilers:
+            if self.profile == "cprofile":
+                import cProfile
+
+                self._profilers[stage] = cProfile.Profile()
+            else:
+                from pyinstrument import Profiler
+
+                self._profilers[stage] = Profiler()
+        return self._profilers[stage]
+
+    def _start_profiler(self, profiler):
+        if self.profile == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+
+    def _stop_profiler(self, profiler):
+        if self.profile == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+
+    @contextlib.contextmanager
+    def time(self, stage: str, **metadata):
+        """
+        Time a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        **metadata
+            Extra JSON-serializable fields to save with the record.
+            More can be added to the yielded record before the stage ends.
+
+        Yields
+        ------
+        dict
+            The record of the stage. Its ``seconds`` are set
+            when the stage ends.
+        """
+        record = {
+            "stage": stage,
+            "started_at": time.time(),
+            "seconds": None,
+            **metadata,
+        }
+        profiler = None
+        if self.profile is not None and self._depth == 0:
+            profiler = self._get_profiler(stage)
+            self._start_profiler(profiler)
+
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._depth -= 1
+            if profiler is not None:
+                self._stop_profiler(profiler)
+            self.records.append(record)
+            self._write_record(record)
+
+    def _write_record(self, record: dict):
+        if self.timings_file is None:
+            return
+        try:
+            with open(self.timings_file, "a") as file:
+                file.write(json.dumps(record) + "\n")
+        except OSError as error:
+            # timings should never stop a simulation
+            logger.warning(
+                f"Could not write timings to {self.timings_file}: {error}"
+            )
+
+    def get_totals(self) -> dict[str, float]:
+        """Return the total seconds of each stage timed by this timer."""
+        totals = {}
+        for record in self.records:
+            stage = record["stage"]
+            totals[stage] = totals.get(stage, 0.0) + record["seconds"]
+        return totals
+
+    def save_profiles(self):
+        """Save the profile of each stage, if stages are profiled."""
+        if not self._profilers:
+            return
+        self.profile_directory.mkdir(parents=True, exist_ok=True)
+        for stage, profiler in self._profilers.items():
+            if self.profile == "cprofile":
+                profiler.dump_stats(self.profile_directory / f"{stage}.prof")
+            else:
+                (self.profile_directory / f"{stage}.html").write_text(
+                    profiler.output_html()
+                )
+        logger.info(
+            f"Saved profiles of {len(self._profilers)} stages "
+            f"to {self.profile_directory}"
+        )
+
+
+def read_timings(timings_file: str | pathlib.Path) -> list[dict]:
+    """Read the records of a timings file, skipping any partly written lines."""
+    records = []
+    with open(timings_file, "r") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def read_box_timings(
+    working_directory: str | pathlib.Path,
+    box_keys: list[str] | None = None,
+    n_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Read the timings of many boxes, in a thread pool.
+
+    Parameters
+    ----------
+    working_directory : str or pathlib.Path
+        The working directory for equilibration, with one directory per box.
+    box_keys : list[str], optional
+        The storage keys of the boxes to read.
+        By default, all boxes with timings.
+    n_workers : int, optional
+        The number of threads.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per record, with a ``box_key`` column.
+    """
+    working_directory = pathlib.Path(working_directory)
+    if box_keys is None:
+        timings_files = sorted(working_directory.glob("*/timings.jsonl"))
+    else:
+        timings_files = [
+            working_directory / box_key / "timings.jsonl"
+            for box_key in box_keys
+        ]
+    timings_files = [
+        timings_file
+        for timings_file in timings_files
+        if timings_file.exists()
+    ]
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=n_workers
+    ) as executor:
+        records = executor.map(read_timings, timings_files)
+        frames = [
+            pd.DataFrame(box_records).assign(box_key=timings_file.parent.name)
+            for timings_file, box_records in zip(timings_files, records)
+            if box_records
+        ]
+    if not frames:
+        return pd.DataFrame(
+            columns=["box_key", "stage", "started_at", "seconds"]
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_timings(timings: pd.DataFrame, by: str = "stage") -> pd.DataFrame:
+    """
+    Aggregate timings by stage or by box.
+
+    Fractions assume stages do not overlap, as is the case for the
+    stages timed by ``EquilibrationSystem``.
+
+    Parameters
+    ----------
+    timings : pandas.DataFrame
+        The timings, as from :func:`read_box_timings`.
+    by : str, optional
+        The column to group by, "stage" or "box_key".
+
+    Returns
+    -------
+    pandas.DataFrame
+        The number of records, total hours, mean and maximum seconds and
+        fraction of all time of each group, from most to least time.
+    """
+    grouped = timings.groupby(by)["seconds"]
+    summary = pd.DataFrame({
+        "n": grouped.count(),
+        "total_hours": grouped.sum() / 3600,
+        "mean_seconds": grouped.mean(),
+        "max_seconds": grouped.max(),
+    })
+    total = summary["total_hours"].sum()
+    summary["fraction"] = summary["total_hours"] / total if total else 0.0
+    return summary.sort_values("total_hours", ascending=False)
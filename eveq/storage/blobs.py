@@ -0,0 +1,280 @@
+import contextlib
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# from linux/fs.h
+_FICLONE = 0x40049409
+
+# errors from os.link when a filesystem or file cannot take another hardlink
+_HARDLINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP)
+
+
+def _hash_file(file_path: pathlib.Path, chunk_size: int = 2**20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source: pathlib.Path, destination: pathlib.Path):
+    """Make a copy-on-write clone of a file (e.g. on btrfs or XFS)."""
+    with (
+        open(source, "rb") as source_file,
+        open(destination, "wb") as destination_file,
+    ):
+        try:
+            fcntl.ioctl(
+                destination_file.fileno(), _FICLONE, source_file.fileno()
+            )
+        except OSError:
+            destination_file.close()
+            os.remove(destination)
+            raise
+
+
+def link_or_copy(
+    source: str | pathlib.Path,
+    destination: str | pathlib.Path,
+    allow_hardlink: bool = True,
+) -> str:
+    """
+    Place a file at ``destination`` that shares its data with ``source``.
+
+    A hardlink is tried first, then a reflink, then a plain copy.
+
+    Parameters
+    ----------
+    source : str or pathlib.Path
+        The file to link or copy.
+    destination : str or pathlib.Path
+        Where to place the file. Any existing file is replaced.
+    allow_hardlink : bool, optional
+        Whether to try a hardlink. A hardlinked file changes if the
+        source is modified in place, so this should only be allowed
+        for sources that are never modified.
+
+    Returns
+    -------
+    str
+        The method used: "hardlink", "reflink" or "copy".
+    """
+    source = pathlib.Path(source)
+    destination = pathlib.Path(destination)
+
+    # create the file under a temporary name and move it into place,
+    # so that the destination is never missing or incomplete
+    tmp_path = destination.with_name(
+        f".{destination.name}.{uuid.uuid4().hex}.tmp"
+    )
+    try:
+        method = None
+        if allow_hardlink:
+            try:
+                os.link(source, tmp_path)
+                method = "hardlink"
+            except OSError as error:
+                if error.errno not in _HARDLINK_ERRORS:
+                    raise
+        if method is None:
+            try:
+                _reflink(source, tmp_path)
+                method = "reflink"
+            except OSError:
+                shutil.copy2(source, tmp_path)
+                method = "copy"
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return method
+
+
+class BlobStore:
+    """
+    A content-addressed store of files, keyed by their SHA-256 digest.
+
+    Each unique file is kept once, as ``<root>/<digest[:2]>/<digest>``.
+    Files placed in the store with :meth:`link` share their data with
+    the blob through a hardlink, so identical files stored many times
+    only take up space once. Linked files must therefore be replaced,
+    never modified in place. The hardlinks are also how blobs are known
+    to be in use, so on a filesystem without hardlinks nothing is
+    deduplicated and files are reflinked or copied as they are.
+
+    Placing files and collecting garbage take a lock on ``<root>/.lock``,
+    shared by writers and exclusive for :meth:`collect_garbage`, so a blob
+    is never removed between being added and being linked.
+
+    Parameters
+    ----------
+    root_directory : str or pathlib.Path
+        The directory to store blobs in. This is created if it does not exist.
+    """
+
+    def __init__(self, root_directory: str | pathlib.Path):
+        self.root_directory = pathlib.Path(root_directory)
+        self.root_directory.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.root_directory / ".lock"
+        self.supports_hardlinks = self._check_hardlinks()
+        if not self.supports_hardlinks:
+            logger.warning(
+                f"{self.root_directory} does not support hardlinks, "
+                "so files will not be deduplicated"
+            )
+
+    def _check_hardlinks(self) -> bool:
+        probe_path = self.root_directory / f".probe.{uuid.uuid4().hex}"
+        link_path = probe_path.with_name(probe_path.name + ".link")
+        try:
+            probe_path.touch()
+            os.link(probe_path, link_path)
+        except OSError as error:
+            if error.errno not in _HARDLINK_ERRORS:
+                raise
+            return False
+        finally:
+            for path in (probe_path, link_path):
+                if path.exists():
+                    path.unlink()
+        return True
+
+    @contextlib.contextmanager
+    def _lock(self, exclusive: bool = False):
+        """Hold the lock of the store, shared unless ``exclusive``."""
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(
+                lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            )
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_blob_path(self, digest: str) -> pathlib.Path:
+        return self.root_directory / digest[:2] / digest
+
+    def __contains__(self, digest: str) -> bool:
+        return self._get_blob_path(digest).exists()
+
+    def add(self, file_path: str | pathlib.Path) -> str:
+        """Add a file to the store if it is not already present,
+        returning its digest.
+
+        The blob is unreferenced until it is linked, so it may be removed
+        by :meth:`collect_garbage`; use :meth:`link` to do both at once.
+        """
+        file_path = pathlib.Path(file_path)
+        digest = _hash_file(file_path)
+        blob_path = self._get_blob_path(digest)
+        if blob_path.exists():
+            return digest
+
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        # the source is not hardlinked as it may be modified later
+        link_or_copy(file_path, blob_path, allow_hardlink=False)
+        return digest
+
+    def link(
+        self,
+        file_path: str | pathlib.Path,
+        destination: str | pathlib.Path,
+    ) -> str | None:
+        """
+        Add a file to the store and place a hardlink to its blob at
+        ``destination``.
+
+        If the blob cannot be hardlinked, e.g. on a filesystem without
+        hardlinks, the file is reflinked or copied to ``destination``
+        instead.
+
+        Returns
+        -------
+        str or None
+            The digest of the file, or None if it was not deduplicated.
+        """
+        file_path = pathlib.Path(file_path)
+        destination = pathlib.Path(destination)
+        if not self.supports_hardlinks:
+            if file_path != destination:
+                link_or_copy(file_path, destination, allow_hardlink=False)
+            return None
+
+        with self._lock():
+            digest = self.add(file_path)
+            method = link_or_copy(self._get_blob_path(digest), destination)
+        # e.g. the blob has as many links as the filesystem allows
+        return digest if method == "hardlink" else None
+
+    def link_tree(
+        self,
+        source_directory: str | pathlib.Path,
+        destination_directory: str | pathlib.Path,
+    ):
+        """Mirror a directory tree, placing every file through the store."""
+        source_directory = pathlib.Path(source_directory)
+        destination_directory = pathlib.Path(destination_directory)
+        for directory, _, file_names in os.walk(source_directory):
+            relative_directory = pathlib.Path(directory).relative_to(
+                source_directory
+            )
+            (destination_directory / relative_directory).mkdir(
+                parents=True, exist_ok=True
+            )
+            for file_name in file_names:
+                self.link(
+                    pathlib.Path(directory) / file_name,
+                    destination_directory / relative_directory / file_name,
+                )
+
+    def link_tree_in_place(self, directory: str | pathlib.Path):
+        """Replace every file in a directory tree with a link to its blob."""
+        for file_path in sorted(pathlib.Path(directory).rglob("*")):
+            if file_path.is_file():
+                self.link(file_path, file_path)
+
+    def collect_garbage(self, dry_run: bool = False) -> tuple[int, int]:
+        """
+        Remove blobs that are no longer referenced.
+
+        A blob is unreferenced when no other hardlink to it exists.
+        Files are only placed from a blob by hardlinking, so no file
+        refers to an unreferenced blob. The store is locked against
+        writers while blobs are removed.
+
+        Parameters
+        ----------
+        dry_run : bool, optional
+            If True, only report what would be removed.
+
+        Returns
+        -------
+        n_blobs : int
+            The number of blobs removed.
+        n_bytes : int
+            The number of bytes freed.
+        """
+        n_blobs = 0
+        n_bytes = 0
+        with self._lock(exclusive=True):
+            for blob_path in self.root_directory.glob("*/*"):
+                stat = blob_path.stat()
+                if blob_path.name.startswith(".") or stat.st_nlink > 1:
+                    continue
+                n_blobs += 1
+                n_bytes += stat.st_size
+                if not dry_run:
+                    blob_path.unlink()
+        logger.info(
+            f"{'Found' if dry_run else 'Removed'} {n_blobs} unreferenced blobs "
+            f"({n_bytes} bytes) in {self.root_directory}"
+        )
+        return n_blobs, n_bytes
@@ -0,0 +1,144 @@
+import collections
+import threading
+import typing
+
+
+class LRUObjectCache:
+    """
+    A bounded, least-recently-used cache of retrieved storage objects.
+
+    This is a drop-in replacement for the ``_cached_retrieved_objects``
+    dictionary of a ``LocalFileStorage``, mapping a storage key to a
+    ``(stored_object, ancillary_data_path)`` tuple. When either limit is
+    exceeded, the least recently used entries are evicted.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        The maximum number of objects to keep in memory.
+    max_bytes : int, optional
+        The approximate maximum memory to use, in bytes.
+        Each entry is weighed by ``sizeof``.
+    sizeof : callable, optional
+        A function of the storage key that returns the approximate
+        size of the entry in bytes. Required if ``max_bytes`` is set.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        sizeof: typing.Callable[[str], int] | None = None,
+    ):
+        if max_bytes is not None and sizeof is None:
+            raise ValueError(
+                "A `sizeof` function is required to limit memory usage."
+            )
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, storage_key) -> bool:
+        return storage_key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __getitem__(self, storage_key):
+        with self._lock:
+            value = self._entries[storage_key]
+            self._entries.move_to_end(storage_key)
+        return value
+
+    def __setitem__(self, storage_key, value):
+        size = 0 if self._sizeof is None else self._sizeof(storage_key)
+        with self._lock:
+            if storage_key in self._entries:
+                self.n_bytes -= self._sizes[storage_key]
+            self._entries[storage_key] = value
+            self._entries.move_to_end(storage_key)
+            self._sizes[storage_key] = size
+            self.n_bytes += size
+            self._evict()
+
+    def __delitem__(self, storage_key):
+        with self._lock:
+            del self._entries[storage_key]
+            self.n_bytes -= self._sizes.pop(storage_key)
+
+    def get(self, storage_key, default=None):
+        """Return a cached entry, counting the lookup as a hit or a miss."""
+        with self._lock:
+            if storage_key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self[storage_key]
+
+    def pop(self, storage_key, *args):
+        with self._lock:
+            if storage_key not in self._entries:
+                if args:
+                    return args[0]
+                raise KeyError(storage_key)
+            value = self._entries[storage_key]
+            del self[storage_key]
+        return value
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def values(self):
+        return list(self._entries.values())
+
+    def items(self):
+        return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.n_bytes = 0
+
+    def _is_full(self) -> bool:
+        if (
+            self.max_entries is not None
+            and len(self._entries) > self.max_entries
+        ):
+            return True
+        if self.max_bytes is not None and self.n_bytes > self.max_bytes:
+            return True
+        return False
+
+    def _evict(self):
+        # always keep the most recently added entry,
+        # even if it alone exceeds the memory limit
+        while len(self._entries) > 1 and self._is_full():
+            storage_key, _ = self._entries.popitem(last=False)
+            self.n_bytes -= self._sizes.pop(storage_key)
+            self.evictions += 1
+
+    def get_statistics(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters
+        and the current cache size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "n_entries": len(self._entries),
+            "n_bytes": self.n_bytes,
+        }
@@ -0,0 +1,99 @@
+import gzip
+import os
+import pathlib
+import shutil
+import uuid
+
+#: The file extension used for each supported compression.
+COMPRESSION_EXTENSIONS = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def _open(path: str | pathlib.Path, mode: str, compression: str):
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstd compression requires the `zstandard` package. "
+                "Install it or use gzip compression instead."
+            )
+        return zstandard.open(path, mode)
+    raise ValueError(
+        f"Unknown compression {compression}. "
+        f"Supported compressions are {sorted(COMPRESSION_EXTENSIONS)}."
+    )
+
+
+def _stream(source_file, destination: pathlib.Path, open_destination):
+    # write under a temporary name and move into place,
+    # so an interrupted write never leaves a truncated file
+    tmp_path = destination.with_name(
+        f".{destination.name}.{uuid.uuid4().hex}.tmp"
+    )
+    try:
+        with open_destination(tmp_path) as destination_file:
+            shutil.copyfileobj(source_file, destination_file, 2**20)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_compressed_path(
+    path: str | pathlib.Path, compression: str
+) -> pathlib.Path:
+    """Return the path of the compressed version of a file."""
+    path = pathlib.Path(path)
+    return path.with_name(path.name + COMPRESSION_EXTENSIONS[compression])
+
+
+def find_compressed_file(
+    path: str | pathlib.Path,
+) -> tuple[pathlib.Path, str] | tuple[None, None]:
+    """Find a compressed version of a file, in any supported compression.
+
+    Returns
+    -------
+    compressed_path : pathlib.Path or None
+        The path of the compressed file, or None if there is none.
+    compression : str or None
+        The compression of the file.
+    """
+    for compression in COMPRESSION_EXTENSIONS:
+        compressed_path = get_compressed_path(path, compression)
+        if compressed_path.exists():
+            return compressed_path, compression
+    return None, None
+
+
+def compress_file(
+    source: str | pathlib.Path,
+    destination: str | pathlib.Path,
+    compression: str = "gzip",
+):
+    """Compress ``source`` into ``destination``."""
+    with open(source, "rb") as source_file:
+        _stream(
+            source_file,
+            pathlib.Path(destination),
+            lambda path: _open(path, "wb", compression),
+        )
+
+
+def decompress_file(
+    source: str | pathlib.Path,
+    destination: str | pathlib.Path,
+    compression: str = "gzip",
+):
+    """Decompress ``source`` into ``destination``."""
+    with _open(source, "rb", compression) as source_file:
+        _stream(
+            source_file,
+            pathlib.Path(destination),
+            lambda path: open(path, "wb"),
+        )
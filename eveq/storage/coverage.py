@@ -0,0 +1,174 @@
+"""
+Checking which properties of a dataset already have all their boxes stored.
+"""
+
+import collections
+
+import pandas as pd
+
+from openff.evaluator.datasets import PhysicalPropertyDataSet
+
+from eveq.box.box import PropertyBox
+from eveq.box.planning import plan_boxes
+
+
+class DatasetCoverage:
+    """
+    Which properties of a dataset have all their boxes in storage,
+    and which missing boxes are needed by the others.
+
+    Use :func:`get_dataset_coverage` to create one.
+
+    Parameters
+    ----------
+    boxes : dict[str, PropertyBox]
+        The unique boxes needed by the dataset, by storage key.
+    property_box_keys : dict[str, list[str]]
+        The storage keys of the boxes needed by each property, by property id.
+    stored_box_keys : set[str]
+        The storage keys of the boxes that are already stored.
+
+    Attributes
+    ----------
+    covered_property_ids : list[str]
+        The properties with every box stored.
+    uncovered_property_ids : list[str]
+        The properties with at least one box missing.
+    missing_box_keys : list[str]
+        The storage keys of missing boxes, ranked so that the boxes
+        needed by the most properties come first. Ties are broken by the
+        number of properties each box would unlock on its own, i.e.
+        that only need that box, and then by key.
+    missing_box_properties : dict[str, list[str]]
+        The ids of the properties that need each missing box.
+    unlocked_property_ids : dict[str, list[str]]
+        The ids of the properties for which each missing box is
+        the only missing box.
+    """
+
+    def __init__(
+        self,
+        boxes: dict[str, PropertyBox],
+        property_box_keys: dict[str, list[str]],
+        stored_box_keys: set[str],
+    ):
+        self.boxes = boxes
+        self.property_box_keys = property_box_keys
+        self.stored_box_keys = set(stored_box_keys)
+
+        self.covered_property_ids = []
+        self.uncovered_property_ids = []
+        self.missing_box_properties = collections.defaultdict(list)
+        self.unlocked_property_ids = collections.defaultdict(list)
+        for property_id, box_keys in property_box_keys.items():
+            # a property may need the same box twice,
+            # e.g. a pure excess property
+            missing = sorted(set(box_keys) - self.stored_box_keys)
+            if not missing:
+                self.covered_property_ids.append(property_id)
+                continue
+            self.uncovered_property_ids.append(property_id)
+            for box_key in missing:
+                self.missing_box_properties[box_key].append(property_id)
+            if len(missing) == 1:
+                self.unlocked_property_ids[missing[0]].append(property_id)
+
+        self.missing_box_properties = dict(self.missing_box_properties)
+        self.unlocked_property_ids = dict(self.unlocked_property_ids)
+        self.missing_box_keys = sorted(
+            self.missing_box_properties,
+            key=lambda box_key: (
+                -len(self.missing_box_properties[box_key]),
+                -len(self.unlocked_property_ids.get(box_key, [])),
+                box_key,
+            ),
+        )
+
+    @property
+    def missing_boxes(self) -> dict[str, PropertyBox]:
+        """The missing boxes by storage key, in ranked order."""
+        return {
+            box_key: self.boxes[box_key] for box_key in self.missing_box_keys
+        }
+
+    def get_unlocked_property_ids(self, box_keys) -> list[str]:
+        """
+        Return the ids of the uncovered properties that would
+        have every box stored once the given boxes are stored.
+        """
+        available = self.stored_box_keys | set(box_keys)
+        return [
+            property_id
+            for property_id in self.uncovered_property_ids
+            if available.issuperset(self.property_box_keys[property_id])
+        ]
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Summarize the missing boxes, in ranked order.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The storage key of each missing box, with the number of
+            properties that need it (``n_properties``) and that it
+            would unlock on its own (``n_unlocked``).
+        """
+        return pd.DataFrame(
+            {
+                "storage_key": self.missing_box_keys,
+                "n_properties": [
+                    len(self.missing_box_properties[box_key])
+                    for box_key in self.missing_box_keys
+                ],
+                "n_unlocked": [
+                    len(self.unlocked_property_ids.get(box_key, []))
+                    for box_key in self.missing_box_keys
+                ],
+            },
+            columns=["storage_key", "n_properties", "n_unlocked"],
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"<DatasetCoverage {len(self.covered_property_ids)} "
+            "covered properties, "
+            f"{len(self.uncovered_property_ids)} uncovered properties, "
+            f"{len(self.missing_box_keys)} missing boxes>"
+        )
+
+
+def get_dataset_coverage(
+    storage,
+    dataset: PhysicalPropertyDataSet | pd.DataFrame,
+    n_molecules: int = 1000,
+) -> DatasetCoverage:
+    """
+    Check which properties of a dataset have all their boxes stored.
+
+    The boxes are planned in bulk with :func:`eveq.box.planning.plan_boxes`,
+    so each unique box is only built and hashed once, and each unique
+    storage key is only looked up in storage once. This is much faster
+    than calling ``contains_all_property_boxes`` on every property.
+
+    Parameters
+    ----------
+    storage : LocalStoredEquilibrationData
+        The storage to check.
+    dataset : PhysicalPropertyDataSet or pandas.DataFrame
+        The dataset, or its ``to_pandas()`` representation.
+    n_molecules : int, optional
+        The number of molecules in each box, by default 1000.
+
+    Returns
+    -------
+    DatasetCoverage
+        The coverage of the dataset.
+    """
+    boxes, property_box_keys = plan_boxes(dataset, n_molecules=n_molecules)
+    stored_box_keys = {
+        storage_key
+        for storage_key in boxes
+        if storage.contains_storage_key(storage_key)
+    }
+    return DatasetCoverage(boxes, property_box_keys, stored_box_keys)
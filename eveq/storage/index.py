@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+
+from openff.evaluator.utils.serialization import TypedJSONDecoder
+from openff.units import unit
+
+logger = logging.getLogger(__name__)
+
+
+_COLUMNS = (
+    "storage_key",
+    "class_name",
+    "substance",
+    "phase",
+    "temperature",
+    "pressure",
+    "number_of_molecules",
+    "max_number_of_molecules",
+    "statistical_inefficiency",
+    "mtime_ns",
+)
+
+
+def _get_index_row(storage_key: str, stored_object, mtime_ns: int) -> tuple:
+    """Flatten a stored object into a row of the index table.
+
+    Attributes that are not defined on the object (e.g. the
+    thermodynamic state of a ``ForceFieldData``) are stored as NULL.
+    """
+    substance = getattr(stored_object, "substance", None)
+    phase = getattr(stored_object, "property_phase", None)
+    state = getattr(stored_object, "thermodynamic_state", None)
+
+    temperature = pressure = None
+    if state is not None:
+        if state.temperature is not None:
+            temperature = state.temperature.m_as(unit.kelvin)
+        if state.pressure is not None:
+            pressure = state.pressure.m_as(unit.kilopascal)
+
+    return (
+        storage_key,
+        stored_object.__class__.__name__,
+        None if substance is None else substance.identifier,
+        None if phase is None else int(phase),
+        temperature,
+        pressure,
+        getattr(stored_object, "number_of_molecules", None),
+        getattr(stored_object, "max_number_of_molecules", None),
+        getattr(stored_object, "statistical_inefficiency", None),
+        mtime_ns,
+    )
+
+
+class StorageIndex:
+    """
+    An on-disk SQLite index of the objects held in a local storage directory.
+
+    The index maps each storage key to the class of the stored object
+    and the attributes needed to answer the common queries
+    (substance, phase, state, molecule counts and statistical inefficiency)
+    without deserializing the object itself.
+
+    Parameters
+    ----------
+    index_path : str or pathlib.Path
+        The path to the SQLite database. This is created if it does not exist.
+    """
+
+    def __init__(self, index_path: str | pathlib.Path):
+        self.index_path = pathlib.Path(index_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(self.index_path),
+            check_same_thread=False,
+        )
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                storage_key TEXT PRIMARY KEY,
+                class_name TEXT NOT NULL,
+                substance TEXT,
+                phase INTEGER,
+                temperature REAL,
+                pressure REAL,
+                number_of_molecules INTEGER,
+                max_number_of_molecules INTEGER,
+                statistical_inefficiency REAL,
+                mtime_ns INTEGER NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS objects_by_substance "
+            "ON objects (substance, phase, temperature, pressure)"
+        )
+        self._connection.commit()
+
+    def __contains__(self, storage_key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM objects WHERE storage_key = ?", (storage_key,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n_rows,) = self._connection.execute(
+                "SELECT COUNT(*) FROM objects"
+            ).fetchone()
+        return n_rows
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def keys(self, class_name: str | None = None) -> set[str]:
+        """Return the storage keys in the index,
+        optionally of a single class.
+        """
+        query = "SELECT storage_key FROM objects"
+        parameters = ()
+        if class_name is not None:
+            query += " WHERE class_name = ?"
+            parameters = (class_name,)
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        return {row[0] for row in rows}
+
+    def get(self, storage_key: str) -> dict | None:
+        """Return the indexed attributes of an object,
+        or None if not indexed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM objects "
+                "WHERE storage_key = ?",
+                (storage_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(_COLUMNS, row))
+
+    def add(self, storage_key: str, stored_object, mtime_ns: int):
+        """Add or replace the entry for a single object."""
+        self.add_many([(storage_key, stored_object, mtime_ns)])
+
+    def add_many(self, entries):
+        """Add or replace the entries for an iterable of
+        ``(storage_key, stored_object, mtime_ns)`` tuples in one transaction.
+        """
+        rows = [_get_index_row(*entry) for entry in entries]
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO objects ({', '.join(_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def remove_many(self, storage_keys):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM objects WHERE storage_key = ?",
+                [(key,) for key in storage_keys],
+            )
+
+    def synchronize(
+        self,
+        root_directory: str | pathlib.Path,
+        stored_object_keys: dict[str, list[str]],
+    ) -> dict[str, list[str]]:
+        """
+        Bring the index up to date with the objects on disk.
+
+        Only objects whose JSON file is missing from the index, or has been
+        modified since it was indexed, are deserialized. Entries for objects
+        that no longer exist are removed.
+
+        Parameters
+        ----------
+        root_directory : str or pathlib.Path
+            The root directory of the storage.
+        stored_object_keys : dict[str, list[str]]
+            The map of class name to storage keys, as saved in
+            ``object_keys.json``.
+
+        Returns
+        -------
+        dict[str, list[str]]
+            The subset of ``stored_object_keys`` whose files exist on disk.
+        """
+        root_directory = pathlib.Path(root_directory)
+
+        with self._lock:
+            indexed = dict(
+                self._connection.execute(
+                    "SELECT storage_key, mtime_ns FROM objects"
+                ).fetchall()
+            )
+
+        existing_keys = {}
+        to_index = []
+        seen = set()
+        for class_name, storage_keys in stored_object_keys.items():
+            existing_keys[class_name] = []
+            for storage_key in storage_keys:
+                if storage_key in seen:
+                    raise KeyError(
+                        "Two objects with the same unique key have been found."
+                    )
+                try:
+                    mtime_ns = os.stat(
+                        root_directory / f"{storage_key}.json"
+                    ).st_mtime_ns
+                except FileNotFoundError:
+                    # mirror LocalFileStorage, which skips deleted objects
+                    continue
+                seen.add(storage_key)
+                existing_keys[class_name].append(storage_key)
+                if indexed.get(storage_key) != mtime_ns:
+                    to_index.append((storage_key, class_name, mtime_ns))
+
+        stale_keys = set(indexed) - seen
+        if stale_keys:
+            self.remove_many(stale_keys)
+
+        if to_index:
+            logger.info(f"Indexing {len(to_index)} objects in {root_directory}")
+
+        entries = []
+        for storage_key, class_name, mtime_ns in to_index:
+            with open(root_directory / f"{storage_key}.json", "r") as file:
+                stored_object = json.load(file, cls=TypedJSONDecoder)
+            assert stored_object.__class__.__name__ == class_name
+            entries.append((storage_key, stored_object, mtime_ns))
+            if len(entries) >= 1000:
+                self.add_many(entries)
+                entries = []
+        self.add_many(entries)
+
+        return existing_keys
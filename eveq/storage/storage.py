@@ -1,7 +1,13 @@
+import concurrent.futures
+import contextlib
 import pathlib
 import json
 import logging
+import os
 import shutil
+import tempfile
+import uuid
+import weakref
 
 from openff.evaluator.storage.storage import StorageBackend
 from openff.evaluator.storage import LocalFileStorage
@@ -15,141 +21,1004 @@ from openff.evaluator.storage.data import (
 )
 
 
-from openff.evaluator.utils.serialization import TypedJSONEncoder
+from openff.evaluator.utils.serialization import (
+    TypedJSONDecoder,
+    TypedJSONEncoder,
+)
 from eveq.box.box import ConsistentHashableData, PropertyBox
+from eveq.storage.blobs import BlobStore, link_or_copy
+from eveq.storage.cache import LRUObjectCache
+from eveq.storage.compression import (
+    COMPRESSION_EXTENSIONS,
+    compress_file,
+    decompress_file,
+    find_compressed_file,
+    get_compressed_path,
+)
+from eveq.storage.coverage import DatasetCoverage, get_dataset_coverage
+from eveq.storage.index import StorageIndex
+from eveq.utils import atomic_write
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _hash_equilibration_data(
+    equilibration_data: StoredEquilibrationData,
+) -> int:
+    """Hash the equilibration data to create a unique key."""
+    assert isinstance(equilibration_data, StoredEquilibrationData), (
+        "The provided equilibration data must be an instance "
+        "of StoredEquilibrationData."
+    )
+    return hash(
+        ConsistentHashableData(
+            equilibration_data.substance,
+            equilibration_data.number_of_molecules,
+            equilibration_data.max_number_of_molecules,
+            equilibration_data.thermodynamic_state,
+            equilibration_data.property_phase,
+        )
+    )
+
+
+def _read_stored_object(file_path: str | pathlib.Path) -> BaseStoredData:
+    with open(file_path, "r") as file:
+        return json.load(file, cls=TypedJSONDecoder)
+
+
+def _copy_if_changed(source: pathlib.Path, destination: pathlib.Path):
+    """Copy a file unless ``destination`` is already a copy of it,
+    judged by its size and modification time.
+    """
+    source_stat = source.stat()
+    try:
+        destination_stat = destination.stat()
+    except FileNotFoundError:
+        destination_stat = None
+    if (
+        destination_stat is not None
+        and destination_stat.st_size == source_stat.st_size
+        and destination_stat.st_mtime_ns == source_stat.st_mtime_ns
+    ):
+        return
+    link_or_copy(source, destination, allow_hardlink=False)
+    # a reflink does not keep the modification time
+    os.utime(destination, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+
+def _scan_stored_object(file_path: str) -> tuple[str, str | None, float | None]:
+    """Read a stored object, returning its class name and, if it is
+    equilibration data, its new storage key and statistical inefficiency.
+
+    This is a module-level function so it can be run in a process pool.
+    """
+    stored_object = _read_stored_object(file_path)
+    if not isinstance(stored_object, StoredEquilibrationData):
+        return stored_object.__class__.__name__, None, None
+    return (
+        stored_object.__class__.__name__,
+        "u_" + str(_hash_equilibration_data(stored_object)),
+        stored_object.statistical_inefficiency,
+    )
 
 
 class LocalStoredEquilibrationData(LocalFileStorage):
     """
     A local storage backend for storing equilibration data.
+
+    Parameters
+    ----------
+    root_directory : str or pathlib.Path
+        The root directory of the storage.
+    use_index : bool, optional
+        Whether to keep an SQLite index of the stored objects
+        (``object_index.sqlite``, next to ``object_keys.json``).
+        If True, opening the storage only reads the index rather than
+        every stored object, and objects are deserialized lazily when
+        they are retrieved. By default False, which loads every object
+        into memory when the storage is opened.
+    max_cached_objects : int, optional
+        The maximum number of retrieved objects to keep in memory.
+        Least recently used objects are evicted first. Requires ``use_index``.
+    max_cache_bytes : int, optional
+        The approximate maximum memory to spend on retrieved objects,
+        in bytes. The size of each object is approximated by the size
+        of its JSON file. Requires ``use_index``.
+    deduplicate_ancillary_data : bool, optional
+        Whether to keep ancillary files in a content-addressed ``blobs``
+        directory, keyed by file digest. Object directories then hardlink
+        (or reflink, or copy) their files from the blobs, so identical
+        files are only stored once. By default False.
+    compression : str, optional
+        If given, the coordinate file of each stored object is compressed
+        with this method, either "gzip" or "zstd" (which requires the
+        ``zstandard`` package). By default coordinate files are stored as is.
+    decompression_directory : str or pathlib.Path, optional
+        Where to decompress the ancillary data of compressed objects when
+        they are retrieved, in a subdirectory per object. By default a
+        temporary directory, removed with the storage. Compressed data is
+        only decompressed by ``retrieve_object``, never into the storage.
     """
 
+    index_file_name = "object_index.sqlite"
+    blob_directory_name = "blobs"
+
     def _hash_equilibration_data(self, equilibration_data: StoredEquilibrationData) -> int:
         """Hash the equilibration data to create a unique key."""
-        assert isinstance(equilibration_data, StoredEquilibrationData), (
-            "The provided equilibration data must be an instance of StoredEquilibrationData."
-        )
-        return hash(
-            ConsistentHashableData(
-                equilibration_data.substance,
-                equilibration_data.number_of_molecules,
-                equilibration_data.max_number_of_molecules,
-                equilibration_data.thermodynamic_state,
-                equilibration_data.property_phase,
-            )
-        )
+        return _hash_equilibration_data(equilibration_data)
 
     def _get_storage_key(self, equilibration_data: StoredEquilibrationData) -> str:
         """Generate a storage key for the equilibration data."""
         return "u_" + str(self._hash_equilibration_data(equilibration_data))
 
+    migration_progress_file_name = ".migration_progress.json"
+
     @classmethod
     def from_localfilestorage(
         cls,
         lfs_root_directory: str | pathlib.Path = "old_stored_data",
         new_root_directory: str | pathlib.Path = "stored_data",
+        n_workers: int | None = None,
+        checkpoint_interval: int = 100,
+        **kwargs,
     ):
-        lfs = LocalFileStorage(lfs_root_directory, cache_objects_in_memory=True)
+        """Convert a ``LocalFileStorage`` into a
+        ``LocalStoredEquilibrationData``.
 
-        lsed = cls(new_root_directory)
-        storage_objects: dict[str, tuple[StoredEquilibrationData, str]] = {}
+        The original storage is streamed from disk rather than loaded.
+        Every object is first read in a process pool to compute its new
+        storage key, and equilibration data describing the same box is
+        deduplicated by keeping the object with the lowest statistical
+        inefficiency. The winning objects are then copied with a thread pool.
 
-        for old_storage_key, (stored_object, data_path) in lfs._cached_retrieved_objects.items():
-            if isinstance(stored_object, StorageBackend._ObjectKeyData):
-                # Skip object key data, as it is not relevant for equilibration data.
-                continue
-            if not isinstance(stored_object, StoredEquilibrationData):
-                lsed.store_object(
-                    stored_object,
-                    ancillary_data_path=data_path,
+        The conversion can be resumed if interrupted. The results of the
+        first pass are saved in the new storage directory as they arrive,
+        and the key index of the new storage is saved every
+        ``checkpoint_interval`` copied objects. Boxes already present in
+        the new storage with a lower or equal statistical inefficiency
+        are not copied again.
+
+        Parameters
+        ----------
+        lfs_root_directory : str or pathlib.Path
+            The root directory of the existing ``LocalFileStorage``.
+        new_root_directory : str or pathlib.Path
+            The root directory of the new storage.
+        n_workers : int, optional
+            The number of workers used to read and copy objects.
+            By default this is chosen by ``concurrent.futures``.
+        checkpoint_interval : int, optional
+            How many copied objects to save progress after. Progress of
+            the first pass is saved after 64 times as many read objects.
+        **kwargs
+            Passed to the constructor of the new storage.
+        """
+        lfs_root_directory = pathlib.Path(lfs_root_directory)
+        lsed = cls(new_root_directory, **kwargs)
+        new_root = pathlib.Path(lsed._root_directory)
+
+        # the first pass: old storage key -> (class name, new key, inefficiency)
+        progress_file = new_root / cls.migration_progress_file_name
+        scanned = {}
+        if progress_file.exists():
+            with open(progress_file, "r") as file:
+                progress = json.load(file)
+            if progress["source"] == str(lfs_root_directory.resolve()):
+                scanned = {
+                    old_storage_key: tuple(values)
+                    for old_storage_key, values in progress["scanned"].items()
+                }
+                logger.info(f"Resuming conversion of {lfs_root_directory}")
+
+        object_keys = _read_stored_object(
+            lfs_root_directory / "object_keys.json"
+        ).object_keys
+        old_storage_keys = [
+            old_storage_key
+            for storage_keys in object_keys.values()
+            for old_storage_key in storage_keys
+            if old_storage_key not in scanned
+            and (lfs_root_directory / f"{old_storage_key}.json").exists()
+        ]
+
+        def save_scan_progress():
+            atomic_write(
+                progress_file,
+                json.dumps({
+                    "source": str(lfs_root_directory.resolve()),
+                    "scanned": scanned,
+                }),
+            )
+
+        logger.info(
+            f"Reading {len(old_storage_keys)} objects "
+            f"from {lfs_root_directory}"
+        )
+        # the whole scan is rewritten at each checkpoint,
+        # so checkpoint less often than copies
+        scan_checkpoint_interval = checkpoint_interval * 64
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers
+        ) as executor:
+            results = executor.map(
+                _scan_stored_object,
+                [
+                    str(lfs_root_directory / f"{key}.json")
+                    for key in old_storage_keys
+                ],
+                chunksize=64,
+            )
+            try:
+                for i, (old_storage_key, result) in enumerate(
+                    zip(old_storage_keys, results), start=1
+                ):
+                    scanned[old_storage_key] = result
+                    if i % scan_checkpoint_interval == 0:
+                        save_scan_progress()
+            finally:
+                save_scan_progress()
+
+        # new storage key -> (old storage key, statistical inefficiency)
+        storage_objects: dict[str, tuple[str, float]] = {}
+        with lsed.batch():
+            for old_storage_key, result in scanned.items():
+                class_name, new_storage_key, inefficiency = result
+                if class_name == StorageBackend._ObjectKeyData.__name__:
+                    # Skip object key data, as it is not
+                    # relevant for equilibration data.
+                    continue
+                if new_storage_key is None:
+                    lsed.store_object(
+                        _read_stored_object(
+                            lfs_root_directory / f"{old_storage_key}.json"
+                        ),
+                        ancillary_data_path=str(
+                            lfs_root_directory / old_storage_key
+                        ),
+                    )
+                    continue
+                # if object already exists, compare statistical inefficiencies
+                if new_storage_key in storage_objects:
+                    _, existing_inefficiency = storage_objects[new_storage_key]
+                    if existing_inefficiency < inefficiency:
+                        continue  # skip the new object if the old one is better
+                storage_objects[new_storage_key] = (
+                    old_storage_key,
+                    inefficiency,
                 )
-                continue
-            new_storage_key = lsed._get_storage_key(stored_object)
-            # if object already exists, compare statistical inefficiencies
-            if new_storage_key in storage_objects:
-                existing_object = storage_objects[new_storage_key]
-                if existing_object.statistical_inefficiency < stored_object.statistical_inefficiency:
-                    continue  # skip the new object if the old one is better
-            storage_objects[new_storage_key] = (stored_object, data_path)
-
-        # copy over all objects to the new storage
-        for storage_key, (stored_object, data_path) in storage_objects.items():
-            lsed._store_object(
+
+        # don't copy boxes that already exist with a better inefficiency,
+        # including those copied before an interruption
+        to_copy = {
+            new_storage_key: old_storage_key
+            for new_storage_key, (
+                old_storage_key,
+                inefficiency,
+            ) in storage_objects.items()
+            if not lsed.contains_storage_key(new_storage_key)
+            or lsed._get_statistical_inefficiency(new_storage_key)
+            > inefficiency
+        }
+        logger.info(
+            f"Copying {len(to_copy)} of {len(storage_objects)} unique boxes "
+            f"to {new_root}"
+        )
+
+        def copy_object(new_storage_key, old_storage_key):
+            stored_object = _read_stored_object(
+                lfs_root_directory / f"{old_storage_key}.json"
+            )
+            mtime_ns = lsed._write_object(
                 stored_object,
-                storage_key=storage_key,
-                ancillary_data_path=data_path,
+                new_storage_key,
+                ancillary_data_path=lfs_root_directory / old_storage_key,
             )
-            object_class = stored_object.__class__
-            lsed._stored_object_keys[object_class.__name__].append(storage_key)
+            return new_storage_key, stored_object, mtime_ns
+
+        class_keys = lsed._stored_object_keys.setdefault(
+            StoredEquilibrationData.__name__, []
+        )
+        existing_keys = set(class_keys)
+        copied = []
+
+        def register(new_storage_key, stored_object, mtime_ns):
+            # make the object visible to lookups straight away,
+            # as `_store_object` would
+            if new_storage_key not in existing_keys:
+                class_keys.append(new_storage_key)
+                existing_keys.add(new_storage_key)
+            if lsed._index is None:
+                lsed._cached_retrieved_objects[new_storage_key] = (
+                    stored_object,
+                    new_root / new_storage_key,
+                )
+            copied.append((new_storage_key, stored_object, mtime_ns))
+
+        def save_progress():
+            if lsed._index is not None:
+                lsed._index.add_many(copied)
             lsed._save_stored_object_keys()
+            copied.clear()
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=n_workers
+        ) as executor:
+            futures = [
+                executor.submit(copy_object, new_storage_key, old_storage_key)
+                for new_storage_key, old_storage_key in to_copy.items()
+            ]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    register(*future.result())
+                    if len(copied) >= checkpoint_interval:
+                        save_progress()
+            finally:
+                for future in futures:
+                    future.cancel()
+                save_progress()
+
+        progress_file.unlink()
         return lsed
 
     def __init__(
         self,
         root_directory: str | pathlib.Path ="stored_data",
+        use_index: bool = False,
+        max_cached_objects: int | None = None,
+        max_cache_bytes: int | None = None,
+        deduplicate_ancillary_data: bool = False,
+        compression: str | None = None,
+        decompression_directory: str | pathlib.Path | None = None,
     ):
         root_directory = str(root_directory)
+        if (
+            compression is not None
+            and compression not in COMPRESSION_EXTENSIONS
+        ):
+            raise ValueError(
+                f"Unknown compression {compression}. "
+                f"Supported compressions are {sorted(COMPRESSION_EXTENSIONS)}."
+            )
+        self._compression = compression
+        if decompression_directory is not None:
+            decompression_directory = pathlib.Path(decompression_directory)
+        self._decompression_directory = decompression_directory
+        is_bounded = (
+            max_cached_objects is not None or max_cache_bytes is not None
+        )
+        if is_bounded and not use_index:
+            raise ValueError(
+                "A bounded object cache requires `use_index=True`, "
+                "as otherwise every object is loaded "
+                "when the storage is opened."
+            )
+        # these need to be set before the parent class
+        # loads the stored object keys
+        self._use_index = use_index
+        self._index = None
+        self._max_cached_objects = max_cached_objects
+        self._max_cache_bytes = max_cache_bytes
+        self._n_open_batches = 0
+        self._has_unsaved_keys = False
+        self._blob_store = None
+        if deduplicate_ancillary_data:
+            self._blob_store = BlobStore(
+                pathlib.Path(root_directory) / self.blob_directory_name
+            )
         super().__init__(
             root_directory=root_directory,
             cache_objects_in_memory=True,
         )
 
+    def deduplicate_existing_ancillary_data(self):
+        """Move the ancillary data of every stored object into the blob
+        store, replacing each file with a link to its blob.
+
+        This is only needed once, for storage created before
+        ``deduplicate_ancillary_data`` was enabled.
+        """
+        if self._blob_store is None:
+            raise ValueError(
+                "The storage must be opened with "
+                "`deduplicate_ancillary_data=True`."
+            )
+        root = pathlib.Path(self._root_directory)
+        for storage_key in self.get_storage_keys():
+            directory_path = root / storage_key
+            if directory_path.is_dir():
+                self._blob_store.link_tree_in_place(directory_path)
+
+    def collect_garbage(self, dry_run: bool = False) -> tuple[int, int]:
+        """Remove ancillary data blobs that are no longer used by any object.
+
+        Parameters
+        ----------
+        dry_run : bool, optional
+            If True, only report what would be removed.
+
+        Returns
+        -------
+        n_blobs : int
+            The number of blobs removed.
+        n_bytes : int
+            The number of bytes freed.
+        """
+        blob_directory = (
+            pathlib.Path(self._root_directory) / self.blob_directory_name
+        )
+        if not blob_directory.is_dir():
+            return 0, 0
+        return BlobStore(blob_directory).collect_garbage(dry_run=dry_run)
+
+    def _load_stored_object_keys(self):
+        if not self._use_index:
+            return super()._load_stored_object_keys()
+
+        if (
+            self._max_cached_objects is not None
+            or self._max_cache_bytes is not None
+        ):
+            self._cached_retrieved_objects = LRUObjectCache(
+                max_entries=self._max_cached_objects,
+                max_bytes=self._max_cache_bytes,
+                sizeof=self._get_object_file_size,
+            )
+
+        stored_object_keys, _ = self._retrieve_object(
+            self._stored_object_keys_id, self._ObjectKeyData
+        )
+        if stored_object_keys is None:
+            stored_object_keys = {}
+        else:
+            stored_object_keys = stored_object_keys.object_keys
+
+        root = pathlib.Path(self._root_directory)
+        self._index = StorageIndex(root / self.index_file_name)
+        self._stored_object_keys = self._index.synchronize(
+            root, stored_object_keys
+        )
+
+        # there are only ever a handful of hashable objects (e.g. force fields),
+        # so it is cheap to load these eagerly
+        for class_name, storage_keys in self._stored_object_keys.items():
+            if class_name == StoredEquilibrationData.__name__:
+                continue
+            for storage_key in storage_keys:
+                stored_object, _ = self._retrieve_object(storage_key)
+                if isinstance(stored_object, HashableStoredData):
+                    self._object_hashes[hash(stored_object)] = storage_key
+
+    def _get_object_file_size(self, storage_key: str) -> int:
+        file_path = pathlib.Path(self._root_directory) / f"{storage_key}.json"
+        try:
+            return file_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _retrieve_object(self, storage_key, expected_type=None):
+        # go through `get` so that a bounded cache records hits and misses.
+        # Ancillary data is left as stored here, as this is also used to
+        # load objects when the storage is opened and for internal lookups.
+        retrieved = self._cached_retrieved_objects.get(storage_key)
+        if retrieved is None:
+            retrieved = super()._retrieve_object(storage_key, expected_type)
+        return retrieved
+
+    def retrieve_object(self, storage_key, expected_type=None):
+        """Retrieve an object and the directory of its ancillary data.
+
+        If the coordinate file of the object is compressed, it is
+        decompressed outside the storage, into ``decompression_directory``
+        or a temporary directory, and that directory is returned instead.
+        """
+        stored_object, directory_path = super().retrieve_object(
+            storage_key, expected_type
+        )
+        if stored_object is None or directory_path is None:
+            return stored_object, directory_path
+        return stored_object, self._decompress_ancillary_data(
+            storage_key, stored_object, directory_path
+        )
+
+    def query(self, data_query):
+        """Query the storage for objects that match ``data_query``.
+
+        As with :meth:`retrieve_object`, the coordinate file of each
+        matching object is decompressed outside the storage if needed,
+        and the directory it is in is returned instead.
+        """
+        results = super().query(data_query)
+        return {
+            matches: [
+                (
+                    storage_key,
+                    stored_object,
+                    directory_path
+                    if directory_path is None
+                    else self._decompress_ancillary_data(
+                        storage_key, stored_object, directory_path
+                    ),
+                )
+                for storage_key, stored_object, directory_path in entries
+            ]
+            for matches, entries in results.items()
+        }
+
+    def _get_decompression_directory(self) -> pathlib.Path:
+        if self._decompression_directory is None:
+            self._decompression_directory = pathlib.Path(
+                tempfile.mkdtemp(prefix="eveq-decompressed-")
+            )
+            weakref.finalize(
+                self,
+                shutil.rmtree,
+                self._decompression_directory,
+                ignore_errors=True,
+            )
+        return self._decompression_directory
+
+    def _decompress_ancillary_data(
+        self, storage_key, stored_object, directory_path
+    ) -> pathlib.Path:
+        """Make sure the coordinate file of a retrieved object exists
+        uncompressed, returning the directory that contains it.
+
+        Compressed data is never decompressed into the storage itself.
+        """
+        file_name = getattr(stored_object, "coordinate_file_name", None)
+        directory_path = pathlib.Path(directory_path)
+        if not file_name:
+            return directory_path
+
+        compressed_path, compression = find_compressed_file(
+            directory_path / file_name
+        )
+        if compressed_path is None:
+            return directory_path
+
+        target_directory = self._get_decompression_directory() / storage_key
+        target_directory.mkdir(parents=True, exist_ok=True)
+        for file_path in directory_path.iterdir():
+            if file_path.is_file() and file_path != compressed_path:
+                _copy_if_changed(file_path, target_directory / file_path.name)
+
+        coordinate_path = target_directory / file_name
+        if (
+            not coordinate_path.exists()
+            or coordinate_path.stat().st_mtime_ns
+            < compressed_path.stat().st_mtime_ns
+        ):
+            decompress_file(compressed_path, coordinate_path, compression)
+        return target_directory
+
+    def _compress_ancillary_data(self, stored_object, directory_path):
+        """Bring the coordinate file of a stored object in line with
+        the compression of this storage.
+        """
+        file_name = getattr(stored_object, "coordinate_file_name", None)
+        if not file_name:
+            return
+        coordinate_path = pathlib.Path(directory_path) / file_name
+        compressed_paths = {
+            compression: get_compressed_path(coordinate_path, compression)
+            for compression in COMPRESSION_EXTENSIONS
+        }
+
+        if self._compression is None:
+            # keep the uncompressed file if we have one,
+            # otherwise leave compressed data to be decompressed on retrieval
+            if coordinate_path.exists():
+                for compressed_path in compressed_paths.values():
+                    compressed_path.unlink(missing_ok=True)
+            return
+
+        target_path = compressed_paths.pop(self._compression)
+        if not coordinate_path.exists():
+            existing_path, existing_compression = find_compressed_file(
+                coordinate_path
+            )
+            if (
+                existing_path is None
+                or existing_compression == self._compression
+            ):
+                return
+            decompress_file(
+                existing_path, coordinate_path, existing_compression
+            )
+
+        compress_file(coordinate_path, target_path, self._compression)
+        if self._blob_store is not None:
+            self._blob_store.link(target_path, target_path)
+        coordinate_path.unlink()
+        for compressed_path in compressed_paths.values():
+            compressed_path.unlink(missing_ok=True)
+
+    def compress_existing_ancillary_data(self, n_workers: int | None = None):
+        """Compress the coordinate files of every stored object in place,
+        using the compression of this storage.
+
+        Parameters
+        ----------
+        n_workers : int, optional
+            The number of threads used to compress files.
+            By default this is chosen by ``concurrent.futures``.
+        """
+        if self._compression is None:
+            raise ValueError("The storage must be opened with a `compression`.")
+
+        root = pathlib.Path(self._root_directory)
+
+        def compress(storage_key):
+            # read the object directly, rather than
+            # keeping every object in the cache
+            stored_object = _read_stored_object(root / f"{storage_key}.json")
+            self._compress_ancillary_data(stored_object, root / storage_key)
+
+        storage_keys = self.get_storage_keys(StoredEquilibrationData)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=n_workers
+        ) as executor:
+            for _ in executor.map(compress, storage_keys):
+                pass
+
+    def get_cache_statistics(self) -> dict[str, int]:
+        """Return statistics about the in-memory object cache.
+
+        Returns
+        -------
+        dict[str, int]
+            The number of cached entries and, if the cache is bounded,
+            the number of cache hits, misses and evictions and the
+            approximate cache size in bytes.
+        """
+        if isinstance(self._cached_retrieved_objects, LRUObjectCache):
+            return self._cached_retrieved_objects.get_statistics()
+        return {"n_entries": len(self._cached_retrieved_objects)}
+
+    def _get_statistical_inefficiency(self, storage_key: str) -> float | None:
+        if self._index is not None:
+            entry = self._index.get(storage_key)
+            return None if entry is None else entry["statistical_inefficiency"]
+        stored_object, _ = self._retrieve_object(storage_key)
+        return getattr(stored_object, "statistical_inefficiency", None)
+
+    def contains_storage_key(self, storage_key: str) -> bool:
+        """Check whether an object with the given key is stored."""
+        if self._index is not None:
+            return storage_key in self._index
+        return storage_key in self._cached_retrieved_objects
+
+    def get_storage_keys(self, data_type: type | None = None) -> list[str]:
+        """Return the keys of the stored objects.
+
+        Parameters
+        ----------
+        data_type : type, optional
+            If given, only return keys of objects of this class.
+
+        Returns
+        -------
+        list[str]
+            The storage keys.
+        """
+        if data_type is not None:
+            return list(self._stored_object_keys.get(data_type.__name__, []))
+        return [
+            storage_key
+            for storage_keys in self._stored_object_keys.values()
+            for storage_key in storage_keys
+        ]
+
+    def has_object(self, storage_object):
+        # the storage key of equilibration data is derived from
+        # the box it describes, so we can look it up directly
+        # rather than comparing against every stored object
+        if isinstance(storage_object, StoredEquilibrationData):
+            storage_key = self._get_storage_key(storage_object)
+            if self.contains_storage_key(storage_key):
+                return storage_key
+            return None
+        return super().has_object(storage_object)
+
     def update(self, other):
         """Update the storage with new equilibration data."""
         assert isinstance(other, LocalStoredEquilibrationData), (
-            "The provided object must be an instance of LocalStoredEquilibrationData."
+            "The provided object must be an instance "
+            "of LocalStoredEquilibrationData."
         )
 
-        n_existing_objects = len(self._cached_retrieved_objects)
+        other_keys = other.get_storage_keys()
+        n_existing_objects = len(self.get_storage_keys())
         logger.info(
-            f"Updating storage with {len(other._cached_retrieved_objects)} new objects. "
+            f"Updating storage with {len(other_keys)} new objects. "
             f"Currently, there are {n_existing_objects} objects in the storage."
         )
-        
-        for storage_key, (object_to_store, ancillary_data_path) in other._cached_retrieved_objects.items():
-            if storage_key in self._cached_retrieved_objects:
-                existing_object, _ = self._cached_retrieved_objects[storage_key]
-                if existing_object.statistical_inefficiency < object_to_store.statistical_inefficiency:
+
+        equilibration_keys = set(
+            other.get_storage_keys(StoredEquilibrationData)
+        )
+        for storage_key in other_keys:
+            if (
+                storage_key in equilibration_keys
+                and self.contains_storage_key(storage_key)
+            ):
+                existing_inefficiency = self._get_statistical_inefficiency(
+                    storage_key
+                )
+                new_inefficiency = other._get_statistical_inefficiency(
+                    storage_key
+                )
+                if existing_inefficiency < new_inefficiency:
                     logger.info(
-                        f"Skipping {storage_key} as it already exists with a lower statistical inefficiency."
+                        f"Skipping {storage_key} as it already exists "
+                        "with a lower statistical inefficiency."
                     )
                     continue
+            object_to_store, ancillary_data_path = other.retrieve_object(
+                storage_key
+            )
             self.store_object(
                 object_to_store,
-                storage_key=storage_key,
                 ancillary_data_path=ancillary_data_path,
             )
-            # object_class = object_to_store.__class__
-            # self._stored_object_keys[object_class.__name__].append(storage_key)
-            # self._save_stored_object_keys()
 
-        n_final_objects = len(self._cached_retrieved_objects)
+        n_final_objects = len(self.get_storage_keys())
         logger.info(
             f"Storage updated. Now contains {n_final_objects} objects."
         )
 
-    def _store_object(
-        self, object_to_store, storage_key=None, ancillary_data_path=None
-    ):
+    def _write_object(
+        self, object_to_store, storage_key, ancillary_data_path=None
+    ) -> int:
+        """Write an object and its ancillary data to disk,
+        returning the modification time of the object file.
+        """
         root = pathlib.Path(self._root_directory)
         file_path = root / f"{storage_key}.json"
         directory_path = root / f"{storage_key}"
 
-        with open(file_path, "w") as file:
-            json.dump(object_to_store, file, cls=TypedJSONEncoder)
-
+        # copy the ancillary data first, so that an interrupted write
+        # never leaves an object without its data
         if object_to_store.has_ancillary_data():
-            shutil.copytree(ancillary_data_path, directory_path, dirs_exist_ok=True)
+            self._write_ancillary_data(
+                object_to_store, ancillary_data_path, directory_path
+            )
+
+        atomic_write(
+            file_path, json.dumps(object_to_store, cls=TypedJSONEncoder)
+        )
+        return file_path.stat().st_mtime_ns
+
+    def _write_ancillary_data(
+        self, object_to_store, ancillary_data_path, directory_path
+    ):
+        """Replace the ancillary data directory of an object.
+
+        The data is written to a temporary sibling directory, which is
+        then renamed into place, so that no files of replaced data are
+        left behind. Any existing directory is moved aside just before,
+        and removed after.
+        """
+        name = f".{directory_path.name}.{uuid.uuid4().hex}"
+        tmp_path = directory_path.with_name(f"{name}.tmp")
+        old_path = directory_path.with_name(f"{name}.old")
+        try:
+            if self._blob_store is not None:
+                self._blob_store.link_tree(ancillary_data_path, tmp_path)
+            else:
+                shutil.copytree(ancillary_data_path, tmp_path)
+            self._compress_ancillary_data(object_to_store, tmp_path)
+
+            if directory_path.exists():
+                os.rename(directory_path, old_path)
+            try:
+                os.rename(tmp_path, directory_path)
+            except BaseException:
+                if old_path.exists():
+                    os.rename(old_path, directory_path)
+                raise
+        finally:
+            for path in (tmp_path, old_path):
+                if path.exists():
+                    shutil.rmtree(path)
+
+    def _store_object(
+        self, object_to_store, storage_key=None, ancillary_data_path=None
+    ):
+        mtime_ns = self._write_object(
+            object_to_store, storage_key, ancillary_data_path
+        )
+        directory_path = pathlib.Path(self._root_directory) / f"{storage_key}"
 
         self._cached_retrieved_objects[storage_key] = (
             object_to_store,
             directory_path,
         )
+        if (
+            self._index is not None
+            and not isinstance(object_to_store, StorageBackend._ObjectKeyData)
+        ):
+            self._index.add(storage_key, object_to_store, mtime_ns)
+
+    def _save_stored_object_keys(self):
+        if self._n_open_batches > 0:
+            # written once when the outermost batch is closed
+            self._has_unsaved_keys = True
+            return
+
+        object_keys = self._ObjectKeyData()
+        object_keys.object_keys = self._stored_object_keys
+
+        file_path = (
+            pathlib.Path(self._root_directory)
+            / f"{self._stored_object_keys_id}.json"
+        )
+        atomic_write(file_path, json.dumps(object_keys, cls=TypedJSONEncoder))
+        self._cached_retrieved_objects[self._stored_object_keys_id] = (
+            object_keys,
+            None,
+        )
+        self._has_unsaved_keys = False
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group many stores into a single transaction.
+
+        Within the context, ``object_keys.json`` is not rewritten after every
+        stored object. Instead it is written once, atomically, when the
+        outermost batch exits.
+
+        Examples
+        --------
+        >>> with storage.batch():
+        ...     for stored_object, path in objects:
+        ...         storage.store_object(stored_object, path)
+        """
+        self._n_open_batches += 1
+        try:
+            yield self
+        finally:
+            self._n_open_batches -= 1
+            # save even on error, as the objects
+            # stored so far are already on disk
+            if self._n_open_batches == 0 and self._has_unsaved_keys:
+                self._save_stored_object_keys()
+
+    def store_objects(
+        self,
+        objects_to_store,
+        n_workers: int | None = None,
+    ) -> list[str]:
+        """
+        Store many objects at once.
+
+        All objects are validated and keyed before anything is written.
+        Equilibration data describing the same box, whether within
+        ``objects_to_store`` or already in the storage, is deduplicated by
+        keeping the object with the lowest statistical inefficiency.
+        Objects and their ancillary data are then written in parallel,
+        and the key index is written once at the end.
+
+        Parameters
+        ----------
+        objects_to_store : iterable of tuple[BaseStoredData, str]
+            Pairs of the object to store and the path to its
+            ancillary data (or None if the object has none).
+        n_workers : int, optional
+            The number of threads used to copy data.
+            By default this is chosen by ``concurrent.futures``.
+
+        Returns
+        -------
+        list[str]
+            The storage key of each object, in the order given.
+        """
+        storage_keys = []
+        # storage key -> (object, ancillary data path)
+        to_write = {}
+        other_objects = []
+
+        for object_to_store, ancillary_data_path in objects_to_store:
+            if object_to_store is None:
+                raise ValueError("The object to store cannot be None.")
+            if not isinstance(object_to_store, BaseStoredData):
+                raise ValueError(
+                    "Only objects inheriting from `BaseStoredData` can "
+                    "be stored in the storage system."
+                )
+            object_to_store.validate()
+            if (
+                object_to_store.has_ancillary_data()
+                and ancillary_data_path is None
+            ):
+                raise ValueError("This object requires ancillary data.")
+
+            if not isinstance(object_to_store, StoredEquilibrationData):
+                # these are rare, so just go through the usual route
+                other_objects.append(
+                    (len(storage_keys), object_to_store, ancillary_data_path)
+                )
+                storage_keys.append(None)
+                continue
+
+            storage_key = self._get_storage_key(object_to_store)
+            storage_keys.append(storage_key)
+
+            if storage_key in to_write:
+                existing_object, _ = to_write[storage_key]
+                existing_inefficiency = existing_object.statistical_inefficiency
+            elif self.contains_storage_key(storage_key):
+                existing_inefficiency = self._get_statistical_inefficiency(
+                    storage_key
+                )
+            else:
+                existing_inefficiency = None
+
+            if (
+                existing_inefficiency is not None
+                and existing_inefficiency
+                <= object_to_store.statistical_inefficiency
+            ):
+                continue
+            to_write[storage_key] = (object_to_store, ancillary_data_path)
+
+        with self.batch():
+            for i, object_to_store, ancillary_data_path in other_objects:
+                storage_keys[i] = self.store_object(
+                    object_to_store, ancillary_data_path
+                )
+
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=n_workers
+            ) as executor:
+                futures = {
+                    storage_key: executor.submit(
+                        self._write_object,
+                        object_to_store,
+                        storage_key,
+                        ancillary_data_path,
+                    )
+                    for storage_key, (
+                        object_to_store,
+                        ancillary_data_path,
+                    ) in to_write.items()
+                }
+                mtimes = {
+                    storage_key: future.result()
+                    for storage_key, future in futures.items()
+                }
+
+            root = pathlib.Path(self._root_directory)
+            index_entries = []
+            class_keys = self._stored_object_keys.setdefault(
+                StoredEquilibrationData.__name__, []
+            )
+            existing_keys = set(class_keys)
+            for storage_key, (object_to_store, _) in to_write.items():
+                self._cached_retrieved_objects[storage_key] = (
+                    object_to_store,
+                    root / storage_key,
+                )
+                index_entries.append(
+                    (storage_key, object_to_store, mtimes[storage_key])
+                )
+                if storage_key not in existing_keys:
+                    class_keys.append(storage_key)
+
+            if self._index is not None:
+                self._index.add_many(index_entries)
+            if to_write:
+                self._save_stored_object_keys()
+
+        n_skipped = len(storage_keys) - len(other_objects) - len(to_write)
+        logger.info(
+            f"Stored {len(to_write)} equilibration data objects. "
+            f"Skipped {n_skipped} whose box is already stored "
+            "with a lower statistical inefficiency."
+        )
+        return storage_keys
 
     def store_object(self, object_to_store, ancillary_data_path=None):
         """Store an object in the storage system, returning the key
@@ -202,7 +1071,9 @@ class LocalStoredEquilibrationData(LocalFileStorage):
                 # the passed object.
                 return storage_key
 
-            existing_object, _ = self.retrieve_object(storage_key, ReplaceableData)
+            existing_object, _ = self._retrieve_object(
+                storage_key, ReplaceableData
+            )
 
             # noinspection PyTypeChecker
             object_to_store = object_to_store.most_information(
@@ -242,7 +1113,9 @@ class LocalStoredEquilibrationData(LocalFileStorage):
         # Register the key in the storage system.
         if (
             not isinstance(object_to_store, StorageBackend._ObjectKeyData)
-            and storage_key not in self._stored_object_keys[object_class.__name__]
+            and storage_key not in self._stored_object_keys.setdefault(
+                object_class.__name__, []
+            )
         ):
             self._stored_object_keys[object_class.__name__].append(storage_key)
             self._save_stored_object_keys()
@@ -276,6 +1149,31 @@ class LocalStoredEquilibrationData(LocalFileStorage):
         )
         for box in boxes:
             key = box._get_storage_key()
-            if key not in self._cached_retrieved_objects:
+            if not self.contains_storage_key(key):
                 return False
         return True
+
+    def get_dataset_coverage(
+        self,
+        dataset: PhysicalPropertyDataSet,
+        n_molecules: int = 1000,
+    ) -> DatasetCoverage:
+        """Check which properties of a dataset have all their boxes stored,
+        in one pass over the dataset.
+        See :func:`eveq.storage.coverage.get_dataset_coverage`.
+
+        Parameters
+        ----------
+        dataset : PhysicalPropertyDataSet or pandas.DataFrame
+            The dataset, or its ``to_pandas()`` representation.
+
+        n_molecules : int, optional
+            The number of molecules to consider for the property boxes, by default 1000.
+
+        Returns
+        -------
+        DatasetCoverage
+            The covered and uncovered properties, and the missing boxes
+            ranked by how many properties need them.
+        """
+        return get_dataset_coverage(self, dataset, n_molecules=n_molecules)
@@ -0,0 +1,44 @@
+import pathlib
+
+import pytest
+
+
+@pytest.fixture
+def make_equilibration_data():
+    """Return a function that creates ``StoredEquilibrationData``
+    for a box of water, with an ``output.pdb`` to store alongside it.
+    """
+    pytest.importorskip("openff.evaluator")
+    from openff.evaluator.datasets import PropertyPhase
+    from openff.evaluator.storage.data import StoredEquilibrationData
+    from openff.evaluator.substances import Substance
+    from openff.evaluator.thermodynamics import ThermodynamicState
+    from openff.units import unit
+
+    def make_equilibration_data(
+        directory: pathlib.Path,
+        temperature: float = 298.15,
+        statistical_inefficiency: float = 2.0,
+        contents: str = "ATOM\n",
+    ):
+        ancillary_data_path = pathlib.Path(directory)
+        ancillary_data_path.mkdir(parents=True, exist_ok=True)
+        (ancillary_data_path / "output.pdb").write_text(contents)
+
+        stored_data = StoredEquilibrationData()
+        stored_data.substance = Substance.from_components("O")
+        stored_data.thermodynamic_state = ThermodynamicState(
+            temperature=temperature * unit.kelvin,
+            pressure=1.0 * unit.atmosphere,
+        )
+        stored_data.property_phase = PropertyPhase.Liquid
+        stored_data.source_calculation_id = "eveq"
+        stored_data.force_field_id = "force-field"
+        stored_data.coordinate_file_name = "output.pdb"
+        stored_data.statistical_inefficiency = statistical_inefficiency
+        stored_data.number_of_molecules = 1000
+        stored_data.max_number_of_molecules = 1000
+        stored_data.calculation_layer = "EquilibrationLayer"
+        return stored_data, str(ancillary_data_path)
+
+    return make_equilibration_data
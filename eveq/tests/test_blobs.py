@@ -0,0 +1,116 @@
+import errno
+import os
+import threading
+
+import pytest
+
+from eveq.storage import blobs
+from eveq.storage.blobs import BlobStore, link_or_copy
+
+
+def _write(path, contents: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(contents)
+    return path
+
+
+def test_link_or_copy_replaces_hardlink(tmp_path):
+    source = _write(tmp_path / "source", b"old")
+    destination = tmp_path / "destination"
+    assert link_or_copy(source, destination) == "hardlink"
+
+    new_source = _write(tmp_path / "new", b"new")
+    link_or_copy(new_source, destination, allow_hardlink=False)
+    assert destination.read_bytes() == b"new"
+    # the old hardlinked file was replaced, not written through
+    assert source.read_bytes() == b"old"
+
+
+def test_link_deduplicates(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    first = _write(tmp_path / "a" / "file", b"data")
+    second = _write(tmp_path / "b" / "file", b"data")
+    (tmp_path / "x").mkdir()
+    (tmp_path / "y").mkdir()
+
+    digest = store.link(first, tmp_path / "x" / "file")
+    assert store.link(second, tmp_path / "y" / "file") == digest
+    assert digest in store
+    assert (
+        (tmp_path / "x" / "file").stat().st_ino
+        == (tmp_path / "y" / "file").stat().st_ino
+    )
+
+
+def test_collect_garbage(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    store.link(_write(tmp_path / "kept", b"kept"), tmp_path / "linked")
+    unused = store.add(_write(tmp_path / "unused", b"unused"))
+
+    assert store.collect_garbage(dry_run=True) == (1, len(b"unused"))
+    assert unused in store
+
+    assert store.collect_garbage() == (1, len(b"unused"))
+    assert unused not in store
+    assert (tmp_path / "linked").read_bytes() == b"kept"
+    assert store.collect_garbage() == (0, 0)
+
+
+def test_no_deduplication_without_hardlinks(tmp_path, monkeypatch):
+    def link(source, destination):
+        raise OSError(errno.EXDEV, "no hardlinks")
+
+    monkeypatch.setattr(blobs.os, "link", link)
+    store = BlobStore(tmp_path / "blobs")
+    assert not store.supports_hardlinks
+
+    source = _write(tmp_path / "source", b"data")
+    assert store.link(source, tmp_path / "destination") is None
+    assert (tmp_path / "destination").read_bytes() == b"data"
+    assert not list((tmp_path / "blobs").glob("*/*"))
+
+    # nothing to collect, and the placed file is untouched
+    assert store.collect_garbage() == (0, 0)
+    assert (tmp_path / "destination").read_bytes() == b"data"
+
+
+def test_collect_garbage_waits_for_writers(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    collected = threading.Event()
+
+    def collect():
+        BlobStore(tmp_path / "blobs").collect_garbage()
+        collected.set()
+
+    with store._lock():
+        # a blob that is added but not yet linked
+        digest = store.add(_write(tmp_path / "source", b"data"))
+        thread = threading.Thread(target=collect)
+        thread.start()
+        assert not collected.wait(0.2)
+        store.link(tmp_path / "source", tmp_path / "destination")
+
+    thread.join()
+    assert digest in store
+    assert os.path.samefile(
+        tmp_path / "destination", store._get_blob_path(digest)
+    )
+
+
+@pytest.mark.parametrize("method", ["link_tree", "link_tree_in_place"])
+def test_link_tree(tmp_path, method):
+    store = BlobStore(tmp_path / "blobs")
+    source = tmp_path / "source"
+    _write(source / "a.pdb", b"a")
+    _write(source / "nested" / "b.pdb", b"b")
+
+    if method == "link_tree":
+        destination = tmp_path / "destination"
+        store.link_tree(source, destination)
+    else:
+        destination = source
+        store.link_tree_in_place(source)
+
+    assert (destination / "a.pdb").read_bytes() == b"a"
+    assert (destination / "nested" / "b.pdb").read_bytes() == b"b"
+    assert (destination / "a.pdb").stat().st_nlink == 2
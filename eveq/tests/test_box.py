@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("openff.evaluator")
+
+from openff.evaluator.datasets import PropertyPhase  # noqa: E402
+from openff.evaluator.substances import (  # noqa: E402
+    Component,
+    MoleFraction,
+    Substance,
+)
+from openff.evaluator.thermodynamics import ThermodynamicState  # noqa: E402
+from openff.units import unit  # noqa: E402
+
+from eveq.box import box  # noqa: E402
+from eveq.box.box import ConsistentHashableData  # noqa: E402
+
+
+def _make_substance(components):
+    substance = Substance()
+    for smiles, mole_fraction in components:
+        substance.add_component(Component(smiles), MoleFraction(mole_fraction))
+    return substance
+
+
+def _make_data(substance):
+    return ConsistentHashableData(
+        substance=substance,
+        n_molecules=1000,
+        max_molecules=1000,
+        thermodynamic_state=ThermodynamicState(
+            temperature=298.15 * unit.kelvin,
+            pressure=1.0 * unit.atmosphere,
+        ),
+        property_phase=PropertyPhase.Liquid,
+    )
+
+
+@pytest.mark.parametrize(
+    "components",
+    [
+        [("O", 0.25), ("CO", 0.75)],
+        [("CO", 0.75), ("O", 0.25)],
+        [("CO", 0.25), ("O", 0.75)],
+    ],
+)
+def test_cached_digest_matches_serialization(monkeypatch, components):
+    monkeypatch.setattr(box, "_DIGEST_CACHE", {})
+    # fill the cache with every other substance first
+    for other in [[("O", 0.25), ("CO", 0.75)], [("CO", 0.25), ("O", 0.75)]]:
+        hash(_make_data(_make_substance(other)))
+
+    data = _make_data(_make_substance(components))
+    assert hash(data) == hash(data._compute_digest())
+
+
+def test_cached_digest_is_reused(monkeypatch):
+    monkeypatch.setattr(box, "_DIGEST_CACHE", {})
+    substance = _make_substance([("O", 0.5), ("CO", 0.5)])
+    assert hash(_make_data(substance)) == hash(_make_data(substance))
+    assert len(box._DIGEST_CACHE) == 1
@@ -0,0 +1,65 @@
+import pytest
+
+from eveq.storage.cache import LRUObjectCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUObjectCache(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1
+    cache["c"] = 3
+
+    assert cache.keys() == ["a", "c"]
+    assert cache.evictions == 1
+
+
+def test_evicts_by_size():
+    sizes = {"a": 4, "b": 4, "c": 8}
+    cache = LRUObjectCache(max_bytes=10, sizeof=sizes.__getitem__)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.n_bytes == 8
+
+    cache["c"] = 3
+    assert cache.keys() == ["c"]
+    assert cache.n_bytes == 8
+
+
+def test_keeps_entry_larger_than_limit():
+    cache = LRUObjectCache(max_bytes=1, sizeof=lambda key: 100)
+    cache["a"] = 1
+    assert "a" in cache
+    cache["b"] = 2
+    assert cache.keys() == ["b"]
+
+
+def test_replacing_entry_updates_size():
+    sizes = {"a": 4}
+    cache = LRUObjectCache(max_bytes=10, sizeof=lambda key: sizes[key])
+    cache["a"] = 1
+    sizes["a"] = 6
+    cache["a"] = 2
+    assert cache.n_bytes == 6
+    assert cache.pop("a") == 2
+    assert cache.n_bytes == 0
+
+
+def test_statistics():
+    cache = LRUObjectCache(max_entries=1)
+    cache["a"] = 1
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    cache["b"] = 2
+    assert cache.get_statistics() == {
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+        "n_entries": 1,
+        "n_bytes": 0,
+    }
+
+
+def test_max_bytes_requires_sizeof():
+    with pytest.raises(ValueError, match="sizeof"):
+        LRUObjectCache(max_bytes=10)
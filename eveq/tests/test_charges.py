@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("openff.interchange")
+pytest.importorskip("rdkit")
+
+from openff.toolkit import Molecule, Topology  # noqa: E402
+
+from eveq.equilibration.charges import PartialChargeCache  # noqa: E402
+
+
+def test_get_composition_runs():
+    water = Molecule.from_smiles("O")
+    methanol = Molecule.from_smiles("CO")
+    topology = Topology.from_molecules(
+        [water, water, methanol, water]
+    )
+
+    composition = PartialChargeCache._get_composition(topology)
+    assert composition == (
+        (water.to_smiles(mapped=True), 2),
+        (methanol.to_smiles(mapped=True), 1),
+        (water.to_smiles(mapped=True), 1),
+    )
+
+
+def test_get_composition_reordered_atoms():
+    methanol = Molecule.from_smiles("CO")
+    reordered = methanol.remap(
+        {i: methanol.n_atoms - 1 - i for i in range(methanol.n_atoms)}
+    )
+    topology = Topology.from_molecules([methanol, reordered])
+    assert PartialChargeCache._get_composition(topology) is None
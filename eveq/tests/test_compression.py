@@ -0,0 +1,35 @@
+import pytest
+
+from eveq.storage.compression import (
+    compress_file,
+    decompress_file,
+    find_compressed_file,
+    get_compressed_path,
+)
+
+
+def test_round_trip(tmp_path):
+    source = tmp_path / "output.pdb"
+    source.write_bytes(b"ATOM\n" * 1000)
+    compressed_path = get_compressed_path(source, "gzip")
+    assert compressed_path.name == "output.pdb.gz"
+
+    compress_file(source, compressed_path, "gzip")
+    assert compressed_path.stat().st_size < source.stat().st_size
+    assert find_compressed_file(source) == (compressed_path, "gzip")
+
+    destination = tmp_path / "decompressed.pdb"
+    decompress_file(compressed_path, destination, "gzip")
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_find_compressed_file_missing(tmp_path):
+    assert find_compressed_file(tmp_path / "output.pdb") == (None, None)
+
+
+def test_failed_write_leaves_no_files(tmp_path):
+    source = tmp_path / "output.pdb"
+    source.write_bytes(b"ATOM\n")
+    with pytest.raises(ValueError, match="Unknown compression"):
+        compress_file(source, tmp_path / "output.pdb.xz", "xz")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["output.pdb"]
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from eveq.equilibration import convergence
+from eveq.equilibration.convergence import (
+    STATISTICS_COLUMNS,
+    EquilibrationAnalyzer,
+    EquilibrationGate,
+    SampleBuffer,
+    get_statistical_inefficiency,
+    read_last_statistics,
+)
+
+
+def _generate_series(n_samples, correlation, seed=0):
+    # an AR(1) process, with statistical inefficiency
+    # (1 + correlation) / (1 - correlation)
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=n_samples)
+    data = np.empty(n_samples)
+    data[0] = noise[0]
+    for i in range(1, n_samples):
+        data[i] = correlation * data[i - 1] + noise[i]
+    return data
+
+
+def test_sample_buffer_grows():
+    buffer = SampleBuffer(2, capacity=2)
+    buffer.extend([[0, 1], [2, 3]])
+    view = buffer.get_column(1)
+    buffer.extend(np.arange(4, 10).reshape(3, 2))
+
+    assert len(buffer) == 5
+    np.testing.assert_array_equal(buffer.get_column(0), [0, 2, 4, 6, 8])
+    # earlier views are not changed by growing
+    np.testing.assert_array_equal(view, [1, 3])
+
+
+def test_statistical_inefficiency():
+    rng = np.random.default_rng(0)
+    assert get_statistical_inefficiency(rng.normal(size=10000)) == (
+        pytest.approx(1.0, abs=0.1)
+    )
+    assert get_statistical_inefficiency(
+        _generate_series(20000, 0.8)
+    ) == pytest.approx(9.0, rel=0.2)
+    assert get_statistical_inefficiency(np.ones(100)) == 1.0
+    assert get_statistical_inefficiency([1.0, 2.0]) == 1.0
+
+
+def test_equilibration_gate():
+    gate = EquilibrationGate(["a", "b"], n_required_samples=1000)
+    samples = np.column_stack([
+        np.random.default_rng(0).normal(size=1200),
+        _generate_series(1200, 0.8),
+    ])
+    gate.extend(samples[:600])
+    gate.extend(samples[600:])
+
+    assert len(gate) == 1200
+    np.testing.assert_array_equal(gate.get_series("b"), samples[:, 1])
+    # only the uncorrelated series has enough samples
+    assert not gate.recompute()
+    assert gate.estimates["a"] > 500
+    assert gate.estimates["b"] < 500
+
+    gate.gate_fraction = 0.1
+    assert gate.recompute()
+
+
+def test_read_last_statistics(tmp_path):
+    statistics_file = tmp_path / "openmm_statistics.csv"
+    assert read_last_statistics(statistics_file) is None
+
+    row = ",".join(str(i) for i in range(len(STATISTICS_COLUMNS)))
+    statistics_file.write_text(f"{row}\n{row}\n1,2,")
+    statistics = read_last_statistics(statistics_file, n_bytes=64)
+    assert statistics == {
+        column: float(i) for i, column in enumerate(STATISTICS_COLUMNS)
+    }
+
+
+def test_analyzer_memoizes_results(monkeypatch):
+    calls = []
+
+    def run_detector(detector_name, data):
+        calls.append((detector_name, len(data)))
+        return len(data) // 2, 2.0, len(data) / 4
+
+    monkeypatch.setattr(convergence, "run_detector", run_detector)
+    analyzer = EquilibrationAnalyzer(detectors=["window", "chodera"])
+    data = np.arange(100.0)
+
+    results = analyzer.analyze({"density": data[:10]})
+    assert results == {"density": (5, 2.0, 2.5)}
+    assert analyzer.analyze({"density": data[:10]}) == results
+    assert len(calls) == 2
+
+    analyzer.analyze({"density": data})
+    assert len(calls) == 4
+    analyzer.shutdown()
+
+
+def test_analyzer_unknown_detector():
+    with pytest.raises(ValueError, match="Unknown detectors"):
+        EquilibrationAnalyzer(detectors=["magic"])
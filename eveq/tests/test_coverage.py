@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("openff.evaluator")
+
+from eveq.storage.coverage import DatasetCoverage  # noqa: E402
+
+
+def test_dataset_coverage():
+    boxes = {key: object() for key in ["a", "b", "c", "d"]}
+    coverage = DatasetCoverage(
+        boxes,
+        property_box_keys={
+            "covered": ["a", "a"],
+            "needs_b": ["a", "b"],
+            "needs_b_and_c": ["b", "c"],
+            "needs_c": ["c"],
+            "needs_c_and_d": ["c", "d"],
+        },
+        stored_box_keys={"a"},
+    )
+
+    assert coverage.covered_property_ids == ["covered"]
+    # c is needed by the most properties, then b unlocks more than d
+    assert coverage.missing_box_keys == ["c", "b", "d"]
+    assert list(coverage.missing_boxes) == ["c", "b", "d"]
+    assert coverage.unlocked_property_ids == {
+        "b": ["needs_b"],
+        "c": ["needs_c"],
+    }
+    assert coverage.get_unlocked_property_ids(["b", "c"]) == [
+        "needs_b",
+        "needs_b_and_c",
+        "needs_c",
+    ]
+
+    summary = coverage.to_pandas()
+    assert list(summary["n_properties"]) == [3, 2, 1]
+    assert list(summary["n_unlocked"]) == [1, 1, 0]
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+pytest.importorskip("openff.evaluator")
+
+from openff.evaluator.storage.data import StoredEquilibrationData  # noqa: E402
+
+from eveq.storage.index import StorageIndex  # noqa: E402
+from eveq.storage.storage import LocalStoredEquilibrationData  # noqa: E402
+
+
+@pytest.fixture
+def stored_keys(tmp_path, make_equilibration_data):
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    return [
+        storage.store_object(
+            *make_equilibration_data(
+                tmp_path / f"box_{temperature}", temperature=temperature
+            )
+        )
+        for temperature in [298.15, 308.15]
+    ]
+
+
+def test_index_is_built_and_synchronized(
+    tmp_path, make_equilibration_data, stored_keys
+):
+    root_directory = tmp_path / "stored_data"
+    storage = LocalStoredEquilibrationData(root_directory, use_index=True)
+    assert sorted(storage.get_storage_keys(StoredEquilibrationData)) == (
+        sorted(stored_keys)
+    )
+
+    index = StorageIndex(root_directory / "object_index.sqlite")
+    assert index.keys("StoredEquilibrationData") == set(stored_keys)
+    entry = index.get(stored_keys[0])
+    assert entry["temperature"] == pytest.approx(298.15)
+    assert entry["pressure"] == pytest.approx(101.325)
+    assert entry["statistical_inefficiency"] == 2.0
+    index.close()
+
+    # replace one object without the index, and remove the other
+    LocalStoredEquilibrationData(root_directory).store_object(
+        *make_equilibration_data(
+            tmp_path / "better", statistical_inefficiency=1.0
+        )
+    )
+    os.remove(root_directory / f"{stored_keys[1]}.json")
+
+    storage = LocalStoredEquilibrationData(root_directory, use_index=True)
+    assert storage.get_storage_keys() == [stored_keys[0]]
+    index = StorageIndex(root_directory / "object_index.sqlite")
+    assert len(index) == 1
+    assert index.get(stored_keys[0])["statistical_inefficiency"] == 1.0
+    index.close()
+
+
+def test_bounded_cache(tmp_path, stored_keys):
+    storage = LocalStoredEquilibrationData(
+        tmp_path / "stored_data", use_index=True, max_cached_objects=1
+    )
+    for storage_key in stored_keys:
+        stored_object, _ = storage.retrieve_object(storage_key)
+        assert stored_object.statistical_inefficiency == 2.0
+
+    statistics = storage.get_cache_statistics()
+    assert statistics["n_entries"] == 1
+    assert statistics["evictions"] >= 1
+    assert statistics["misses"] >= 2
+
+
+def test_bounded_cache_requires_index(tmp_path):
+    with pytest.raises(ValueError, match="use_index"):
+        LocalStoredEquilibrationData(
+            tmp_path / "stored_data", max_cached_objects=1
+        )
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("openff.evaluator")
+
+from openff.evaluator.datasets import (  # noqa: E402
+    PhysicalPropertyDataSet,
+    PropertyPhase,
+)
+from openff.evaluator.properties import Density, ExcessMolarVolume  # noqa: E402
+from openff.evaluator.substances import Substance  # noqa: E402
+from openff.evaluator.thermodynamics import ThermodynamicState  # noqa: E402
+from openff.units import unit  # noqa: E402
+
+from eveq.box.box import PropertyBox  # noqa: E402
+from eveq.box.planning import plan_boxes  # noqa: E402
+
+
+def _make_property(property_class, smiles, temperature, value_unit):
+    return property_class(
+        thermodynamic_state=ThermodynamicState(
+            temperature=temperature * unit.kelvin,
+            pressure=101.325 * unit.kilopascal,
+        ),
+        phase=PropertyPhase.Liquid,
+        substance=Substance.from_components(*smiles),
+        value=1.0 * value_unit,
+        uncertainty=0.1 * value_unit,
+    )
+
+
+@pytest.fixture
+def dataset():
+    density = unit.gram / unit.milliliter
+    volume = unit.centimeter ** 3 / unit.mole
+    dataset = PhysicalPropertyDataSet()
+    dataset.add_properties(
+        _make_property(Density, ["CO"], 298.15, density),
+        _make_property(Density, ["CO"], 298.15, density),
+        _make_property(Density, ["CO"], 308.15, density),
+        _make_property(ExcessMolarVolume, ["CO", "O"], 298.15, volume),
+    )
+    return dataset
+
+
+@pytest.mark.parametrize("as_data_frame", [False, True])
+def test_plan_boxes(dataset, as_data_frame):
+    boxes, property_box_keys = plan_boxes(
+        dataset.to_pandas() if as_data_frame else dataset
+    )
+
+    properties = dataset.properties
+    for physical_property in properties:
+        expected_keys = [
+            box._get_storage_key()
+            for box in PropertyBox.from_physical_property(physical_property)
+        ]
+        assert property_box_keys[physical_property.id] == expected_keys
+
+    # the repeated density shares its box
+    assert (
+        property_box_keys[properties[0].id]
+        == property_box_keys[properties[1].id]
+    )
+    # the pure methanol box of the excess property is also shared
+    assert len(boxes) == 4
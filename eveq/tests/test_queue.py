@@ -0,0 +1,134 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from eveq.equilibration.queue import BoxQueue, equilibrate_boxes
+
+
+@pytest.fixture
+def queue(tmp_path):
+    box_directory = tmp_path / "boxes"
+    box_directory.mkdir()
+    for box_key in ["u1", "u2", "u3"]:
+        (box_directory / f"{box_key}.json").write_text("{}")
+    return BoxQueue(box_directory, tmp_path / "equilibration")
+
+
+def _mark_done(queue, box_key):
+    output_directory = queue.working_directory / box_key
+    output_directory.mkdir(parents=True)
+    (output_directory / "stored_equilibration_data.json").write_text("{}")
+
+
+def _write_claim(queue, box_key, **claim):
+    claim_path = queue.claim_directory / f"{box_key}.claim"
+    claim_path.write_text(json.dumps(claim))
+
+
+def test_claims_each_box_once(queue):
+    _mark_done(queue, "u1")
+    other_queue = BoxQueue(queue.box_directory, queue.working_directory)
+
+    assert queue.claim().stem == "u2"
+    assert other_queue.claim().stem == "u3"
+    assert queue.claim() is None
+    assert queue.is_claimed(queue.box_directory / "u2.json")
+
+    queue.release(queue.box_directory / "u2.json")
+    assert not queue.is_claimed(queue.box_directory / "u2.json")
+    assert other_queue.claim().stem == "u2"
+
+
+def test_claim_box(queue):
+    assert queue.claim_box("u2").stem == "u2"
+    assert queue.claim_box("u2") is None
+    _mark_done(queue, "u3")
+    assert queue.claim_box("u3") is None
+    with pytest.raises(FileNotFoundError):
+        queue.claim_box("u4")
+
+
+def test_failed_boxes_are_not_claimed(queue):
+    box_file = queue.claim()
+    queue.release(box_file, failed=True)
+
+    assert queue.is_failed(box_file)
+    assert not queue.is_claimed(box_file)
+    assert queue.claim_box(box_file.stem) is None
+
+
+def test_stale_claims_are_taken_over(queue):
+    # a claim by a process on this host that has exited
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    _write_claim(
+        queue,
+        "u1",
+        host=socket.gethostname(),
+        pid=process.pid,
+        claimed_at=time.time(),
+    )
+    # a claim that has timed out
+    _write_claim(queue, "u2", host="elsewhere", pid=1, claimed_at=0)
+    # a live claim on another host
+    _write_claim(queue, "u3", host="elsewhere", pid=1, claimed_at=time.time())
+
+    assert queue.claim().stem == "u1"
+    assert queue.claim().stem == "u2"
+    assert queue.claim() is None
+
+
+class _System:
+    """Stands in for ``EquilibrationSystem``, running boxes by name."""
+
+    platform = "platform"
+
+    def __init__(self, box, working_directory, outcome, platform=None):
+        self.box = box
+        self.outcome = outcome
+
+    def run_all(self, deadline=None):
+        return self.outcome(self.box)
+
+
+@pytest.fixture
+def equilibrate(monkeypatch):
+    pytest.importorskip("eveq.equilibration.system")
+    from eveq.box.box import PropertyBox
+    from eveq.equilibration import system
+
+    monkeypatch.setattr(
+        PropertyBox, "from_json", staticmethod(lambda path: path.stem)
+    )
+    monkeypatch.setattr(system, "EquilibrationSystem", _System)
+    return equilibrate_boxes
+
+
+def test_equilibrate_boxes(queue, equilibrate):
+    def outcome(box_key):
+        if box_key == "u2":
+            raise ValueError("failed")
+        return box_key == "u1"
+
+    assert equilibrate(queue, outcome=outcome) == 1
+    assert queue.is_failed(queue.box_directory / "u2.json")
+    assert queue.get_claim(queue.box_directory / "u1.json") is None
+    assert queue.get_claim(queue.box_directory / "u3.json") is None
+
+
+def test_equilibrate_boxes_releases_claim_when_stopped(queue, equilibrate):
+    def outcome(box_key):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        equilibrate(queue, box_keys=["u2"], outcome=outcome)
+    assert queue.get_claim(queue.box_directory / "u2.json") is None
+
+
+def test_equilibrate_boxes_out_of_time(queue, equilibrate):
+    assert equilibrate(queue, deadline=time.time() - 1, outcome=bool) == 0
+    assert not list(queue.claim_directory.glob("*.claim"))
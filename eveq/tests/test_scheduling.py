@@ -0,0 +1,92 @@
+import json
+
+import pandas as pd
+import pytest
+
+from eveq.equilibration.queue import BoxQueue
+from eveq.equilibration.scheduling import (
+    BOX_COLUMNS,
+    estimate_hours,
+    pack_boxes,
+    scan_box,
+    scan_boxes,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    box_directory = tmp_path / "boxes"
+    box_directory.mkdir()
+    for box_key in ["u1", "u2", "u3", "u4"]:
+        (box_directory / f"{box_key}.json").write_text(
+            json.dumps({"n_molecules": 1000})
+        )
+    return BoxQueue(box_directory, tmp_path / "equilibration")
+
+
+def _write_progress(queue, box_key, done=False, **progress):
+    box_directory = queue.working_directory / box_key
+    box_directory.mkdir(parents=True, exist_ok=True)
+    (box_directory / "equilibration_state.json").write_text(
+        json.dumps(progress)
+    )
+    if done:
+        (box_directory / "stored_equilibration_data.json").write_text("{}")
+
+
+def test_scan_boxes(queue):
+    _write_progress(queue, "u1", done=True, n_steps=250000, converged=True)
+    queue.release(queue.claim_box("u2"), failed=True)
+    queue.claim_box("u3")
+    _write_progress(queue, "u4", n_steps=50000)
+
+    boxes = scan_boxes(queue.box_directory, queue.working_directory)
+    assert list(boxes.columns) == BOX_COLUMNS
+    assert list(boxes["state"]) == ["converged", "failed", "running", "pending"]
+    assert list(boxes["n_iterations"]) == [2.5, 0.0, 0.0, 0.5]
+    assert boxes["simulated_ns"].iloc[0] == pytest.approx(0.5)
+
+
+def test_scan_box_exceeded(queue):
+    _write_progress(queue, "u1", n_steps=300000)
+    _write_progress(queue, "u2", done=True, n_steps=300000)
+    # earlier versions recorded fixed iterations, not steps
+    _write_progress(queue, "u3", n_iterations=3)
+
+    for box_key in ["u1", "u2", "u3"]:
+        box = scan_box(
+            queue.box_directory / f"{box_key}.json",
+            queue.working_directory,
+            queue,
+            max_iterations=3,
+        )
+        assert box["state"] == "exceeded"
+        assert box["n_steps"] == 300000
+
+
+def test_estimate_hours():
+    boxes = pd.DataFrame({
+        "state": ["converged", "pending", "pending"],
+        "simulated_ns": [2.0, 1.0, 0.0],
+        "n_molecules": [1000, 1000, 2000],
+        "ns_per_day": [24.0, 24.0, None],
+        "prepared": [True, True, False],
+    })
+    hours = estimate_hours(boxes, preparation_hours=0.5)
+    # one more 0.2 ns iteration for the converged box
+    assert hours[0] == pytest.approx(0.2)
+    assert hours[1] == pytest.approx(1.0)
+    # half the speed of a box half its size, plus preparation
+    assert hours[2] == pytest.approx(2.0 / 12 * 24 + 0.5)
+
+
+def test_pack_boxes():
+    hours = {"a": 6.0, "b": 4.0, "c": 3.0, "d": 1.0, "e": 12.0}
+    jobs = pack_boxes(hours, wall_time=10.0, priorities={"c": 2, "d": 5})
+
+    assert sorted(box for job in jobs for box in job) == sorted(hours)
+    for job in jobs:
+        assert sum(hours[box] for box in job) <= 10.0 or len(job) == 1
+    # the job holding the highest priority box comes first
+    assert jobs[0][0] == "d"
+    assert ["e"] in jobs
@@ -0,0 +1,173 @@
+import pathlib
+
+import pytest
+
+pytest.importorskip("openff.evaluator")
+
+from openff.evaluator.storage.query import EquilibrationDataQuery  # noqa: E402
+
+from eveq.storage.storage import LocalStoredEquilibrationData  # noqa: E402
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_query_compressed_storage(
+    tmp_path, make_equilibration_data, use_index
+):
+    stored_data, ancillary_data_path = make_equilibration_data(
+        tmp_path / "box", contents="compressed box\n"
+    )
+    root_directory = tmp_path / "stored_data"
+    storage = LocalStoredEquilibrationData(
+        root_directory, use_index=use_index, compression="gzip"
+    )
+    storage_key = storage.store_object(stored_data, ancillary_data_path)
+
+    # reopen, so that the object is read back from disk
+    storage = LocalStoredEquilibrationData(
+        root_directory,
+        use_index=use_index,
+        decompression_directory=tmp_path / "decompressed",
+    )
+    query = EquilibrationDataQuery()
+    query.substance = stored_data.substance
+    results = storage.query(query)
+
+    entries = [entry for entries in results.values() for entry in entries]
+    assert [entry[0] for entry in entries] == [storage_key]
+    _, stored_object, directory_path = entries[0]
+    coordinate_path = (
+        pathlib.Path(directory_path) / stored_object.coordinate_file_name
+    )
+    assert coordinate_path.read_text() == "compressed box\n"
+
+    # never decompressed into the storage itself
+    assert not (root_directory / storage_key / "output.pdb").exists()
+    assert (root_directory / storage_key / "output.pdb.gz").exists()
+
+
+def test_retrieve_compressed_copies_files_once(
+    tmp_path, make_equilibration_data
+):
+    stored_data, ancillary_data_path = make_equilibration_data(tmp_path / "box")
+    (pathlib.Path(ancillary_data_path) / "plot.png").write_bytes(b"plot")
+    storage = LocalStoredEquilibrationData(
+        tmp_path / "stored_data",
+        compression="gzip",
+        decompression_directory=tmp_path / "decompressed",
+    )
+    storage_key = storage.store_object(stored_data, ancillary_data_path)
+
+    _, directory_path = storage.retrieve_object(storage_key)
+    plot_path = pathlib.Path(directory_path) / "plot.png"
+    inode = plot_path.stat().st_ino
+
+    _, directory_path = storage.retrieve_object(storage_key)
+    assert pathlib.Path(directory_path) / "plot.png" == plot_path
+    assert plot_path.stat().st_ino == inode
+    assert plot_path.read_bytes() == b"plot"
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_replacing_box_removes_old_files(
+    tmp_path, make_equilibration_data, bulk
+):
+    old_data, old_path = make_equilibration_data(
+        tmp_path / "old", statistical_inefficiency=4.0, contents="old\n"
+    )
+    (pathlib.Path(old_path) / "plot.png").write_bytes(b"plot")
+    new_data, new_path = make_equilibration_data(
+        tmp_path / "new", statistical_inefficiency=1.0, contents="new\n"
+    )
+
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    storage_key = storage.store_object(old_data, old_path)
+    if bulk:
+        assert storage.store_objects([(new_data, new_path)]) == [storage_key]
+    else:
+        assert storage.store_object(new_data, new_path) == storage_key
+
+    directory_path = tmp_path / "stored_data" / storage_key
+    assert sorted(path.name for path in directory_path.iterdir()) == [
+        "output.pdb"
+    ]
+    assert (directory_path / "output.pdb").read_text() == "new\n"
+    assert not list((tmp_path / "stored_data").glob(".*"))
+
+
+def test_store_objects_keeps_lowest_inefficiency(
+    tmp_path, make_equilibration_data
+):
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    stored_key = storage.store_object(
+        *make_equilibration_data(tmp_path / "stored", contents="stored\n")
+    )
+
+    objects = [
+        make_equilibration_data(
+            tmp_path / "worse", statistical_inefficiency=3.0
+        ),
+        make_equilibration_data(
+            tmp_path / "better", statistical_inefficiency=1.0, contents="1\n"
+        ),
+        make_equilibration_data(
+            tmp_path / "other", temperature=308.15, contents="other\n"
+        ),
+    ]
+    storage_keys = storage.store_objects(objects)
+    assert storage_keys[0] == storage_keys[1] == stored_key
+    assert storage_keys[2] != stored_key
+
+    # the key index is written once, and read back on reopening
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    assert sorted(storage.get_storage_keys()) == sorted(set(storage_keys))
+    stored_object, directory_path = storage.retrieve_object(stored_key)
+    assert stored_object.statistical_inefficiency == 1.0
+    assert (pathlib.Path(directory_path) / "output.pdb").read_text() == "1\n"
+
+
+def test_batch_saves_keys_once(tmp_path, make_equilibration_data, monkeypatch):
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    n_saves = []
+    save = storage._save_stored_object_keys
+
+    def save_stored_object_keys():
+        if storage._n_open_batches == 0:
+            n_saves.append(1)
+        save()
+
+    monkeypatch.setattr(
+        storage, "_save_stored_object_keys", save_stored_object_keys
+    )
+    with storage.batch():
+        for temperature in [298.15, 308.15, 318.15]:
+            storage.store_object(
+                *make_equilibration_data(
+                    tmp_path / f"box_{temperature}", temperature=temperature
+                )
+            )
+    assert len(n_saves) == 1
+
+    storage = LocalStoredEquilibrationData(tmp_path / "stored_data")
+    assert len(storage.get_storage_keys()) == 3
+
+
+def test_deduplicated_ancillary_data(tmp_path, make_equilibration_data):
+    storage = LocalStoredEquilibrationData(
+        tmp_path / "stored_data", deduplicate_ancillary_data=True
+    )
+    storage_keys = [
+        storage.store_object(
+            *make_equilibration_data(
+                tmp_path / f"box_{temperature}", temperature=temperature
+            )
+        )
+        for temperature in [298.15, 308.15]
+    ]
+    first, second = (
+        tmp_path / "stored_data" / storage_key / "output.pdb"
+        for storage_key in storage_keys
+    )
+    if not storage._blob_store.supports_hardlinks:
+        pytest.skip("hardlinks are not supported")
+    assert first.stat().st_ino == second.stat().st_ino
+    assert storage.collect_garbage() == (0, 0)
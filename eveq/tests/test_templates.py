@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("openff.toolkit")
+pytest.importorskip("rdkit")
+
+from openff.toolkit import Molecule  # noqa: E402
+
+from eveq.box.templates import MoleculeTemplateCache  # noqa: E402
+
+
+def test_templates_are_shared_through_directory(tmp_path, monkeypatch):
+    cache = MoleculeTemplateCache(tmp_path)
+    molecule = cache.get_molecule("OC")
+    assert molecule.n_conformers == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    # copies are returned, so the template can't be modified
+    molecule._conformers = None
+    assert cache.get_molecule("CO").n_conformers == 1
+
+    def generate_conformers(self, *args, **kwargs):
+        raise AssertionError("conformers should be loaded from disk")
+
+    monkeypatch.setattr(Molecule, "generate_conformers", generate_conformers)
+    loaded = MoleculeTemplateCache(tmp_path).get_molecule("CO")
+    assert loaded.n_conformers == 1
+    assert loaded.to_smiles() == molecule.to_smiles()
+
+
+def test_unreadable_template_is_regenerated(tmp_path):
+    cache = MoleculeTemplateCache(tmp_path)
+    cache.get_molecule("CO")
+    (template_path,) = tmp_path.glob("*.json")
+    template_path.write_text("{")
+
+    assert MoleculeTemplateCache(tmp_path).get_molecule("CO").n_conformers == 1
+    assert Molecule.from_json(template_path.read_text()).n_conformers == 1
@@ -0,0 +1,72 @@
+import pytest
+
+from eveq.equilibration.timing import (
+    StageTimer,
+    read_box_timings,
+    read_timings,
+    summarize_timings,
+)
+
+
+def test_stage_timer(tmp_path):
+    timings_file = tmp_path / "u1" / "timings.jsonl"
+    timings_file.parent.mkdir()
+    timer = StageTimer(timings_file)
+
+    with timer.time("md", segment=1) as record:
+        record["n_steps"] = 1000
+    with pytest.raises(ValueError):
+        with timer.time("checkpoint"):
+            raise ValueError
+
+    records = read_timings(timings_file)
+    assert [record["stage"] for record in records] == ["md", "checkpoint"]
+    assert records[0]["segment"] == 1
+    assert records[0]["n_steps"] == 1000
+    assert records == timer.records
+    assert set(timer.get_totals()) == {"md", "checkpoint"}
+
+
+def test_read_timings_skips_partial_lines(tmp_path):
+    timings_file = tmp_path / "timings.jsonl"
+    timings_file.write_text(
+        '{"stage": "md", "seconds": 1.0}\n{"stage": "che'
+    )
+    assert read_timings(timings_file) == [{"stage": "md", "seconds": 1.0}]
+
+
+def test_cprofile(tmp_path):
+    timer = StageTimer(tmp_path / "timings.jsonl", profile="cprofile")
+    with timer.time("md"):
+        # nested stages are only in the profile of the outer stage
+        with timer.time("report"):
+            pass
+    timer.save_profiles()
+    assert [path.name for path in tmp_path.glob("*.prof")] == ["md.prof"]
+
+
+def test_summarize_box_timings(tmp_path):
+    for box_key, seconds in [("u1", [3600.0, 1800.0]), ("u2", [1800.0])]:
+        timer = StageTimer(tmp_path / box_key / "timings.jsonl")
+        (tmp_path / box_key).mkdir()
+        for stage_seconds in seconds:
+            timer._write_record({"stage": "md", "seconds": stage_seconds})
+    timer = StageTimer(tmp_path / "u2" / "timings.jsonl")
+    timer._write_record({"stage": "prepare", "seconds": 1800.0})
+
+    timings = read_box_timings(tmp_path)
+    assert sorted(timings["box_key"].unique()) == ["u1", "u2"]
+
+    by_stage = summarize_timings(timings)
+    assert list(by_stage.index) == ["md", "prepare"]
+    assert by_stage.loc["md", "n"] == 3
+    assert by_stage.loc["md", "total_hours"] == pytest.approx(2.0)
+    assert by_stage.loc["prepare", "fraction"] == pytest.approx(0.2)
+
+    by_box = summarize_timings(timings, by="box_key")
+    assert by_box.loc["u1", "total_hours"] == pytest.approx(1.5)
+
+
+def test_unknown_profiler():
+    with pytest.raises(ValueError, match="Unknown profiler"):
+        StageTimer(profile="perf")
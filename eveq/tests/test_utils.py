@@ -0,0 +1,23 @@
+import os
+
+from eveq.utils import atomic_write, get_disk_usage
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write(path, "old")
+    os.chmod(path, 0o600)
+    atomic_write(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    # permissions of the replaced file are kept
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert [file.name for file in tmp_path.iterdir()] == ["data.json"]
+
+
+def test_get_disk_usage_counts_hardlinks_once(tmp_path):
+    (tmp_path / "a").write_bytes(b"12345")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "b").write_bytes(b"123")
+    os.link(tmp_path / "a", tmp_path / "nested" / "c")
+    assert get_disk_usage(tmp_path) == 8
@@ -0,0 +1,58 @@
+import os
+import pathlib
+import stat
+import tempfile
+
+
+def atomic_write(path: str | pathlib.Path, data: str | bytes):
+    """Write data to a file atomically.
+
+    The data is written to a temporary file in the same directory,
+    which then replaces ``path``. A process killed mid-write leaves
+    either the old or the new file in place, never a partial one.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to write.
+    data : str or bytes
+        The contents of the file.
+    """
+    path = pathlib.Path(path)
+    mode = "wb" if isinstance(data, bytes) else "w"
+    file_descriptor, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        # temporary files are created private, so match the permissions
+        # of the file being replaced
+        if path.exists():
+            os.chmod(tmp_path, stat.S_IMODE(path.stat().st_mode))
+        else:
+            os.chmod(tmp_path, 0o644)
+        with os.fdopen(file_descriptor, mode) as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_disk_usage(directory: str | pathlib.Path) -> int:
+    """Return the number of bytes used by the files in a directory tree,
+    counting files that are hardlinked together only once.
+    """
+    seen = set()
+    n_bytes = 0
+    for dirpath, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            file_stat = os.lstat(os.path.join(dirpath, file_name))
+            inode = (file_stat.st_dev, file_stat.st_ino)
+            if inode in seen:
+                continue
+            seen.add(inode)
+            n_bytes += file_stat.st_size
+    return n_bytes
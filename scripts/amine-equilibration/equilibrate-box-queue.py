@@ -0,0 +1,52 @@
+"""
+This script equilibrates boxes one after another in a single process,
+claiming them from the box directory until none are left or
+the wall time runs out. Many copies can run at once; each box is
+only equilibrated by one of them at a time.
+
+Compared to `equilibrate-single-box.py`, the toolkits, force field
+and OpenMM platform are only loaded once per job rather than once per box.
+"""
+
+import logging
+import pathlib
+import time
+
+import click
+
+from eveq.cli.options import (
+    equilibration_options,
+    get_system_options,
+    wall_time_option,
+)
+from eveq.equilibration.queue import BoxQueue, equilibrate_boxes
+
+
+# log all info level messages
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@equilibration_options
+@wall_time_option(default=19.5)
+def main(
+    box_directory: str = "working_directory/boxes",
+    working_directory: str = "working_directory/equilibration",
+    wall_time: float = 19.5,
+    **kwargs,
+):
+    deadline = time.time() + wall_time * 60 * 60
+
+    working_directory = pathlib.Path(working_directory)
+    working_directory.mkdir(parents=True, exist_ok=True)
+
+    queue = BoxQueue(box_directory, working_directory)
+    n_finished = equilibrate_boxes(
+        queue, deadline=deadline, **get_system_options(**kwargs)
+    )
+    print(f"Done! Equilibrated {n_finished} boxes.")
+
+
+if __name__ == "__main__":
+    main()
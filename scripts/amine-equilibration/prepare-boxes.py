@@ -0,0 +1,133 @@
+"""
+This script packs, parameterizes and minimizes boxes ahead of time,
+so that GPU jobs running `equilibrate-single-box.py` start straight
+at equilibration. None of this needs a GPU, so run it on CPU nodes.
+"""
+
+import collections
+import json
+import logging
+import pathlib
+
+import click
+import tqdm
+
+from eveq.equilibration.preparation import prepare_boxes
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option(
+    "--box-directory",
+    "-bd",
+    "box_directory",
+    type=click.Path(exists=True, dir_okay=True, readable=True),
+    default="working_directory/boxes",
+    help="Path to the directory containing box files.",
+)
+@click.option(
+    "--working-directory",
+    "-wd",
+    "working_directory",
+    type=click.Path(file_okay=False, writable=True),
+    default="working_directory/equilibration",
+    help="Path to the working directory for equilibration.",
+)
+@click.option(
+    "--forcefield",
+    "-ff",
+    "forcefield",
+    type=str,
+    default="openff-2.1.0.offxml",
+    help="Path to the force field file.",
+)
+@click.option(
+    "--template-cache-directory",
+    "-tcd",
+    "template_cache_directory",
+    type=click.Path(file_okay=False, writable=True),
+    default="working_directory/templates",
+    help="Path to a directory of molecule templates shared between boxes.",
+)
+@click.option(
+    "--charge-cache-directory",
+    "-ccd",
+    "charge_cache_directory",
+    type=click.Path(file_okay=False, writable=True),
+    default="working_directory/charges",
+    help="Path to a directory of partial charges shared between boxes.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of processes to prepare boxes with.",
+)
+@click.option(
+    "--timings-file",
+    "-tf",
+    "timings_file",
+    type=click.Path(dir_okay=False, writable=True),
+    default="working_directory/preparation_timings.json",
+    help="Path to save the per-box stage timings to.",
+)
+def main(
+    box_directory: str = "working_directory/boxes",
+    working_directory: str = "working_directory/equilibration",
+    forcefield: str = "openff-2.1.0.offxml",
+    template_cache_directory: str = "working_directory/templates",
+    charge_cache_directory: str = "working_directory/charges",
+    n_workers: int | None = None,
+    timings_file: str = "working_directory/preparation_timings.json",
+):
+    box_files = sorted(pathlib.Path(box_directory).glob("u*.json"))
+    print(f"Found {len(box_files)} boxes in {box_directory}")
+
+    results = []
+    for result in tqdm.tqdm(
+        prepare_boxes(
+            box_files,
+            working_directory=working_directory,
+            forcefield=forcefield,
+            template_cache_directory=template_cache_directory,
+            charge_cache_directory=charge_cache_directory,
+            n_workers=n_workers,
+        ),
+        total=len(box_files),
+    ):
+        if result["error"] is not None:
+            logger.error(
+                f"Failed to prepare {result['box']}:\n{result['error']}"
+            )
+        results.append(result)
+
+    with open(timings_file, "w") as f:
+        json.dump(results, f, indent=2)
+
+    n_failed = sum(result["error"] is not None for result in results)
+    n_skipped = sum(
+        result["error"] is None and set(result["timings"]) == {"total"}
+        for result in results
+    )
+    print(
+        f"Prepared {len(results) - n_failed - n_skipped} boxes, "
+        f"skipped {n_skipped} already prepared, {n_failed} failed."
+    )
+
+    total_timings = collections.defaultdict(float)
+    for result in results:
+        for stage, seconds in result["timings"].items():
+            total_timings[stage] += seconds
+    for stage, seconds in total_timings.items():
+        print(f"{stage}: {seconds:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/bin/bash
+#SBATCH -J equilibrate-queue
+#SBATCH --array=1-8
+#SBATCH -p free-gpu
+#SBATCH -t 20:00:00
+#SBATCH --nodes=1
+#SBATCH --cpus-per-task=1
+#SBATCH --account dmobley_lab_gpu
+#SBATCH --export ALL
+#SBATCH --mem=16gb
+#SBATCH --constraint=fastscratch
+#SBATCH --output slurm-%x.%A-%a.out
+#SBATCH --gres=gpu:1
+
+. ~/.bashrc
+
+# Use the right conda environment
+conda activate evaluator-050
+
+export CUDA_VISIBLE_DEVICES=0
+
+# each array task is a worker that equilibrates boxes until
+# none are left or its wall time (in hours) runs out
+python equilibrate-box-queue.py         \
+    -wd working_directory/equilibration \
+    -bd working_directory/boxes         \
+    -ff openff-2.1.0.offxml             \
+    -maxiter 2000                       \
+    -wt 19.5
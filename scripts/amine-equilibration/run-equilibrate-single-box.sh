@@ -1,6 +1,5 @@
 #!/bin/bash
 #SBATCH -J equilibrate
-#SBATCH --array=102,103,104,105,129,156,157,161,165,194,195,223,228,236,243,26,275,27,280,289,30,370,373,38,42,58,66,88,95,98,99
 #SBATCH -p free-gpu
 #SBATCH -t 20:00:00
 #SBATCH --nodes=1
@@ -19,10 +18,17 @@ conda activate evaluator-050
 
 export CUDA_VISIBLE_DEVICES=0
 
+# submit with the command printed by `eveq schedule`, e.g.
+#   MANIFEST=schedule/manifest.txt sbatch --array=0-N run-equilibrate-single-box.sh
+# each array task equilibrates the boxes on its line of the manifest
+MANIFEST=${MANIFEST:-schedule/manifest.txt}
+BOX_KEYS=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" $MANIFEST)
+
 python equilibrate-single-box.py        \
-    -i  $SLURM_ARRAY_TASK_ID            \
+    $(printf -- "-k %s " $BOX_KEYS)     \
     -wd working_directory/equilibration \
     -bd working_directory/boxes         \
     -ff openff-2.1.0.offxml             \
-    -maxiter 2000
+    -maxiter 2000                       \
+    -wt 19.5
 
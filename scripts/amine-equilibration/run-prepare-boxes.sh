@@ -0,0 +1,21 @@
+#!/bin/bash
+#SBATCH -J prepare-boxes
+#SBATCH -p free
+#SBATCH -t 10:00:00
+#SBATCH --nodes=1
+#SBATCH --cpus-per-task=16
+#SBATCH --account dmobley_lab
+#SBATCH --export ALL
+#SBATCH --mem=32gb
+#SBATCH --output slurm-%x.%A.out
+
+. ~/.bashrc
+
+# Use the right conda environment
+conda activate evaluator-050
+
+python prepare-boxes.py                 \
+    -wd working_directory/equilibration \
+    -bd working_directory/boxes         \
+    -ff openff-2.1.0.offxml             \
+    -nw $SLURM_CPUS_PER_TASK
@@ -35,26 +35,53 @@ from openff.evaluator.utils.serialization import TypedBaseModel
         "This is manually replaced with the ID of an existing version of openff-2.1.0 right now."
     ),
 )
+@click.option(
+    "--max-cached-objects",
+    "-mco",
+    "max_cached_objects",
+    type=int,
+    default=1000,
+    help="Maximum number of stored objects to keep in memory at once.",
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of threads used to copy data into storage.",
+)
 def main(
     input_path: str = "working_directory/equilibration/",
     storage_path: str = "../../data/stored_data",
-    force_field_id_placeholder: str = "ForceFieldData_2803685782293237796"
+    force_field_id_placeholder: str = "ForceFieldData_2803685782293237796",
+    max_cached_objects: int = 1000,
+    n_workers: int | None = None,
 ):
     input_directory = pathlib.Path(input_path)
     data_files = sorted(input_directory.glob("*/stored_equilibration_data.json"))
     print(f"Found {len(data_files)} equilibration data files in {input_directory}")
 
-    storage = LocalStoredEquilibrationData(storage_path)
-    print(f"Original number of objects in storage: {len(storage._cached_retrieved_objects)}")
+    storage = LocalStoredEquilibrationData(
+        storage_path,
+        use_index=True,
+        max_cached_objects=max_cached_objects,
+    )
+    n_stored = len(storage.get_storage_keys())
+    print(f"Original number of objects in storage: {n_stored}")
 
+    objects_to_store = []
     for data_file in tqdm.tqdm(data_files):
         object_to_store = TypedBaseModel.from_json(data_file)
         object_to_store.force_field_id = force_field_id_placeholder
         object_to_store.coordinate_file_name = "output.pdb"
         ancillary_data_path = data_file.parent / "output"
-        storage.store_object(object_to_store, str(ancillary_data_path))
+        objects_to_store.append((object_to_store, str(ancillary_data_path)))
+
+    storage.store_objects(objects_to_store, n_workers=n_workers)
 
-    print(f"Final number of objects in storage: {len(storage._cached_retrieved_objects)}")
+    n_stored = len(storage.get_storage_keys())
+    print(f"Final number of objects in storage: {n_stored}")
 
 
 
@@ -12,7 +12,6 @@ import tqdm
 from openff.evaluator.datasets.datasets import PhysicalPropertyDataSet
 
 from eveq.storage.storage import LocalStoredEquilibrationData
-from eveq.box.box import PropertyBox
 
 
 @click.command()
@@ -52,24 +51,26 @@ def main(
 
     dataset = PhysicalPropertyDataSet.from_json(input_path)
 
-    storage = LocalStoredEquilibrationData(existing_storage_path)
+    storage = LocalStoredEquilibrationData(
+        existing_storage_path, use_index=True
+    )
 
-    all_boxes = [
-        box
-        for physical_property in dataset.properties
-        for box in PropertyBox.from_physical_property(physical_property, n_molecules=1000)
-    ]
-    print(f"Found {len(all_boxes)} boxes in dataset.")
-    boxes = set(all_boxes)
-    print(f"Found {len(boxes)} unique boxes in dataset.")
+    coverage = storage.get_dataset_coverage(dataset, n_molecules=1000)
+    n_boxes = sum(
+        len(box_keys) for box_keys in coverage.property_box_keys.values()
+    )
+    print(f"Found {n_boxes} boxes in dataset.")
+    print(f"Found {len(coverage.boxes)} unique boxes in dataset.")
+    print(coverage)
 
-    boxes = [
-        box
-        for box in boxes
-        if not box._get_storage_key() in storage._cached_retrieved_objects
-    ]
+    boxes = list(coverage.missing_boxes.values())
     print(f"Found {len(boxes)} boxes not in storage, setting up.")
 
+    # boxes needed by the most properties are listed first
+    coverage.to_pandas().to_csv(
+        working_directory / "box-priorities.csv", index=False
+    )
+
     box_directory = working_directory / "boxes"
     box_directory.mkdir(parents=True, exist_ok=True)
     unique_boxes = []
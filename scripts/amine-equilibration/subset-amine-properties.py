@@ -18,7 +18,11 @@ from openff.evaluator.datasets.curation.workflow import (
     CurationWorkflowSchema,
 )
 
-from openff.evaluator.utils.checkmol import ChemicalEnvironment, analyse_functional_groups
+from openff.evaluator.utils.checkmol import ChemicalEnvironment
+from eveq.curation.environments import (
+    FilterByAnyEnvironment,
+    FilterByAnyEnvironmentSchema,
+)
 from eveq.storage.storage import PropertyBox
 
 
@@ -42,12 +46,35 @@ from eveq.storage.storage import PropertyBox
         "This file is from the ash-sage-rc1 dataset."
     )
 )
+@click.option(
+    "--functional-group-cache",
+    "-fgc",
+    "functional_group_cache",
+    type=click.Path(dir_okay=False),
+    default="functional-groups.json",
+    help=(
+        "JSON file to cache the functional groups of each SMILES "
+        "in between runs."
+    ),
+)
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=1,
+    help="Number of processes to classify SMILES with.",
+)
 def main(
     existing_storage_path: str = "../../data/stored_data",
     intermediate_csv_path: str = "/Users/lily/pydev/old-ash-sage/01_download-data/physprop/intermediate/output/initial-filtered.csv",
+    functional_group_cache: str = "functional-groups.json",
+    n_workers: int = 1,
 ):
-    storage = LocalStoredEquilibrationData(existing_storage_path)
-    print(f"Number of objects in storage: {len(storage._cached_retrieved_objects)}")
+    storage = LocalStoredEquilibrationData(
+        existing_storage_path, use_index=True
+    )
+    print(f"Number of objects in storage: {len(storage.get_storage_keys())}")
 
     # load existing intermediate filtered set
     df = pd.read_csv(
@@ -58,39 +85,39 @@ def main(
 
 
     # the FilterByEnvironments filter is too strict -- all components have to match amines.
-    cols = [x for x in df.columns if x.startswith("Component")]
-    amine_property_rows = []
-    for _, row in df.iterrows():
-        components = []
-        for col in cols:
-            if not pd.isna(row[col]):
-                components.append(row[col])
-
-        for comp in components:
-            groups = [gp.value for gp in analyse_functional_groups(comp)]
-            if any("Amine" in x for x in groups):
-                amine_property_rows.append(dict(row))
-                break
-
-    amine_properties = pd.DataFrame(amine_property_rows)
+    # Each unique SMILES is only classified once, and cached in between runs.
+    amine_environments = [
+        environment
+        for environment in ChemicalEnvironment
+        if "Amine" in environment.value
+    ]
+    amine_properties = FilterByAnyEnvironment.apply(
+        df,
+        FilterByAnyEnvironmentSchema(
+            environments=amine_environments,
+            functional_group_cache_file=functional_group_cache,
+        ),
+        n_workers,
+    )
 
     print(
         f"{len(amine_properties)} amine properties found"
     )
 
-    amine_dataset = PhysicalPropertyDataSet.from_pandas(amine_properties)
-
-    not_equilibrated = []
-    for physical_property in amine_dataset.properties:
-        if not storage.contains_all_property_boxes(physical_property):
-            not_equilibrated.append(physical_property)
+    # plan every box at once, rather than checking each property separately
+    coverage = storage.get_dataset_coverage(amine_properties)
+    print(coverage)
 
+    not_equilibrated = amine_properties[
+        amine_properties["Id"].isin(coverage.uncovered_property_ids)
+    ]
     print(
         f"{len(not_equilibrated)} properties not equilibrated"
     )
 
-    non_equilibrated_amines = PhysicalPropertyDataSet()
-    non_equilibrated_amines.add_properties(*not_equilibrated)
+    non_equilibrated_amines = PhysicalPropertyDataSet.from_pandas(
+        not_equilibrated
+    )
     with open("dataset.json", "w") as f:
         f.write(non_equilibrated_amines.json())
 
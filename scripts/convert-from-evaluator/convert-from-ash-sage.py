@@ -26,15 +26,27 @@ from eveq.storage.storage import LocalStoredEquilibrationData
         "The default path here is to the repo data storage"
     )
 )
+@click.option(
+    "--n-workers",
+    "-nw",
+    "n_workers",
+    type=int,
+    default=None,
+    help="Number of workers used to read and copy the existing storage.",
+)
 def main(
     lfs_root_directory: str = "/Volumes/Nobbsy/combined_equilibration_data/stored_data",
     new_root_directory: str = "../data/stored_data",
+    n_workers: int | None = None,
 ):
+    # re-running this after an interruption resumes the conversion
     storage = LocalStoredEquilibrationData.from_localfilestorage(
         lfs_root_directory=lfs_root_directory,
-        new_root_directory=new_root_directory
+        new_root_directory=new_root_directory,
+        n_workers=n_workers,
+        use_index=True,
     )
-    print(len(storage._cached_retrieved_objects))
+    print(len(storage.get_storage_keys()))
 
 
 if __name__ == "__main__":